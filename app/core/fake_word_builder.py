@@ -2,10 +2,29 @@
 
 import itertools
 import random
-from typing import Generator, List, Optional, Tuple, Union
+from functools import lru_cache
+from typing import (
+    Generator,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import Levenshtein
 import pyphen
+from rapidfuzz.distance import Levenshtein
+from rapidfuzz.process import cdist
+
+
+class SplitCacheInfo(NamedTuple):
+    """Counters of the process wide cache of word splits."""
+
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
 
 
 class FakeWordBuilder:
@@ -19,15 +38,27 @@ class FakeWordBuilder:
     pyphen_US = pyphen.Pyphen(lang='en_US')
     pyphen_GB = pyphen.Pyphen(lang='en_GB')
 
-    def __init__(self, pool: List[str], seed: Optional[int] = None):
+    # Pool words are graph node names that rarely change, so their splits are shared by every builder in the process
+    split_cache_size = 8192
+
+    # Potential fakes are scored against the pool in batches, small enough that an early match wastes little work
+    score_batch_size = 32
+
+    def __init__(
+        self,
+        pool: List[str],
+        seed: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        # A builder owns its random number generator so builders can run concurrently without sharing random state
         self.seed = seed
+        self.rng = rng or random.Random(seed)
         self.pool = pool
+        self.lower_pool = [word.lower() for word in pool]
         self.second_parts = [
             x[1]
-            for x in list(
-                itertools.chain.from_iterable(
-                    self.__split_pairs(word) for word in self.pool
-                )
+            for x in itertools.chain.from_iterable(
+                self.__split_pairs(word) for word in self.pool
             )
         ]
 
@@ -68,31 +99,17 @@ class FakeWordBuilder:
         return False
 
     @staticmethod
-    def __similarity_score(a: str, b: str) -> float:
-        """
-        Calculates the similarity score between two strings using the Levenshtein distance algorithm.
-
-        Args:
-            a (str): first string
-            b (str): second string
-
-        Returns:
-            float: levenshtein distance score
-        """
-        distance = Levenshtein.distance(a.lower(), b.lower())
-        max_length = max(len(a), len(b))
-        return 1 - distance / max_length
-
-    @staticmethod
-    def __split_pairs(word: str) -> List[Tuple[str, str]]:
+    @lru_cache(maxsize=split_cache_size)
+    def __split_pairs(word: str) -> Tuple[Tuple[str, str], ...]:
         """
         Splits words into possible pairings, e.g. dopamine to dopa-mine and extended to include dop-amine.
+        Results are cached process wide, so the pyphen cost is paid once per word.
 
         Args:
             word (str): the input word to find split word pairs for
 
         Returns:
-            List[Tuple[str, str]]: A list of generated pairs of ways a word can be split
+            Tuple[Tuple[str, str], ...]: generated pairs of ways a word can be split
         """
         pairs = list(FakeWordBuilder.pyphen_US.iterate(word))
         if not pairs:
@@ -107,17 +124,36 @@ class FakeWordBuilder:
             ]
         )
 
-        return pairs if len(pairs) > 0 else [(word, '')]
+        return tuple(pairs) if len(pairs) > 0 else ((word, ''),)
+
+    @staticmethod
+    def split_cache_info() -> SplitCacheInfo:
+        """
+        Hit and miss counters of the process wide cache of word splits.
+
+        Returns:
+            SplitCacheInfo: hits, misses, maxsize and currsize of the cache
+        """
+        return SplitCacheInfo(*FakeWordBuilder.__split_pairs.cache_info())
+
+    def __reseed(self):
+        """
+        Starts the random number generator again from the seed before a random step, when there is a seed.
+        Every step of a seeded builder starts from the seed, so a seed gives the same words it always has.
+        """
+        if self.seed is not None:
+            self.rng.seed(self.seed)
 
     def __find_match(
-        self, potential_fakes: Generator, threshold: float
+        self, potential_fakes: Iterator[str], threshold: float
     ) -> Generator:
         """
         A generator that yields a generated fake word above a similarity score threshold when compared to all original input words.
         Generators are used to iterate over possible permutations without loading all of them into memory at once.
+        Each batch of potential fakes is scored against the whole pool in one call, the score being 1 - levenshtein distance / length of the longer word.
 
         Args:
-            potential_fakes (Generator[str, None, None]): potential new words
+            potential_fakes (Iterator[str]): potential new words
             threshold (float): the score threshold for similarity to accept
 
         Returns:
@@ -126,12 +162,26 @@ class FakeWordBuilder:
         Yields:
             str: a fake word
         """
-        random.seed(self.seed)
-        random.shuffle(self.pool)
+        # The pool order does not affect matches, the shuffle keeps seeded outputs the same as scoring pair by pair
+        self.__reseed()
+        self.rng.shuffle(self.pool)
 
-        for fake_word, word in itertools.product(potential_fakes, self.pool):
-            if FakeWordBuilder.__similarity_score(fake_word, word) > threshold:
-                yield fake_word
+        while True:
+            batch = list(
+                itertools.islice(potential_fakes, self.score_batch_size)
+            )
+            if not batch:
+                return
+            # Scores at or below the cutoff come back as 0 without finishing the distance calculation
+            scores = cdist(
+                [x.lower() for x in batch],
+                self.lower_pool,
+                scorer=Levenshtein.normalized_similarity,
+                score_cutoff=threshold,
+            )
+            for fake_word, row in zip(batch, scores):
+                if (row > threshold).any():
+                    yield fake_word
 
     def generate(
         self,
@@ -152,20 +202,19 @@ class FakeWordBuilder:
 
         output = []
 
+        self.__reseed()
         if filter_list:
             subpool = [x for x in self.pool if x not in filter_list]
-            random.seed(self.seed)
-            base_words = random.sample(subpool, min(len(subpool), limit))
+            base_words = self.rng.sample(subpool, min(len(subpool), limit))
         else:
-            random.seed(self.seed)
-            base_words = random.sample(self.pool, min(len(self.pool), limit))
+            base_words = self.rng.sample(self.pool, min(len(self.pool), limit))
 
         for word in base_words:
-            random.seed(self.seed)
-            random.shuffle(self.second_parts)
+            self.__reseed()
+            self.rng.shuffle(self.second_parts)
             random_word_pairs = self.__split_pairs(word)
-            random.seed(self.seed)
-            first_part = random.choice(random_word_pairs)[0]
+            self.__reseed()
+            first_part = self.rng.choice(random_word_pairs)[0]
             exclusions = [x[1] for x in random_word_pairs]
 
             # This generator will build a new valid blended word on each yield
@@ -1,11 +1,244 @@
 """A utility module for MCQBot"""
 
 import random
-from typing import List, Optional, Tuple
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Generator, Iterable, List, Optional, Tuple
 
 from app.core.fake_word_builder import FakeWordBuilder
+from app.core.mcq_cache import MCQCache
+from app.graphs.fake_word_bank import FakeWordBank
+from app.graphs.log_util import create_logger
 from app.graphs.mcq_graph import MCQGraph
-from app.models import MCQ, MCQRelationship
+from app.models import MCQ, MCQNode, MCQRelationship
+
+logger = create_logger(__name__)
+
+# The fake words kept in the bank for each relationship, unseeded questions draw one of them
+FAKE_WORDS_PER_RELATIONSHIP = 5
+# Fills the banks of relationships that questions found empty, one at a time so requests keep the other cores
+fake_word_filler = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='fake-words'
+)
+
+
+def choose_distractors(
+    relationship: MCQRelationship,
+    answer_nodes: List[str],
+    exclusions: List[str],
+    similar_nodes: List[str],
+) -> List[str]:
+    """
+    Filters similar nodes down to plausible distractors that are not correct answers.
+
+    Args:
+        relationship (MCQRelationship): the chosen edge between answer and topic
+        answer_nodes (List[str]): all other nodes with the same relationship to the topic
+        exclusions (List[str]): nodes connected to the answer node
+        similar_nodes (List[str]): sorted nodes similar to the answer node
+
+    Returns:
+        List[str]: the distractors
+    """
+    return [
+        x
+        for x in similar_nodes
+        if x not in answer_nodes
+        and x not in exclusions
+        and x != relationship.answer_node
+        and x != relationship.topic_node
+    ]
+
+
+def relationship_fake_words(
+    relationship: MCQRelationship,
+    answers: List[str],
+    distractors: List[str],
+    size: int = FAKE_WORDS_PER_RELATIONSHIP,
+) -> List[str]:
+    """
+    Generates the fake words kept in the bank for a relationship, seeded from the relationship itself so a bank
+    filled in any process, or written to a snapshot, holds the same words.
+
+    Args:
+        relationship (MCQRelationship): the chosen edge between answer and topic
+        answers (List[str]): all other nodes with the same relationship to the topic
+        distractors (List[str]): plausible distractors
+        size (int, optional): the most fake words generated. Defaults to FAKE_WORDS_PER_RELATIONSHIP.
+
+    Returns:
+        List[str]: distinct fake words
+    """
+    seed = zlib.crc32('\x1f'.join(FakeWordBank.key(relationship)).encode())
+    fwg = FakeWordBuilder(
+        pool=sorted(set(answers + distractors)), rng=random.Random(seed)
+    )
+    fakes = fwg.generate(
+        filter_list=[relationship.topic_node] + distractors, limit=size
+    )
+    return list(dict.fromkeys(fakes))
+
+
+# pylint: disable=too-many-arguments
+def compose_mcq(
+    relationship: MCQRelationship,
+    answers: List[str],
+    distractors: List[str],
+    fake_words: Optional[FakeWordBank],
+    rng: random.Random,
+    seed: Optional[int] = None,
+    on_miss: Optional[
+        Callable[[MCQRelationship, List[str], List[str]], None]
+    ] = None,
+) -> MCQ:
+    """
+    Picks distractors and a fake word and shuffles them with the answer into a question.
+    Each random step of a seeded question starts from the seed, as questions always have, so a seed always gives the
+    same question. Its fake word is then generated for it rather than drawn from the bank, which is filled without the seed.
+    A question that finds no fake words in the bank generates the one word it needs.
+
+    Args:
+        relationship (MCQRelationship): the chosen edge between answer and topic
+        answers (List[str]): all other nodes with the same relationship to the topic
+        distractors (List[str]): plausible distractors
+        fake_words (Optional[FakeWordBank]): fake words generated ahead of time for the graph, None to always generate one
+        rng (random.Random): random number generator for this request, used when there is no seed
+        seed (Optional[int]): seed of the question
+        on_miss (Optional[Callable[[MCQRelationship, List[str], List[str]], None]]): called with the relationship,
+            answers and distractors when the bank has no fake words for the relationship
+
+    Returns:
+        MCQ: the generated question
+    """
+    answer = relationship.topic_node
+
+    def step() -> random.Random:
+        return rng if seed is None else random.Random(seed)
+
+    # take a fake blended word from the bank, or create one if the bank has none for this relationship
+    fakes = (
+        []
+        if fake_words is None or seed is not None
+        else fake_words.sample(relationship, rng, k=1)
+    )
+    if not fakes:
+        if fake_words is not None and seed is None and on_miss is not None:
+            on_miss(relationship, answers, distractors)
+        fwg = FakeWordBuilder(
+            pool=answers + distractors,
+            seed=seed,
+            rng=None if seed is not None else rng,
+        )
+        fakes = fwg.generate(filter_list=[answer] + distractors, limit=1)
+
+    # shuffle the answer, distractors and fakes
+    distractors = (
+        distractors if len(distractors) < 2 else step().sample(distractors, 2)
+    )
+
+    choices = [answer] + distractors + fakes
+    step().shuffle(choices)
+    return MCQ(answer=answer, topic=relationship.answer_node, choices=choices)
+
+
+class GraphLookups:
+    """
+    Remembers the results of graph reads so that questions generated together can share them.
+    Related nodes are stored per topic and relationship type, connected nodes and similarity rows per node name.
+    Only node names are read, so no node model is built for the neighbourhood of a question.
+    """
+
+    def __init__(self, graph: MCQGraph):
+        self.graph = graph
+        self.related: Dict[Tuple[str, str], List[str]] = {}
+        self.found: Dict[str, bool] = {}
+        self.connected: Dict[str, List[str]] = {}
+        self.similar: Dict[str, List[str]] = {}
+
+    def prefetch(self, relationship: MCQRelationship):
+        """
+        Reads everything needed for a question in one go when nothing is known about its answer node yet.
+        Results already looked up are kept, so questions sharing a topic still share their related nodes.
+
+        Args:
+            relationship (MCQRelationship): the chosen edge between answer and topic
+        """
+        name = relationship.answer_node
+        if name in self.found:
+            return
+        reads = self.graph.name_reads(relationship)
+        self.found[name] = reads.found
+        if not reads.found:
+            return
+        self.related.setdefault(
+            (relationship.topic_node, relationship.type),
+            reads.related + [name],
+        )
+        self.connected[name] = reads.connected
+        self.similar[name] = sorted(reads.similarity)
+
+    def related_nodes(self, relationship: MCQRelationship) -> List[str]:
+        """
+        Names of all other nodes with the same relationship to the topic node.
+
+        Args:
+            relationship (MCQRelationship): input relationship
+
+        Returns:
+            List[str]: related node names, excluding the answer node of the relationship
+        """
+        key = (relationship.topic_node, relationship.type)
+        if key not in self.related:
+            # Store every node sharing the relationship so other answers with the same topic can reuse it
+            self.related[key] = self.graph.related_names(relationship) + [
+                relationship.answer_node
+            ]
+        return [x for x in self.related[key] if x != relationship.answer_node]
+
+    def has_node(self, name: str) -> bool:
+        """
+        Whether a node with the given name exists.
+
+        Args:
+            name (str): name to look up
+
+        Returns:
+            bool: True if the node was found
+        """
+        if name not in self.found:
+            self.found[name] = self.graph.get_node(name=name) is not None
+        return self.found[name]
+
+    def connected_nodes(self, name: str) -> List[str]:
+        """
+        Names of all nodes connected to the given node.
+
+        Args:
+            name (str): name of the node
+
+        Returns:
+            List[str]: connected node names
+        """
+        if name not in self.connected:
+            self.connected[name] = self.graph.connected_names(name)
+        return self.connected[name]
+
+    def similar_nodes(self, name: str) -> List[str]:
+        """
+        Sorted names of nodes in the similarity matrix of the given node.
+
+        Args:
+            name (str): name of the node
+
+        Returns:
+            List[str]: similar node names
+        """
+        if name not in self.similar:
+            self.similar[name] = sorted(
+                self.graph.similarity_matrix(MCQNode(name=name))
+            )
+        return self.similar[name]
 
 
 class MCQBuilder:
@@ -16,73 +249,255 @@ class MCQBuilder:
 
     """
 
-    def __init__(self, graph: MCQGraph, seed: Optional[int] = None):
+    def __init__(
+        self,
+        graph: MCQGraph,
+        seed: Optional[int] = None,
+        cache: Optional[MCQCache] = None,
+    ):
         self.graph = graph
         self.seed = seed
+        # Seeded questions are looked up here before they are generated, see MCQCache
+        self.cache = cache
 
+    @staticmethod
     def __collect_nodes(
-        self, relationship: MCQRelationship
+        relationship: MCQRelationship, lookups: GraphLookups
     ) -> Tuple[List[str], List[str]]:
         """
         Collects nearby nodes and neighbours to determine distractors and all potential correct answers for given topic/edge.
 
         Args:
-            answer (str): the answer side of an edge
-            topic (str): the topic side of an edge
+            relationship (MCQRelationship): the chosen edge between answer and topic
+            lookups (GraphLookups): graph reads, possibly shared with other questions
 
         Returns:
             Tuple[List[str], List[str]]: A list of all possible answers to a question and plausible distractors
         """
+        lookups.prefetch(relationship)
+
         # Answers are all other nodes that connect to this given topic in the same direction.
-        answer_nodes = [x.name for x in self.graph.related_nodes(relationship)]
-        answer_node = self.graph.get_node(name=relationship.answer_node)
-        if answer_node is None:
+        answer_nodes = lookups.related_nodes(relationship)
+        if not lookups.has_node(relationship.answer_node):
             raise ValueError(
                 'Unable to find randomly selected answer node in database.'
             )
 
         # Nodes to exclude from distractors include any connected nodes to the chosen answer node
-        exclusions = [x.name for x in self.graph.connected_nodes(answer_node)]
+        exclusions = lookups.connected_nodes(relationship.answer_node)
 
         # Distractors are taken from nodes with high similarity near to the chosen answer node
-        similar_nodes = sorted(self.graph.similarity_matrix(answer_node))
-
-        distractors = [
-            x
-            for x in similar_nodes
-            if x not in answer_nodes
-            and x not in exclusions
-            and x != relationship.answer_node
-            and x != relationship.topic_node
-        ]
+        similar_nodes = lookups.similar_nodes(relationship.answer_node)
+
+        distractors = choose_distractors(
+            relationship, answer_nodes, exclusions, similar_nodes
+        )
         return answer_nodes, distractors
 
-    def generate(self) -> MCQ:
+    def __build(
+        self,
+        relationship: MCQRelationship,
+        lookups: GraphLookups,
+        rng: random.Random,
+        seed: Optional[int] = None,
+        fake_words: Optional[FakeWordBank] = None,
+    ) -> MCQ:
         """
-        Generate answer, topic and distractors.
+        Build a question from a chosen relationship.
+
+        Args:
+            relationship (MCQRelationship): the chosen edge between answer and topic
+            lookups (GraphLookups): graph reads, possibly shared with other questions
+            rng (random.Random): random number generator for this request
+            seed (Optional[int]): seed of the question, see compose_mcq
+            fake_words (Optional[FakeWordBank]): bank to draw the fake word from, None to generate it
 
         Returns:
-            Dict[str, Union[str, List[str]]]:
+            MCQ: the generated question
         """
-        relationship = self.graph.random_relationship(seed=self.seed)
-        answer = relationship.topic_node
-        answers, distractors = self.__collect_nodes(relationship)
+        answers, distractors = self.__collect_nodes(relationship, lookups)
+        return compose_mcq(
+            relationship,
+            answers,
+            distractors,
+            fake_words,
+            rng,
+            seed,
+            self.__fill_later,
+        )
 
-        # create a fake blended word
-        fwg = FakeWordBuilder(pool=answers + distractors, seed=self.seed)
-        fakes = fwg.generate(filter_list=[answer] + distractors, limit=1)
+    def __fill_later(
+        self,
+        relationship: MCQRelationship,
+        answers: List[str],
+        distractors: List[str],
+    ):
+        """
+        Fills the bank of a relationship in the background, once per relationship until its nodes change.
+
+        Args:
+            relationship (MCQRelationship): the relationship the bank had no fake words for
+            answers (List[str]): all other nodes with the same relationship to the topic
+            distractors (List[str]): plausible distractors
+        """
+        if self.graph.fake_words.claim(relationship):
+            fake_word_filler.submit(
+                self.__fill,
+                relationship,
+                answers,
+                distractors,
+                self.graph.version,
+            )
+
+    def __fill(
+        self,
+        relationship: MCQRelationship,
+        answers: List[str],
+        distractors: List[str],
+        version: int,
+    ):
+        """
+        Fills the bank of a relationship unless the graph has changed since its question was built.
+
+        Args:
+            relationship (MCQRelationship): the relationship to fill
+            answers (List[str]): all other nodes with the same relationship to the topic
+            distractors (List[str]): plausible distractors
+            version (int): version of the graph the answers and distractors were read from
+        """
+        words = relationship_fake_words(relationship, answers, distractors)
+        if self.graph.version == version:
+            self.graph.fake_words.put(relationship, words)
+
+    def generate(
+        self,
+        topic: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> MCQ:
+        """
+        Generate answer, topic and distractors, seeded questions are served from the cache if one is given.
+        Questions can be limited to one topic or relationship type, these are not cached.
+
+        Args:
+            topic (Optional[str]): only ask about this node, the answer node of the chosen relationship
+            relationship_type (Optional[str]): only choose relationships of this type
+
+        Raises:
+            ValueError: if no relationship matches the topic and type
+
+        Returns:
+            MCQ: the generated question
+        """
+        filtered = topic is not None or relationship_type is not None
+        if self.cache is None or self.seed is None or filtered:
+            return self.__generate(topic, relationship_type)
+        question = self.cache.get(self.graph, self.seed)
+        if question is None:
+            version = self.graph.version
+            question = self.__generate()
+            self.cache.put(self.graph, version, self.seed, question)
+        return question
+
+    def __generate(
+        self,
+        topic: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> MCQ:
+        """
+        Generate a question without looking in the cache.
+
+        Args:
+            topic (Optional[str]): only ask about this node
+            relationship_type (Optional[str]): only choose relationships of this type
+
+        Returns:
+            MCQ: the generated question
+        """
+        # Each request draws from its own generator, so concurrent requests never share random state
+        rng = random.Random(self.seed)
+        relationship = self.graph.random_relationship(
+            rng=rng, answer_node=topic, relationship_type=relationship_type
+        )
+        return self.__build(
+            relationship,
+            GraphLookups(self.graph),
+            rng,
+            self.seed,
+            self.graph.fake_words,
+        )
+
+    def generate_many(
+        self,
+        n: int,
+        unique: bool = True,
+        topic: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> Generator[MCQ, None, None]:
+        """
+        Generate several questions, sharing graph reads between them.
+        Questions are yielded as they are built so they can be streamed.
+
+        Args:
+            n (int): number of questions to generate
+            unique (bool, optional): choose relationships without replacement so each question is distinct,
+                the output is then capped at the number of matching relationships. Defaults to True.
+            topic (Optional[str]): only ask about this node, the answer node of the chosen relationships
+            relationship_type (Optional[str]): only choose relationships of this type
+
+        Raises:
+            ValueError: if no relationship matches the topic and type
 
-        # shuffle the answer, distractors and fakes
-        random.seed(self.seed)
-        distractors = (
-            distractors
-            if len(distractors) < 2
-            else random.sample(distractors, 2)
+        Yields:
+            MCQ: a generated question
+        """
+        rng = random.Random(self.seed)
+        relationships = self.graph.random_relationships(
+            n,
+            unique=unique,
+            rng=rng,
+            answer_node=topic,
+            relationship_type=relationship_type,
         )
+        lookups = GraphLookups(self.graph)
+        # Seeded batches draw every question from the one seeded generator, and generate their fake words
+        # so they do not depend on how far the bank has been filled
+        fake_words = self.graph.fake_words if self.seed is None else None
+        for relationship in relationships:
+            yield self.__build(
+                relationship, lookups, rng, fake_words=fake_words
+            )
+
+    def fill_fake_word_bank(
+        self,
+        relationships: Optional[Iterable[MCQRelationship]] = None,
+        size: int = FAKE_WORDS_PER_RELATIONSHIP,
+        stop: Optional[threading.Event] = None,
+    ):
+        """
+        Generates fake words for relationships ahead of time and stores them in the bank of the graph.
+        Can be run offline before serving or in a background thread while the graph is being served.
 
-        choices = [answer] + distractors + fakes
-        random.seed(self.seed)
-        random.shuffle(choices)
-        return MCQ(
-            answer=answer, topic=relationship.answer_node, choices=choices
+        Args:
+            relationships (Optional[Iterable[MCQRelationship]]): relationships to fill, defaults to every relationship in the graph
+            size (int, optional): the most fake words kept per relationship. Defaults to FAKE_WORDS_PER_RELATIONSHIP.
+            stop (Optional[threading.Event]): when set, filling stops before the next relationship
+        """
+        lookups = GraphLookups(self.graph)
+        for relationship in (
+            self.graph.relationships()
+            if relationships is None
+            else relationships
+        ):
+            if stop is not None and stop.is_set():
+                break
+            answers, distractors = self.__collect_nodes(relationship, lookups)
+            self.graph.fake_words.put(
+                relationship,
+                relationship_fake_words(
+                    relationship, answers, distractors, size
+                ),
+            )
+        logger.info(
+            'Filled fake word bank for %s relationships.',
+            len(self.graph.fake_words),
         )
@@ -0,0 +1,129 @@
+"""A cache of seeded questions so repeated and shared quiz links are served without generating them again"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph
+from app.models import MCQ, CacheStats
+
+logger = create_logger(__name__)
+
+
+# pylint: disable=too-many-instance-attributes
+class MCQCache:
+    """
+    A least recently used cache of questions keyed on graph version and seed, as MCQBuilder is deterministic for both.
+    Filling the fake word bank does not change the version, and it does not need to, as a seeded question is the same
+    whether its fake word comes from the bank or is generated live, in this process or in a worker process.
+    Entries expire after a time to live, and every entry is dropped once the graph changes or a different graph is served.
+    """
+
+    def __init__(self, size: int = 1024, ttl: Optional[float] = 3600.0):
+        """
+        Args:
+            size (int, optional): the most questions held. Defaults to 1024.
+            ttl (Optional[float]): seconds an entry is served for, None keeps entries until they are evicted.
+                Defaults to 3600.0.
+
+        Raises:
+            ValueError: if the size is negative
+        """
+        if size < 0:
+            logger.error('Invalid Input Error: cache size %s.', size)
+            raise ValueError(
+                'Invalid Input Error: the cache size must not be negative.'
+            )
+        self.size = size
+        self.ttl = ttl
+        self.graph: Optional[MCQGraph] = None
+        self.version = 0
+        # (graph version, seed) -> (expiry time, question), least recently used first
+        self.entries: 'OrderedDict[Tuple[int, int], Tuple[float, MCQ]]' = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __check(self, graph: MCQGraph):
+        """
+        Drops every entry if the graph has changed or been replaced since they were stored. Called while holding the lock.
+
+        Args:
+            graph (MCQGraph): the graph being served
+        """
+        if graph is not self.graph or graph.version != self.version:
+            self.entries.clear()
+            self.graph = graph
+            self.version = graph.version
+
+    def get(self, graph: MCQGraph, seed: int) -> Optional[MCQ]:
+        """
+        The question stored for a seed of the current version of a graph.
+
+        Args:
+            graph (MCQGraph): the graph the question should come from
+            seed (int): the seed of the question
+
+        Returns:
+            Optional[MCQ]: the question, or None if it has to be generated
+        """
+        with self.lock:
+            self.__check(graph)
+            key = (graph.version, seed)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, graph: MCQGraph, version: int, seed: int, question: MCQ):
+        """
+        Stores a question, evicting the least recently used one if the cache is full.
+
+        Args:
+            graph (MCQGraph): the graph the question was generated from
+            version (int): the version of the graph when generating started, the question is not stored if it has changed since
+            seed (int): the seed of the question
+            question (MCQ): the question
+        """
+        with self.lock:
+            self.__check(graph)
+            if version != graph.version or not self.size:
+                return
+            expires = (
+                float('inf')
+                if self.ttl is None
+                else time.monotonic() + self.ttl
+            )
+            self.entries[(version, seed)] = (expires, question)
+            self.entries.move_to_end((version, seed))
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> CacheStats:
+        """
+        How full the cache is and how often it has been hit.
+
+        Returns:
+            CacheStats: cache metrics
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return CacheStats(
+                size=self.size,
+                entries=len(self.entries),
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=self.hits / lookups if lookups else 0.0,
+            )
@@ -0,0 +1,239 @@
+"""A pool of questions generated ahead of time so requests do not wait for the graph"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from app.core.mcq_builder import MCQBuilder
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import GraphChange, MCQGraph
+from app.models import MCQ, PoolStats
+
+logger = create_logger(__name__)
+
+
+# pylint: disable=too-many-instance-attributes
+class MCQPool:
+    """
+    A bounded ring buffer of ready-made questions for one graph, refilled by a background thread.
+    Taking a question wakes the thread once the pool drops below the low watermark, it then fills the pool up to the high watermark.
+    Questions are dropped when a change to the graph reaches any of their choices, and all of them when a different graph is served.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        capacity: int = 64,
+        low_watermark: Optional[int] = None,
+        high_watermark: Optional[int] = None,
+        seed: Optional[int] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            capacity (int, optional): the most questions held. Defaults to 64.
+            low_watermark (Optional[int]): refilling starts below this depth, defaults to a quarter of the capacity
+            high_watermark (Optional[int]): refilling stops at this depth, defaults to the capacity
+            seed (Optional[int]): seeds the questions generated, for repeatable pools
+            background (bool, optional): refill in a background thread, otherwise the pool is only filled by calling fill.
+                Defaults to True.
+
+        Raises:
+            ValueError: if the watermarks do not fit within the capacity
+        """
+        high = capacity if high_watermark is None else high_watermark
+        low = capacity // 4 if low_watermark is None else low_watermark
+        if not 0 <= low <= high <= capacity:
+            logger.error(
+                'Invalid Input Error: watermarks %s and %s do not fit a capacity of %s.',
+                low,
+                high,
+                capacity,
+            )
+            raise ValueError(
+                'Invalid Input Error: watermarks must satisfy 0 <= low <= high <= capacity.'
+            )
+        self.capacity = capacity
+        self.low_watermark = low
+        self.high_watermark = high
+        self.background = background
+        self.graph: Optional[MCQGraph] = None
+        self.questions: Deque[MCQ] = deque(maxlen=capacity)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Set when the pool wants refilling, the background thread sleeps on it
+        self.wanted = threading.Event()
+        self.stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.filled = 0
+        self.served = 0
+        self.fallbacks = 0
+        self.discarded = 0
+        self.fill_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __switch(self, graph: MCQGraph):
+        """
+        Serves questions for a different graph, dropping those of the previous one. Called while holding the lock.
+
+        Args:
+            graph (MCQGraph): the graph now being served
+        """
+        if self.graph is not None:
+            self.graph.unsubscribe(self.__changed)
+        graph.subscribe(self.__changed)
+        self.graph = graph
+        self.discarded += len(self.questions)
+        self.questions.clear()
+        self.wanted.set()
+
+    def attach(self, graph: MCQGraph):
+        """
+        Starts filling the pool for a graph ahead of the first request.
+
+        Args:
+            graph (MCQGraph): the graph being served
+        """
+        with self.lock:
+            if graph is not self.graph:
+                self.__switch(graph)
+        if self.background:
+            self.start()
+
+    def __changed(self, change: GraphChange):
+        """
+        Drops the questions a change to the graph may have made wrong and asks for a refill.
+
+        Args:
+            change (GraphChange): the change
+        """
+        with self.lock:
+            if change.affected is None:
+                kept = []
+            else:
+                kept = [
+                    x
+                    for x in self.questions
+                    if x.topic not in change.affected
+                    and change.affected.isdisjoint(x.choices)
+                ]
+            self.discarded += len(self.questions) - len(kept)
+            self.questions.clear()
+            self.questions.extend(kept)
+            if len(self.questions) < self.low_watermark:
+                self.wanted.set()
+
+    def pop(self, graph: MCQGraph) -> Optional[MCQ]:
+        """
+        Takes a ready-made question for the given graph.
+        The first call for a graph switches the pool over to it and starts the background thread if it is not running.
+
+        Args:
+            graph (MCQGraph): the graph the question should come from
+
+        Returns:
+            Optional[MCQ]: a question, or None if the pool is empty and the caller should generate one itself
+        """
+        with self.lock:
+            if graph is not self.graph:
+                self.__switch(graph)
+            if self.questions:
+                self.served += 1
+                question: Optional[MCQ] = self.questions.popleft()
+            else:
+                self.fallbacks += 1
+                question = None
+            if len(self.questions) < self.low_watermark:
+                self.wanted.set()
+        if self.background and self.thread is None:
+            self.start()
+        return question
+
+    def fill(self):
+        """
+        Generates questions until the pool reaches its high watermark.
+        Filling stops early if the pool is closed, and questions being generated when the graph changes are dropped.
+        """
+        with self.lock:
+            graph = self.graph
+            needed = self.high_watermark - len(self.questions)
+        if graph is None or needed <= 0:
+            return
+        version = graph.version
+        builder = MCQBuilder(graph, seed=self.rng.getrandbits(64))
+        start = time.perf_counter()
+        filled = 0
+        for question in builder.generate_many(needed, unique=False):
+            with self.lock:
+                if self.graph is not graph or graph.version != version:
+                    # Reads made before the change may be stale, the listener has already asked for a refill
+                    self.discarded += 1
+                    break
+                self.questions.append(question)
+                filled += 1
+            if self.stop.is_set():
+                break
+        with self.lock:
+            self.filled += filled
+            self.fill_seconds += time.perf_counter() - start
+
+    def __run(self):
+        """Refills the pool each time it asks for it until the pool is closed."""
+        while not self.stop.is_set():
+            self.wanted.wait()
+            self.wanted.clear()
+            if self.stop.is_set():
+                break
+            try:
+                self.fill()
+            # Requests fall back to generating their own questions, the next one to find the pool low retries
+            # pylint: disable=broad-except
+            except Exception as e:
+                logger.warning(
+                    'Failed to fill the question pool: %s',
+                    str(e),
+                    extra={'exception': e},
+                )
+
+    def start(self):
+        """Starts the background thread that refills the pool, if it has not been started."""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.__run, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        """
+        Stops the background thread and waits for it, a daemon thread killed at interpreter exit
+        while inside native code aborts the process.
+        """
+        self.stop.set()
+        self.wanted.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def stats(self) -> PoolStats:
+        """
+        The depth of the pool and how it has been filled and served.
+
+        Returns:
+            PoolStats: pool metrics
+        """
+        with self.lock:
+            return PoolStats(
+                capacity=self.capacity,
+                depth=len(self.questions),
+                low_watermark=self.low_watermark,
+                high_watermark=self.high_watermark,
+                filled=self.filled,
+                served=self.served,
+                fallbacks=self.fallbacks,
+                discarded=self.discarded,
+                fill_rate=self.filled / self.fill_seconds
+                if self.fill_seconds
+                else 0.0,
+            )
@@ -0,0 +1,187 @@
+"""Question generation in worker processes for MCQBot"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from app.core.mcq_builder import MCQBuilder
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph
+from app.models import MCQ
+
+logger = create_logger(__name__)
+
+# The graph of this worker process, loaded once by init_worker
+worker_graph: Optional[MCQGraph] = None
+
+
+def init_worker(loader: Callable[[], MCQGraph]):
+    """
+    Loads the graph of a worker process when it starts. Its fake word bank is the one of the snapshot if the loader maps one,
+    otherwise it is filled relationship by relationship in the background as questions miss it, so workers start at once.
+
+    Args:
+        loader (Callable[[], MCQGraph]): builds or maps the graph, it must be importable by name so it can be sent to the worker
+    """
+    global worker_graph  # pylint: disable=global-statement
+    worker_graph = loader()
+
+
+def generate_in_worker(
+    seed: Optional[int],
+    topic: Optional[str] = None,
+    relationship_type: Optional[str] = None,
+) -> MCQ:
+    """
+    Generates a question from the graph of this worker process.
+
+    Args:
+        seed (Optional[int]): seeds the question
+        topic (Optional[str]): only ask about this node
+        relationship_type (Optional[str]): only choose relationships of this type
+
+    Returns:
+        MCQ: the generated question
+    """
+    if worker_graph is None:
+        logger.error('Worker process used before loading a graph.')
+        raise ValueError('The worker process has not loaded a graph.')
+    return MCQBuilder(worker_graph, seed=seed).generate(
+        topic, relationship_type
+    )
+
+
+def generate_many_in_worker(
+    n: int, unique: bool, seed: Optional[int]
+) -> List[MCQ]:
+    """
+    Generates several questions from the graph of this worker process, sharing graph reads between them.
+
+    Args:
+        n (int): number of questions to generate
+        unique (bool): choose relationships without replacement so each question is distinct
+        seed (Optional[int]): seeds the questions
+
+    Returns:
+        List[MCQ]: the generated questions
+    """
+    if worker_graph is None:
+        logger.error('Worker process used before loading a graph.')
+        raise ValueError('The worker process has not loaded a graph.')
+    return list(MCQBuilder(worker_graph, seed=seed).generate_many(n, unique))
+
+
+class ProcessMCQBuilder:
+    """
+    Generates questions in a pool of worker processes, so the CPU-bound work of MCQBuilder neither blocks
+    the event loop nor shares the GIL of the api process.
+    Each worker loads its own copy of the graph once with the loader and fills its fake word bank as questions miss it,
+    a graph snapshot loader lets every worker share the pages of one memory-mapped file and its bank instead.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], MCQGraph],
+        workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            loader (Callable[[], MCQGraph]): builds or maps the graph in each worker,
+                it must be importable by name so it can be sent to the workers
+            workers (Optional[int]): number of worker processes, defaults to the number of processors
+        """
+        self.loader = loader
+        self.workers = workers or os.cpu_count() or 1
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+
+    def __current(self) -> ProcessPoolExecutor:
+        """
+        The pool of worker processes, started on first use.
+
+        Returns:
+            ProcessPoolExecutor: the worker processes
+        """
+        executor = self.executor
+        if executor is None:
+            with self.lock:
+                if self.executor is None:
+                    # Workers are spawned rather than forked, forking while the api holds locks in other threads can deadlock them
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=init_worker,
+                        initargs=(self.loader,),
+                    )
+                    logger.info(
+                        'Started %s question worker processes.', self.workers
+                    )
+                executor = self.executor
+        return executor
+
+    async def generate(
+        self,
+        seed: Optional[int] = None,
+        topic: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> MCQ:
+        """
+        Generate answer, topic and distractors in a worker process.
+
+        Args:
+            seed (Optional[int]): seeds the question
+            topic (Optional[str]): only ask about this node, the answer node of the chosen relationship
+            relationship_type (Optional[str]): only choose relationships of this type
+
+        Raises:
+            ValueError: if no relationship matches the topic and type
+
+        Returns:
+            MCQ: the generated question
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.__current(),
+            generate_in_worker,
+            seed,
+            topic,
+            relationship_type,
+        )
+
+    async def generate_many(
+        self, n: int, unique: bool = True, seed: Optional[int] = None
+    ) -> List[MCQ]:
+        """
+        Generate several questions in one worker process, sharing graph reads between them.
+
+        Args:
+            n (int): number of questions to generate
+            unique (bool, optional): choose relationships without replacement so each question is distinct. Defaults to True.
+            seed (Optional[int]): seeds the questions
+
+        Returns:
+            List[MCQ]: the generated questions
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.__current(), generate_many_in_worker, n, unique, seed
+        )
+
+    def reload(self):
+        """
+        Replaces the worker processes so the next questions come from a freshly loaded graph.
+        Questions already being generated finish in the old workers.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def close(self):
+        """Stops the worker processes, waiting for questions already being generated."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
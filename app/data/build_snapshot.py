@@ -0,0 +1,43 @@
+"""
+Builds the sample graph, or a graph streamed from an edge file, with its fake word banks
+and writes it to a snapshot file that the app can load with GRAPH_SNAPSHOT.
+
+Run with: python -m app.data.build_snapshot sample_graph.mcqg [--edges edges.jsonl]
+"""
+import argparse
+
+from app.core.mcq_builder import FAKE_WORDS_PER_RELATIONSHIP, MCQBuilder
+from app.data.sample_graph import generate_graph
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.ingest import ingest
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.snapshot import write_snapshot
+
+
+def main():
+    """Writes the sample graph snapshot to the given path."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument(
+        '--edges', help='a jsonl or csv edge file to build the graph from'
+    )
+    parser.add_argument(
+        '--fake-words',
+        type=int,
+        default=FAKE_WORDS_PER_RELATIONSHIP,
+        help='the most fake words kept per relationship, seeded questions only match live generation with the default',
+    )
+    args = parser.parse_args()
+
+    graph: MCQGraph
+    if args.edges:
+        graph = CSRGraph()
+        ingest(graph, args.edges)
+    else:
+        graph = generate_graph()
+    MCQBuilder(graph).fill_fake_word_bank(size=args.fake_words)
+    write_snapshot(graph, args.path)
+
+
+if __name__ == '__main__':
+    main()
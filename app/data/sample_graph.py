@@ -59,4 +59,5 @@ def generate_graph() -> NXGraph:
     }
     graph = NXGraph()
     graph.fill_graph(data)
+    graph.build_similarity_index()
     return graph
@@ -0,0 +1,713 @@
+"""Object for storing a graph in memory as integer arrays"""
+import random
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import networkx as nx
+import numpy as np
+from app.graphs.edge_matrices import EdgeMatrices, csr_row, within_hops
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph, NameReads, check_duplicates
+from app.graphs.similarity_index import CANDIDATE_RADIUS
+from app.models import MCQNode, MCQRelationship
+
+logger = create_logger(__name__)
+
+
+def deduplicate(edges: np.ndarray, num_nodes: int) -> np.ndarray:
+    """
+    Keeps one edge per pair of nodes, at the position the pair was first added with the type it was last given,
+    then groups the edges by answer node so they are in the order networkx lists the edges of a DiGraph.
+
+    Args:
+        edges (np.ndarray): answer node, topic node and type ids of each edge
+        num_nodes (int): number of nodes in the graph
+
+    Returns:
+        np.ndarray: the deduplicated edges
+    """
+    keys = edges[:, 0].astype(np.int64) * num_nodes + edges[:, 1]
+    _, first = np.unique(keys, return_index=True)
+    _, last_reversed = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - last_reversed
+    order = np.argsort(first, kind='stable')
+    deduplicated = edges[first[order]]
+    deduplicated[:, 2] = edges[last[order], 2]
+    return deduplicated[np.argsort(deduplicated[:, 0], kind='stable')]
+
+
+class Interner:
+    """Assigns consecutive integer ids to strings in the order they are first seen."""
+
+    def __init__(self, names: Optional[List[str]] = None):
+        """
+        Args:
+            names (Optional[List[str]]): distinct strings to start with, numbered in order
+        """
+        self.names: List[str] = names or []
+        self.ids: Dict[str, int] = {x: i for i, x in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def name(self, name_id: int) -> str:
+        """
+        The string with the given id.
+
+        Args:
+            name_id (int): its id
+
+        Returns:
+            str: the string
+        """
+        return self.names[name_id]
+
+    def intern(self, name: str) -> int:
+        """
+        The id of a string, assigning the next id if it has not been seen.
+
+        Args:
+            name (str): the string
+
+        Returns:
+            int: its id
+        """
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def get(self, name: str) -> Optional[int]:
+        """
+        The id of a string without assigning one.
+
+        Args:
+            name (str): the string
+
+        Returns:
+            Optional[int]: its id, None if it has not been seen
+        """
+        return self.ids.get(name)
+
+
+class StringColumn:
+    """
+    Strings stored as utf-8 bytes end to end with an offset array, so they can live in a shared memory map.
+    Strings are only decoded when they are read.
+    """
+
+    def __init__(
+        self,
+        offsets: np.ndarray,
+        data: np.ndarray,
+        missing: Optional[np.ndarray] = None,
+    ):
+        """
+        Args:
+            offsets (np.ndarray): start of each string in data, followed by the end of the last
+            data (np.ndarray): the encoded strings as bytes
+            missing (Optional[np.ndarray]): flags strings that are None
+        """
+        self.offsets = offsets
+        self.data = data
+        self.missing = missing
+
+    @staticmethod
+    def encode(
+        strings: Sequence[Optional[str]],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Encodes strings into the arrays of a column.
+
+        Args:
+            strings (Sequence[Optional[str]]): the strings, None is stored as an empty string flagged missing
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: offsets, data and missing flags
+        """
+        encoded = [(x or '').encode() for x in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        missing = np.array([x is None for x in strings], dtype=np.uint8)
+        return offsets, data, missing
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self.missing is not None and self.missing[index]:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode()
+
+
+class StringTable:
+    """
+    A read only Interner over a StringColumn, ids are found by binary search over the strings in sorted order.
+    """
+
+    def __init__(self, column: StringColumn, order: np.ndarray):
+        """
+        Args:
+            column (StringColumn): distinct strings by id
+            order (np.ndarray): ids in order of their strings
+        """
+        self.column = column
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.column)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def name(self, name_id: int) -> str:
+        """
+        The string with the given id.
+
+        Args:
+            name_id (int): its id
+
+        Returns:
+            str: the string
+        """
+        return self.column[name_id] or ''
+
+    def get(self, name: str) -> Optional[int]:
+        """
+        The id of a string.
+
+        Args:
+            name (str): the string
+
+        Returns:
+            Optional[int]: its id, None if it is not in the table
+        """
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(self.order[middle]) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.order) and self.name(self.order[low]) == name:
+            return int(self.order[low])
+        return None
+
+
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
+class CSRGraph(MCQGraph):
+    """
+    This object stores a graph in memory with node names and relationship types interned to integers.
+    Edges are kept in an integer array and read through compressed sparse row matrices, so lookups are array slices.
+    Like NXGraph a pair of nodes holds a single relationship, a new type for the pair replaces the old one, and edges are
+    kept in the order networkx lists them so a seed picks the same relationship from either graph.
+    The matrices are rebuilt on the first read after a write, so writes should be batched.
+    Writes and rebuilds hold a lock, so a rebuild never merges the pending edges of a write that is still going on.
+    Similarity rows are kept across rebuilds unless a change reaches them.
+    """
+
+    def __init__(self, top_k: int = 20):
+        """
+        Args:
+            top_k (int, optional): the number of most similar nodes listed first by similarity_matrix. Defaults to 20.
+        """
+        super().__init__()
+        self.top_k = top_k
+        # Node names and infos are read only tables when the graph is loaded from a snapshot, until it is written to
+        self.names: Union[Interner, StringTable] = Interner()
+        self.infos: Union[List[Optional[str]], StringColumn] = []
+        self.types = Interner()
+        # Answer node, topic node and type ids of each edge, grouped by answer node in node order,
+        # then in the order each pair was first added
+        self.edges = np.zeros((0, 3), dtype=np.int32)
+        self.pending: List[Tuple[int, int, int]] = []
+        # Built on the first read after a write
+        self.matrices: Optional[EdgeMatrices] = None
+        # Shared with every rebuild of the matrices so rows a change does not reach are kept
+        self.similarity_rows: Dict[int, List[Tuple[int, float]]] = {}
+        # Held by writes and by rebuilds of the matrices, reentrant as writes rebuild the matrices they read from
+        self.lock = threading.RLock()
+        logger.info('New CSR graph object created.')
+
+    # pylint: disable=too-many-arguments
+    def attach(
+        self,
+        names: StringTable,
+        infos: StringColumn,
+        types: Interner,
+        edges: np.ndarray,
+        matrices: EdgeMatrices,
+    ):
+        """
+        Replaces the content of the graph with arrays that have already been built, such as those read from a snapshot.
+        The arrays are used as they are, so arrays backed by a memory map are shared rather than copied.
+
+        Args:
+            names (StringTable): node names by id
+            infos (StringColumn): node infos by id
+            types (Interner): relationship types by id
+            edges (np.ndarray): answer node, topic node and type ids of each edge, one edge per pair
+            matrices (EdgeMatrices): the matrices built from the edges
+        """
+        with self.lock:
+            self.names = names
+            self.infos = infos
+            self.types = types
+            self.edges = edges
+            self.pending = []
+            self.mark_changed()
+            self.matrices = matrices
+            self.similarity_rows = matrices.similarity_rows
+
+    def __thaw(self) -> Tuple[Interner, List[Optional[str]]]:
+        """
+        Copies read only node tables into ones that can be written to.
+
+        Returns:
+            Tuple[Interner, List[Optional[str]]]: the node names and infos
+        """
+        if not isinstance(self.names, Interner) or not isinstance(
+            self.infos, list
+        ):
+            self.names = Interner(
+                [self.names.name(x) for x in range(len(self.names))]
+            )
+            self.infos = [self.infos[x] for x in range(len(self.infos))]
+        return self.names, self.infos
+
+    def freeze(self) -> EdgeMatrices:
+        """
+        Merges pending edges and rebuilds the matrices if anything has been written since the last read.
+
+        Returns:
+            EdgeMatrices: the current matrices
+        """
+        matrices = self.matrices
+        if matrices is not None:
+            return matrices
+        with self.lock:
+            if self.matrices is not None:
+                return self.matrices
+            names, _ = self.__thaw()
+            self.edges = deduplicate(
+                np.concatenate(
+                    [
+                        self.edges,
+                        np.array(self.pending, dtype=np.int32).reshape(-1, 3),
+                    ]
+                ),
+                len(names),
+            )
+            self.pending = []
+            matrices = EdgeMatrices.build(self.edges, names.names)
+            matrices.similarity_rows = self.similarity_rows
+            # Only assigned once complete, so a read without the lock never sees half built matrices
+            self.matrices = matrices
+            return matrices
+
+    def neighbourhood(self, names: Set[str]) -> Optional[Set[str]]:
+        matrices = self.freeze()
+        ids = [x for x in map(self.names.get, names) if x is not None]
+        stale = within_hops(
+            matrices.neighbours,
+            np.array(ids, dtype=np.int32),
+            CANDIDATE_RADIUS,
+        )
+        return set(names) | {self.names.name(x) for x in stale.tolist()}
+
+    def __changed(self, names: Optional[Set[str]] = None):
+        """
+        Records a change to the given nodes, dropping the similarity rows and fake words it may have made stale.
+
+        Args:
+            names (Optional[Set[str]]): nodes that were added or removed or had relationships added or removed,
+                everything is treated as changed if not given
+        """
+        affected = self.mark_changed(names)
+        if affected is None:
+            self.similarity_rows.clear()
+            return
+        for name in affected:
+            node_id = self.names.get(name)
+            if node_id is not None:
+                self.similarity_rows.pop(node_id, None)
+
+    def build_similarity_index(self):
+        """Builds the similarity rows of every node so that no lookup has to build one."""
+        matrices = self.freeze()
+        for node_id in range(len(self.names)):
+            matrices.similar(node_id, self.top_k)
+
+    def __node(self, node_id: int) -> MCQNode:
+        """
+        The node with the given id.
+
+        Args:
+            node_id (int): id of the node
+
+        Returns:
+            MCQNode: the node
+        """
+        return MCQNode.construct(
+            name=self.names.name(node_id), info=self.infos[node_id]
+        )
+
+    def relationship_at(self, position: int) -> MCQRelationship:
+        """
+        The relationship at a position of the edge array.
+
+        Args:
+            position (int): position of the edge
+
+        Returns:
+            MCQRelationship: the relationship
+        """
+        self.freeze()
+        answer_id, topic_id, type_id = self.edges[position].tolist()
+        return MCQRelationship.construct(
+            answer_node=self.names.name(answer_id),
+            topic_node=self.names.name(topic_id),
+            type=self.types.name(type_id),
+        )
+
+    def position(self, relationship: MCQRelationship) -> Optional[int]:
+        """
+        The position of a relationship in the edge array.
+
+        Args:
+            relationship (MCQRelationship): the relationship
+
+        Returns:
+            Optional[int]: its position, None if the graph does not have it
+        """
+        matrices = self.freeze()
+        answer_id = self.names.get(relationship.answer_node)
+        topic_id = self.names.get(relationship.topic_node)
+        type_id = self.types.get(relationship.type)
+        if answer_id is None or topic_id is None or type_id is None:
+            return None
+        position = matrices.position(answer_id, topic_id)
+        if position is None or self.edges[position, 2] != type_id:
+            return None
+        return position
+
+    def delete_all(self):
+        with self.lock:
+            self.names = Interner()
+            self.infos = []
+            self.types = Interner()
+            self.edges = np.zeros((0, 3), dtype=np.int32)
+            self.pending = []
+            self.matrices = None
+            self.__changed()
+
+    def create_nodes(self, nodes: List[MCQNode]):
+        with self.lock:
+            check_duplicates(
+                nodes, [node for node in nodes if node.name in self.names]
+            )
+            names, infos = self.__thaw()
+            for node in nodes:
+                names.intern(node.name)
+                infos.append(node.info)
+            self.matrices = None
+            self.__changed({node.name for node in nodes})
+            logger.info('Created %s nodes.', len(nodes))
+
+    def create_relationships(self, relationships: List[MCQRelationship]):
+        with self.lock:
+            names, _ = self.__thaw()
+            changed: Set[str] = set()
+            for relationship in relationships:
+                answer_id = names.get(relationship.answer_node)
+                topic_id = names.get(relationship.topic_node)
+                if answer_id is None or topic_id is None:
+                    logger.warning(
+                        'Failed to create relationship: %s',
+                        str(relationship),
+                        extra={'relationship': relationship},
+                    )
+                    continue
+                self.pending.append(
+                    (answer_id, topic_id, self.types.intern(relationship.type))
+                )
+                changed.update(
+                    (relationship.answer_node, relationship.topic_node)
+                )
+            self.matrices = None
+            self.__changed(changed)
+            logger.info(
+                'Created %s relationships in the database.', len(relationships)
+            )
+
+    def merge_nodes(self, nodes: List[MCQNode]):
+        with self.lock:
+            self.create_nodes(
+                [node for node in nodes if node.name not in self.names]
+            )
+
+    def merge_relationships(self, relationships: List[MCQRelationship]):
+        # Looked up together in the pair keys of the matrices rather than rebuilding or checking one at a time
+        with self.lock:
+            matrices = self.freeze()
+            ids = [
+                (
+                    self.names.get(x.answer_node),
+                    self.names.get(x.topic_node),
+                    self.types.get(x.type),
+                )
+                for x in relationships
+            ]
+            known = np.flatnonzero([None not in x for x in ids])
+            known_ids = np.array(
+                [ids[x] for x in known.tolist()], dtype=np.int64
+            ).reshape(-1, 3)
+            positions = matrices.positions(known_ids[:, 0], known_ids[:, 1])
+            linked = np.flatnonzero(positions >= 0)
+            exists = np.zeros(len(relationships), dtype=bool)
+            exists[known[linked]] = (
+                self.edges[positions[linked], 2] == known_ids[linked, 2]
+            )
+            self.create_relationships(
+                [
+                    x
+                    for x, found in zip(relationships, exists.tolist())
+                    if not found
+                ]
+            )
+
+    def remove_nodes(self, names: List[str]):
+        with self.lock:
+            matrices = self.freeze()
+            node_names, infos = self.__thaw()
+            ids = list(
+                dict.fromkeys(
+                    x for x in map(node_names.get, names) if x is not None
+                )
+            )
+            if not ids:
+                self.__changed(set())
+                return
+
+            # Neighbours are gathered first as the change reaches them through edges that are about to go
+            changed = {node_names.name(x) for x in ids}
+            for node_id in ids:
+                changed.update(
+                    node_names.name(x)
+                    for x in csr_row(matrices.neighbours, node_id).tolist()
+                )
+
+            # Surviving nodes keep their order, with ids closed up over the removed nodes
+            keep = np.ones(len(node_names), dtype=bool)
+            keep[ids] = False
+            new_ids = np.cumsum(keep, dtype=np.int64) - 1
+            edges = self.edges[keep[self.edges[:, 0]] & keep[self.edges[:, 1]]]
+            edges[:, :2] = new_ids[edges[:, :2]]
+            self.names = Interner(
+                [x for x, kept in zip(node_names.names, keep.tolist()) if kept]
+            )
+            self.infos = [x for x, kept in zip(infos, keep.tolist()) if kept]
+            self.edges = edges.astype(np.int32)
+            self.matrices = None
+            # Ids have moved so no row can be kept
+            self.similarity_rows.clear()
+            self.__changed(changed)
+            logger.info('Removed %s nodes.', len(ids))
+
+    def remove_relationships(self, relationships: List[MCQRelationship]):
+        with self.lock:
+            self.freeze()
+            keep = np.ones(len(self.edges), dtype=bool)
+            changed: Set[str] = set()
+            for relationship in relationships:
+                position = self.position(relationship)
+                if position is None or not keep[position]:
+                    continue
+                keep[position] = False
+                changed.update(
+                    (relationship.answer_node, relationship.topic_node)
+                )
+            self.edges = self.edges[keep]
+            self.matrices = None
+            self.__changed(changed)
+            logger.info(
+                'Removed %s relationships from the database.',
+                len(relationships),
+            )
+
+    def get_node(self, name: str) -> Union[MCQNode, None]:
+        node_id = self.names.get(name)
+        if node_id is None:
+            return None
+        return self.__node(node_id)
+
+    def has_relationship(self, relationship: MCQRelationship) -> bool:
+        return self.position(relationship) is not None
+
+    def __related_ids(self, relationship: MCQRelationship) -> List[int]:
+        """
+        Ids of the other answer nodes with the same relationship to the topic node.
+
+        Args:
+            relationship (MCQRelationship): input relationship
+
+        Returns:
+            List[int]: related node ids, excluding the answer node of the relationship
+        """
+        matrices = self.freeze()
+        topic_id = self.names.get(relationship.topic_node)
+        type_id = self.types.get(relationship.type)
+        if topic_id is None or type_id is None:
+            return []
+        answer_id = self.names.get(relationship.answer_node)
+        return [
+            x
+            for x in matrices.answers(topic_id, type_id).tolist()
+            if x != answer_id
+        ]
+
+    def __connected_ids(self, node_id: int) -> List[int]:
+        """
+        Ids of the topic nodes of the relationships of a node.
+
+        Args:
+            node_id (int): id of the node
+
+        Returns:
+            List[int]: connected node ids
+        """
+        matrices = self.freeze()
+        return [
+            x
+            for x in csr_row(matrices.topics, node_id).tolist()
+            if x != node_id
+        ]
+
+    def related_nodes(self, relationship: MCQRelationship) -> List[MCQNode]:
+        return [self.__node(x) for x in self.__related_ids(relationship)]
+
+    def related_names(self, relationship: MCQRelationship) -> List[str]:
+        return [self.names.name(x) for x in self.__related_ids(relationship)]
+
+    def connected_nodes(self, node: MCQNode) -> List[MCQNode]:
+        node_id = self.names.get(node.name)
+        if node_id is None:
+            raise nx.NodeNotFound(f'Source {node.name} is not in G')
+        return [self.__node(x) for x in self.__connected_ids(node_id)]
+
+    def connected_names(self, name: str) -> List[str]:
+        node_id = self.names.get(name)
+        if node_id is None:
+            return []
+        return [self.names.name(x) for x in self.__connected_ids(node_id)]
+
+    def name_reads(self, relationship: MCQRelationship) -> NameReads:
+        matrices = self.freeze()
+        node_id = self.names.get(relationship.answer_node)
+        if node_id is None:
+            return NameReads(False, [], [], {})
+        return NameReads(
+            True,
+            self.related_names(relationship),
+            [self.names.name(x) for x in self.__connected_ids(node_id)],
+            {
+                self.names.name(other): score
+                for other, score in matrices.similar(node_id, self.top_k)
+            },
+        )
+
+    def nodes(self) -> Iterator[MCQNode]:
+        for node_id in range(len(self.names)):
+            yield self.__node(node_id)
+
+    def relationships(self) -> Iterator[MCQRelationship]:
+        self.freeze()
+        for position in range(len(self.edges)):
+            yield self.relationship_at(position)
+
+    def __positions(
+        self, answer_node: Optional[str], relationship_type: Optional[str]
+    ) -> Union[range, np.ndarray]:
+        """
+        Positions of the edges a random relationship is chosen from.
+
+        Args:
+            answer_node (Optional[str]): only edges from this node
+            relationship_type (Optional[str]): only edges of this type
+
+        Raises:
+            ValueError: if there are no edges or none match the filter
+
+        Returns:
+            Union[range, np.ndarray]: edge positions
+        """
+        matrices = self.freeze()
+        if self.edges.size == 0:
+            raise ValueError('Empty Database.')
+        if answer_node is None and relationship_type is None:
+            return range(len(self.edges))
+        answer_id = (
+            None if answer_node is None else self.names.get(answer_node)
+        )
+        type_id = (
+            None
+            if relationship_type is None
+            else self.types.get(relationship_type)
+        )
+        if (answer_node is not None and answer_id is None) or (
+            relationship_type is not None and type_id is None
+        ):
+            raise ValueError('No relationships match the given filter.')
+        positions = matrices.matching(self.edges, answer_id, type_id)
+        if positions.size == 0:
+            raise ValueError('No relationships match the given filter.')
+        return positions
+
+    def random_relationship(
+        self,
+        seed: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> MCQRelationship:
+        positions = self.__positions(answer_node, relationship_type)
+        rng = rng or random.Random(seed)
+        return self.relationship_at(
+            int(positions[rng.randrange(len(positions))])
+        )
+
+    # pylint: disable=too-many-arguments
+    def random_relationships(
+        self,
+        n: int,
+        seed: Optional[int] = None,
+        unique: bool = True,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> List[MCQRelationship]:
+        positions = self.__positions(answer_node, relationship_type)
+        rng = rng or random.Random(seed)
+        indexes = range(len(positions))
+        chosen = (
+            rng.sample(indexes, min(n, len(indexes)))
+            if unique
+            else rng.choices(indexes, k=n)
+        )
+        return [self.relationship_at(int(positions[x])) for x in chosen]
+
+    def similarity_matrix(self, node: MCQNode) -> Dict[str, float]:
+        matrices = self.freeze()
+        node_id = self.names.get(node.name)
+        if node_id is None:
+            return {}
+        return {
+            self.names.name(other): score
+            for other, score in matrices.similar(node_id, self.top_k)
+        }
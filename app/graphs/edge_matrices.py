@@ -0,0 +1,356 @@
+"""Compressed sparse row matrices that CSRGraph reads its edges through"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from app.graphs.similarity_index import CANDIDATE_RADIUS
+
+# Row pointers and column indices of a compressed sparse row adjacency matrix
+CSR = Tuple[np.ndarray, np.ndarray]
+# Row pointers, node ids and scores of the similarity rows of every node
+SimilarityRows = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def build_csr(rows: np.ndarray, columns: np.ndarray, num_rows: int) -> CSR:
+    """
+    Builds a compressed sparse row matrix from pairs of row and column ids, columns keep their given order within each row.
+
+    Args:
+        rows (np.ndarray): row id of each pair
+        columns (np.ndarray): column id of each pair
+        num_rows (int): number of rows in the matrix
+
+    Returns:
+        CSR: row pointers and column indices
+    """
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=indptr[1:])
+    return indptr, columns[order].astype(np.int32)
+
+
+def csr_row(matrix: CSR, row: int) -> np.ndarray:
+    """
+    The column indices of one row of a matrix.
+
+    Args:
+        matrix (CSR): the matrix
+        row (int): row id
+
+    Returns:
+        np.ndarray: column ids, empty if the row is outside the matrix
+    """
+    indptr, indices = matrix
+    if row + 1 >= len(indptr):
+        return indices[:0]
+    return indices[indptr[row] : indptr[row + 1]]
+
+
+def within_hops(neighbours: CSR, sources: np.ndarray, hops: int) -> np.ndarray:
+    """
+    The nodes within a number of hops of the given nodes.
+
+    Args:
+        neighbours (CSR): neighbours in either direction by node
+        sources (np.ndarray): ids of the nodes to start from
+        hops (int): the most hops taken
+
+    Returns:
+        np.ndarray: sorted ids of the given nodes and every node within reach of them
+    """
+    reached = np.unique(sources)
+    frontier = reached
+    for _ in range(hops):
+        if frontier.size == 0:
+            break
+        frontier = np.setdiff1d(
+            np.concatenate(
+                [csr_row(neighbours, x) for x in frontier.tolist()]
+            ),
+            reached,
+        )
+        reached = np.union1d(reached, frontier)
+    return reached
+
+
+def candidate_scores(
+    neighbours: CSR, node_id: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The jaccard scores of every node within CANDIDATE_RADIUS hops of a node, other than the node and its neighbours.
+    Each path of two hops to another node is one shared neighbour, nodes further away share none and score 0.
+
+    Args:
+        neighbours (CSR): neighbours in either direction by node
+        node_id (int): id of the node
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: sorted node ids and their scores
+    """
+    indptr = neighbours[0]
+    adjacent = csr_row(neighbours, node_id)
+    if adjacent.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    others = np.setdiff1d(
+        within_hops(neighbours, np.array([node_id]), CANDIDATE_RADIUS),
+        np.append(adjacent, node_id),
+    )
+    ids, counts = np.unique(
+        np.concatenate([csr_row(neighbours, x) for x in adjacent.tolist()]),
+        return_counts=True,
+    )
+    shared = np.zeros(len(others), dtype=np.int64)
+    found = np.isin(ids, others)
+    shared[np.searchsorted(others, ids[found])] = counts[found]
+    degrees = indptr[others + 1] - indptr[others]
+    return others, shared / (len(adjacent) + degrees - shared)
+
+
+def rank_names(names: Sequence[str]) -> np.ndarray:
+    """
+    The position of each name in sorted order.
+
+    Args:
+        names (Sequence[str]): names by id
+
+    Returns:
+        np.ndarray: sorted position by id
+    """
+    ranks = np.empty(len(names), dtype=np.int64)
+    ranks[np.argsort(np.array(names, dtype=object))] = np.arange(len(names))
+    return ranks
+
+
+def stored_similarity_row(
+    similarity: SimilarityRows, node_id: int
+) -> List[Tuple[int, float]]:
+    """
+    Reads a similarity row that was built ahead of time.
+
+    Args:
+        similarity (SimilarityRows): the similarity rows of every node
+        node_id (int): id of the node
+
+    Returns:
+        List[Tuple[int, float]]: node ids and scores, the top-k by descending score then name followed by the rest by name
+    """
+    indptr, ids, scores = similarity
+    start, end = indptr[node_id], indptr[node_id + 1]
+    return list(zip(ids[start:end].tolist(), scores[start:end].tolist()))
+
+
+# pylint: disable=too-many-instance-attributes
+class EdgeMatrices:
+    """
+    The compressed sparse row matrices read by CSRGraph, built from a deduplicated edge array.
+    There is one matrix of answer nodes by topic node for each relationship type, one of topic nodes by answer node,
+    and one of neighbours in either direction.
+    Edge positions by answer node and by type are built on the first filtered draw of a random relationship.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        answers_by_type: Dict[int, CSR],
+        topics: CSR,
+        neighbours: CSR,
+        pairs: Tuple[np.ndarray, np.ndarray],
+        name_ranks: np.ndarray,
+        similarity: Optional[SimilarityRows] = None,
+    ):
+        """
+        Args:
+            answers_by_type (Dict[int, CSR]): answer nodes by topic node for each relationship type id
+            topics (CSR): topic nodes by answer node
+            neighbours (CSR): neighbours in either direction by node
+            pairs (Tuple[np.ndarray, np.ndarray]): sorted answer and topic pair keys with the edge position of each
+            name_ranks (np.ndarray): position of each node name in sorted order, used to break ties between scores
+            similarity (Optional[SimilarityRows]): similarity rows built ahead of time, rows are computed on lookup if not given
+        """
+        self.answers_by_type = answers_by_type
+        self.topics = topics
+        self.neighbours = neighbours
+        self.pairs = pairs
+        self.name_ranks = name_ranks
+        self.similarity = similarity
+        self.similarity_rows: Dict[int, List[Tuple[int, float]]] = {}
+        self.positions_by_answer: Optional[CSR] = None
+        self.positions_by_type: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def build(cls, edges: np.ndarray, names: Sequence[str]) -> 'EdgeMatrices':
+        """
+        Builds the matrices of an edge array.
+
+        Args:
+            edges (np.ndarray): answer node, topic node and type ids of each edge, one edge per pair
+            names (Sequence[str]): node names by id
+
+        Returns:
+            EdgeMatrices: the matrices
+        """
+        num_nodes = len(names)
+        answers, topics = edges[:, 0], edges[:, 1]
+        answers_by_type = {}
+        for type_id in np.unique(edges[:, 2]).tolist():
+            mask = edges[:, 2] == type_id
+            answers_by_type[type_id] = build_csr(
+                topics[mask], answers[mask], num_nodes
+            )
+        keys = answers.astype(np.int64) * num_nodes + topics
+        positions = np.argsort(keys)
+        pairs = np.unique(
+            np.concatenate(
+                [keys, topics.astype(np.int64) * num_nodes + answers]
+            )
+        )
+        return cls(
+            answers_by_type,
+            build_csr(answers, topics, num_nodes),
+            build_csr(
+                pairs // max(num_nodes, 1),
+                pairs % max(num_nodes, 1),
+                num_nodes,
+            ),
+            (keys[positions], positions),
+            rank_names(names),
+        )
+
+    def answers(self, topic_id: int, type_id: int) -> np.ndarray:
+        """
+        Answer nodes with a relationship of the given type to a topic node.
+
+        Args:
+            topic_id (int): id of the topic node
+            type_id (int): id of the relationship type
+
+        Returns:
+            np.ndarray: answer node ids in the order their edges were added
+        """
+        matrix = self.answers_by_type.get(type_id)
+        if matrix is None:
+            return np.zeros(0, dtype=np.int32)
+        return csr_row(matrix, topic_id)
+
+    def position(self, answer_id: int, topic_id: int) -> Optional[int]:
+        """
+        The position in the edge array of the edge between two nodes.
+
+        Args:
+            answer_id (int): id of the answer node
+            topic_id (int): id of the topic node
+
+        Returns:
+            Optional[int]: position of the edge, None if the nodes are not linked
+        """
+        keys, positions = self.pairs
+        key = answer_id * len(self.name_ranks) + topic_id
+        index = int(np.searchsorted(keys, key))
+        if index < len(keys) and keys[index] == key:
+            return int(positions[index])
+        return None
+
+    def positions(
+        self, answer_ids: np.ndarray, topic_ids: np.ndarray
+    ) -> np.ndarray:
+        """
+        The positions in the edge array of the edges between pairs of nodes, looked up together.
+
+        Args:
+            answer_ids (np.ndarray): ids of the answer nodes
+            topic_ids (np.ndarray): ids of the topic nodes, in the same order
+
+        Returns:
+            np.ndarray: position of each edge, -1 where the nodes are not linked
+        """
+        keys, positions = self.pairs
+        wanted = answer_ids.astype(np.int64) * len(self.name_ranks) + topic_ids
+        found = np.full(len(wanted), -1, dtype=np.int64)
+        index = np.searchsorted(keys, wanted)
+        inside = index < len(keys)
+        matched = np.flatnonzero(inside)[keys[index[inside]] == wanted[inside]]
+        found[matched] = positions[index[matched]]
+        return found
+
+    def matching(
+        self,
+        edges: np.ndarray,
+        answer_id: Optional[int],
+        type_id: Optional[int],
+    ) -> np.ndarray:
+        """
+        Positions of the edges from an answer node, of a type, or both.
+
+        Args:
+            edges (np.ndarray): the edge array the matrices were built from
+            answer_id (Optional[int]): only edges from this node
+            type_id (Optional[int]): only edges of this type
+
+        Returns:
+            np.ndarray: edge positions in increasing order
+        """
+        if answer_id is None:
+            if type_id is None:
+                return np.arange(len(edges))
+            if type_id not in self.positions_by_type:
+                self.positions_by_type[type_id] = np.flatnonzero(
+                    edges[:, 2] == type_id
+                )
+            return self.positions_by_type[type_id]
+        if self.positions_by_answer is None:
+            self.positions_by_answer = build_csr(
+                edges[:, 0],
+                np.arange(len(edges), dtype=np.int32),
+                len(self.name_ranks),
+            )
+        positions = csr_row(self.positions_by_answer, answer_id)
+        if type_id is None:
+            return positions
+        return positions[edges[positions, 2] == type_id]
+
+    def similar(self, node_id: int, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Scores the jaccard similarity of every node within CANDIDATE_RADIUS hops of the given node, as SimilarityIndex
+        does for NXGraph. Direct neighbours are not listed, rows are kept until a change reaches them.
+
+        Args:
+            node_id (int): id of the node
+            top_k (int): the number of most similar nodes listed first
+
+        Returns:
+            List[Tuple[int, float]]: node ids and scores, the top-k by descending score then name followed by the rest by name
+        """
+        row = self.similarity_rows.get(node_id)
+        if row is not None:
+            return row
+        if self.similarity is not None:
+            return stored_similarity_row(self.similarity, node_id)
+
+        others, scores = candidate_scores(self.neighbours, node_id)
+        order = np.lexsort((self.name_ranks[others], -scores))
+        # The top_k scores come first, then every other node in reach by name
+        tail = order[top_k:]
+        order = np.concatenate(
+            [order[:top_k], tail[np.argsort(self.name_ranks[others[tail]])]]
+        )
+        row = list(zip(others[order].tolist(), scores[order].tolist()))
+        self.similarity_rows[node_id] = row
+        return row
+
+    def similarity_arrays(self, top_k: int) -> SimilarityRows:
+        """
+        The similarity rows of every node packed into arrays.
+
+        Args:
+            top_k (int): the number of most similar nodes listed first in each row
+
+        Returns:
+            SimilarityRows: row pointers, node ids and scores
+        """
+        rows = [self.similar(x, top_k) for x in range(len(self.name_ranks))]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in rows], out=indptr[1:])
+        return (
+            indptr,
+            np.array([x for row in rows for x, _ in row], dtype=np.int32),
+            np.array([x for row in rows for _, x in row], dtype=np.float64),
+        )
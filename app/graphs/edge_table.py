@@ -0,0 +1,500 @@
+"""Array backed edge storage for sampling random relationships from in memory graphs"""
+import random
+import threading
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+# (answer node, topic node, relationship type)
+Edge = Tuple[str, str, str]
+
+
+class AliasTable:
+    """
+    Walker's alias method, after an O(n) build each weighted sample costs one random index and one coin flip.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        """
+        Args:
+            weights (Sequence[float]): a positive weight for each index
+
+        Raises:
+            ValueError: if there are no weights or any weight is not positive
+        """
+        if not weights or min(weights) <= 0:
+            raise ValueError(
+                'Alias tables need at least one weight, all positive.'
+            )
+        size = len(weights)
+        total = sum(weights)
+        scaled = [weight * size / total for weight in weights]
+        self.probability = [1.0] * size
+        self.alias = list(range(size))
+
+        small = [i for i, x in enumerate(scaled) if x < 1]
+        large = [i for i, x in enumerate(scaled) if x >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self, rng: random.Random) -> int:
+        """
+        Draws an index with probability proportional to its weight.
+
+        Args:
+            rng (random.Random): source of randomness
+
+        Returns:
+            int: the chosen index
+        """
+        index = rng.randrange(len(self.probability))
+        if rng.random() < self.probability[index]:
+            return index
+        return self.alias[index]
+
+
+class RecentEdges:
+    """
+    Remembers the last served edges so they can be down-weighted, forgetting the oldest one past the limit.
+    Requests served from different threads share these edges, so they are read and changed under a lock.
+    """
+
+    def __init__(self, limit: int = 0, weight: float = 1.0):
+        """
+        Args:
+            limit (int, optional): how many of the last served edges count as recent. Defaults to 0.
+            weight (float, optional): weight multiplier between 0 and 1 for recent edges. Defaults to 1.0.
+        """
+        self.limit = limit
+        self.weight = weight
+        self.order: Deque[Tuple[str, str]] = deque()
+        self.counts: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def serve(self, edge: Edge):
+        """
+        Records an edge as served.
+
+        Args:
+            edge (Edge): the edge served
+        """
+        if not self.limit:
+            return
+        pair = (edge[0], edge[1])
+        with self.lock:
+            self.order.append(pair)
+            self.counts[pair] += 1
+            if len(self.order) > self.limit:
+                oldest = self.order.popleft()
+                self.counts[oldest] -= 1
+                if self.counts[oldest] <= 0:
+                    self.counts.pop(oldest, None)
+
+    def reject(self, edge: Edge, rng: random.Random) -> bool:
+        """
+        Decides whether to redraw an edge, recent edges are only accepted with the recent weight as probability.
+
+        Args:
+            edge (Edge): the edge drawn
+            rng (random.Random): source of randomness
+
+        Returns:
+            bool: True if the edge should be redrawn
+        """
+        if not self.limit:
+            return False
+        with self.lock:
+            recent = (edge[0], edge[1]) in self.counts
+        return recent and rng.random() >= self.weight
+
+    def clear(self):
+        """Forgets every served edge."""
+        with self.lock:
+            self.order.clear()
+            self.counts.clear()
+
+
+class EdgeBucket:
+    """The edges of one group, kept in a list with gaps filled by swapping in the last edge as in EdgeTable."""
+
+    def __init__(self):
+        self.edges: List[Edge] = []
+        self.positions: Dict[Tuple[str, str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def add(self, edge: Edge):
+        """
+        Adds an edge.
+
+        Args:
+            edge (Edge): the edge to add
+        """
+        self.positions[(edge[0], edge[1])] = len(self.edges)
+        self.edges.append(edge)
+
+    def remove(self, edge: Edge):
+        """
+        Removes an edge.
+
+        Args:
+            edge (Edge): the edge to remove
+        """
+        position = self.positions.pop((edge[0], edge[1]))
+        last = self.edges.pop()
+        if position < len(self.edges):
+            self.edges[position] = last
+            self.positions[(last[0], last[1])] = position
+
+
+class EdgeTable:
+    """
+    Keeps every edge of a graph in a list so a uniformly random edge can be picked in constant time.
+    Edges are removed by swapping the last edge into their slot, so the list never has gaps.
+
+    Sampling can optionally be weighted by topic node and relationship type through an alias table that is rebuilt
+    lazily after the edges change, and recently served edges can be down-weighted by rejecting them with a fixed probability.
+
+    Sampling can also be limited to the edges from one answer node or of one relationship type. The edges are then
+    grouped by answer node and type and by type, so a filtered draw costs the same as an unfiltered one.
+    The groups are built on the first filtered draw and kept up to date from then on.
+    """
+
+    def __init__(self):
+        self.edges: List[Edge] = []
+        self.positions: Dict[Tuple[str, str], int] = {}
+        self.topic_weights: Dict[str, float] = {}
+        self.type_weights: Dict[str, float] = {}
+        self.recent = RecentEdges()
+        self.__alias: Optional[AliasTable] = None
+        # Edges by answer node and type and by type, None until the first filtered draw
+        self.__groups: Optional[
+            Tuple[Dict[Tuple[str, str], EdgeBucket], Dict[str, EdgeBucket]]
+        ] = None
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    @property
+    def uniform(self) -> bool:
+        """
+        Whether unfiltered draws are uniform, with no topic or type weights and no recent edges down-weighted.
+
+        Returns:
+            bool
+        """
+        return not (
+            self.topic_weights or self.type_weights or self.recent.limit
+        )
+
+    def add(self, edge: Edge):
+        """
+        Adds an edge, replacing the type of an existing edge between the same pair of nodes.
+
+        Args:
+            edge (Edge): the edge to add
+        """
+        pair = (edge[0], edge[1])
+        position = self.positions.get(pair)
+        if position is None:
+            self.positions[pair] = len(self.edges)
+            self.edges.append(edge)
+        else:
+            self.__ungroup(self.edges[position])
+            self.edges[position] = edge
+        self.__group(edge)
+        self.__alias = None
+
+    def remove(self, answer_node: str, topic_node: str):
+        """
+        Removes the edge between a pair of nodes if there is one.
+
+        Args:
+            answer_node (str): start of the edge
+            topic_node (str): end of the edge
+        """
+        position = self.positions.pop((answer_node, topic_node), None)
+        if position is None:
+            return
+        self.__ungroup(self.edges[position])
+        last = self.edges.pop()
+        if position < len(self.edges):
+            self.edges[position] = last
+            self.positions[(last[0], last[1])] = position
+        self.__alias = None
+
+    def clear(self):
+        """Removes every edge."""
+        self.edges.clear()
+        self.positions.clear()
+        self.recent.clear()
+        self.__alias = None
+        self.__groups = None
+
+    def __group(self, edge: Edge):
+        """
+        Adds an edge to the groups used for filtered draws, if they have been built.
+
+        Args:
+            edge (Edge): the edge added
+        """
+        if self.__groups is None:
+            return
+        by_answer, by_type = self.__groups
+        by_answer.setdefault((edge[0], edge[2]), EdgeBucket()).add(edge)
+        by_type.setdefault(edge[2], EdgeBucket()).add(edge)
+
+    def __ungroup(self, edge: Edge):
+        """
+        Removes an edge from the groups used for filtered draws, dropping groups left empty.
+
+        Args:
+            edge (Edge): the edge removed
+        """
+        if self.__groups is None:
+            return
+        by_answer, by_type = self.__groups
+        key = (edge[0], edge[2])
+        by_answer[key].remove(edge)
+        if not by_answer[key]:
+            del by_answer[key]
+        by_type[edge[2]].remove(edge)
+        if not by_type[edge[2]]:
+            del by_type[edge[2]]
+
+    def __buckets(
+        self, answer_node: Optional[str], relationship_type: Optional[str]
+    ) -> List[EdgeBucket]:
+        """
+        The groups holding the edges that match a filter, building the groups if this is the first filtered draw.
+
+        Args:
+            answer_node (Optional[str]): only edges from this node
+            relationship_type (Optional[str]): only edges of this type
+
+        Returns:
+            List[EdgeBucket]: the matching groups, one for each type when only the answer node is given
+        """
+        groups = self.__groups
+        if groups is None:
+            by_answer: Dict[Tuple[str, str], EdgeBucket] = {}
+            by_type: Dict[str, EdgeBucket] = {}
+            for edge in self.edges:
+                by_answer.setdefault((edge[0], edge[2]), EdgeBucket()).add(
+                    edge
+                )
+                by_type.setdefault(edge[2], EdgeBucket()).add(edge)
+            # Only assigned once complete, so a concurrent first filtered draw never sees half built groups
+            groups = self.__groups = (by_answer, by_type)
+        by_answer, by_type = groups
+        if answer_node is None:
+            bucket = (
+                None
+                if relationship_type is None
+                else by_type.get(relationship_type)
+            )
+            return [] if bucket is None else [bucket]
+        types = (
+            list(by_type) if relationship_type is None else [relationship_type]
+        )
+        return [
+            by_answer[(answer_node, x)]
+            for x in types
+            if (answer_node, x) in by_answer
+        ]
+
+    def set_weights(
+        self,
+        topic_weights: Optional[Dict[str, float]] = None,
+        type_weights: Optional[Dict[str, float]] = None,
+        recent_weight: float = 1.0,
+        recent_limit: int = 0,
+    ):
+        """
+        Sets how sampling is weighted, any topic node or relationship type left out has a weight of 1.
+
+        Args:
+            topic_weights (Optional[Dict[str, float]]): positive weights by topic node name
+            type_weights (Optional[Dict[str, float]]): positive weights by relationship type
+            recent_weight (float, optional): weight multiplier between 0 and 1 for recently served edges. Defaults to 1.0.
+            recent_limit (int, optional): how many of the last served edges count as recent. Defaults to 0.
+
+        Raises:
+            ValueError: if any weight is out of range
+        """
+        weights = list((topic_weights or {}).values()) + list(
+            (type_weights or {}).values()
+        )
+        if any(weight <= 0 for weight in weights):
+            raise ValueError('Topic and type weights must be positive.')
+        if not 0 < recent_weight <= 1:
+            raise ValueError('Recent weight must be between 0 and 1.')
+        self.topic_weights = dict(topic_weights or {})
+        self.type_weights = dict(type_weights or {})
+        self.recent = RecentEdges(recent_limit, recent_weight)
+        self.__alias = None
+
+    def __weight(self, edge: Edge) -> float:
+        """
+        The configured sampling weight of an edge.
+
+        Args:
+            edge (Edge): the edge to weigh
+
+        Returns:
+            float: the product of its topic and type weights
+        """
+        return self.topic_weights.get(edge[1], 1.0) * self.type_weights.get(
+            edge[2], 1.0
+        )
+
+    def __draw(self, rng: random.Random) -> Edge:
+        """
+        Draws an edge according to the topic and type weights, uniformly if there are none.
+
+        Args:
+            rng (random.Random): source of randomness
+
+        Returns:
+            Edge: the chosen edge
+        """
+        if not self.topic_weights and not self.type_weights:
+            return self.edges[rng.randrange(len(self.edges))]
+        if self.__alias is None:
+            self.__alias = AliasTable([self.__weight(x) for x in self.edges])
+        return self.edges[self.__alias.sample(rng)]
+
+    def __drawer(
+        self, answer_node: Optional[str], relationship_type: Optional[str]
+    ) -> Callable[[random.Random], Edge]:
+        """
+        A function drawing one edge that matches a filter, edges drawn without a filter follow the configured weights.
+
+        Args:
+            answer_node (Optional[str]): only edges from this node
+            relationship_type (Optional[str]): only edges of this type
+
+        Raises:
+            ValueError: if no edge matches
+
+        Returns:
+            Callable[[random.Random], Edge]: draws an edge from a source of randomness
+        """
+        if answer_node is None and relationship_type is None:
+            if not self.edges:
+                raise ValueError('Empty Database.')
+            return self.__draw
+        buckets = self.__buckets(answer_node, relationship_type)
+        if not buckets:
+            raise ValueError('No relationships match the given filter.')
+        if len(buckets) == 1:
+            edges = buckets[0].edges
+            return lambda rng: edges[rng.randrange(len(edges))]
+
+        def draw(rng: random.Random) -> Edge:
+            index = rng.randrange(sum(len(x) for x in buckets))
+            for bucket in buckets[:-1]:
+                if index < len(bucket):
+                    return bucket.edges[index]
+                index -= len(bucket)
+            return buckets[-1].edges[index]
+
+        return draw
+
+    # pylint: disable=too-many-arguments
+    def sample(
+        self,
+        rng: random.Random,
+        exclude: Optional[Set[Edge]] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> Edge:
+        """
+        Draws a random edge, recently served edges are only accepted with the recent weight as probability.
+        Topic and type weights only apply when no filter is given, filtered draws are uniform over the matching edges.
+
+        Args:
+            rng (random.Random): source of randomness
+            exclude (Optional[Set[Edge]]): edges to redraw if chosen, used for sampling without replacement
+            answer_node (Optional[str]): only draw edges from this node
+            relationship_type (Optional[str]): only draw edges of this type
+
+        Raises:
+            ValueError: if the table is empty or no edge matches the filter
+
+        Returns:
+            Edge: the chosen edge
+        """
+        draw = self.__drawer(answer_node, relationship_type)
+        while True:
+            edge = draw(rng)
+            if exclude and edge in exclude:
+                continue
+            if self.recent.reject(edge, rng):
+                continue
+            self.recent.serve(edge)
+            return edge
+
+    # pylint: disable=too-many-arguments
+    def sample_many(
+        self,
+        rng: random.Random,
+        n: int,
+        unique: bool = True,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> List[Edge]:
+        """
+        Draws several random edges.
+
+        Args:
+            rng (random.Random): source of randomness
+            n (int): number of edges to draw
+            unique (bool, optional): draw without replacement, capped at the number of matching edges. Defaults to True.
+            answer_node (Optional[str]): only draw edges from this node
+            relationship_type (Optional[str]): only draw edges of this type
+
+        Raises:
+            ValueError: if the table is empty or no edge matches the filter
+
+        Returns:
+            List[Edge]: the chosen edges
+        """
+        # Checks that some edge matches before anything is drawn
+        self.__drawer(answer_node, relationship_type)
+        if answer_node is None and relationship_type is None:
+            edges = self.edges
+            weighted = (
+                self.topic_weights or self.type_weights or self.recent.limit
+            )
+        else:
+            edges = [
+                edge
+                for bucket in self.__buckets(answer_node, relationship_type)
+                for edge in bucket.edges
+            ]
+            weighted = self.recent.limit
+        if not unique:
+            if not weighted:
+                return rng.choices(edges, k=n)
+            return [
+                self.sample(
+                    rng,
+                    answer_node=answer_node,
+                    relationship_type=relationship_type,
+                )
+                for _ in range(n)
+            ]
+        if not weighted:
+            return rng.sample(edges, min(n, len(edges)))
+        chosen: Set[Edge] = set()
+        output = []
+        for _ in range(min(n, len(edges))):
+            edge = self.sample(rng, chosen, answer_node, relationship_type)
+            chosen.add(edge)
+            output.append(edge)
+        return output
@@ -0,0 +1,115 @@
+"""A store of fake words generated ahead of time for the relationships of a graph"""
+import random
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.models import MCQRelationship
+
+# (answer node, topic node, relationship type)
+RelationshipKey = Tuple[str, str, str]
+
+
+class FakeWordBank:
+    """
+    Holds the fake words found for each relationship so questions can sample them instead of searching for new ones.
+    Only relationships with at least one fake word are stored, anything else falls back to live generation.
+    """
+
+    def __init__(self):
+        self.banks: Dict[RelationshipKey, Tuple[str, ...]] = {}
+        # Relationships that missed the bank and have been handed to a background fill, see claim
+        self.claimed: Set[RelationshipKey] = set()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.banks)
+
+    @staticmethod
+    def key(relationship: MCQRelationship) -> RelationshipKey:
+        """
+        The key a relationship is stored under.
+
+        Args:
+            relationship (MCQRelationship): the relationship
+
+        Returns:
+            RelationshipKey: answer node, topic node and type
+        """
+        return (
+            relationship.answer_node,
+            relationship.topic_node,
+            relationship.type,
+        )
+
+    def put(self, relationship: MCQRelationship, fakes: Iterable[str]):
+        """
+        Stores the fake words of a relationship, replacing any already stored.
+
+        Args:
+            relationship (MCQRelationship): the relationship the fakes were generated for
+            fakes (Iterable[str]): the fake words
+        """
+        words = tuple(dict.fromkeys(fakes))
+        if words:
+            self.banks[self.key(relationship)] = words
+        else:
+            self.banks.pop(self.key(relationship), None)
+
+    def sample(
+        self, relationship: MCQRelationship, rng: random.Random, k: int = 1
+    ) -> List[str]:
+        """
+        Draws fake words for a relationship without replacement.
+
+        Args:
+            relationship (MCQRelationship): the relationship a question is built from
+            rng (random.Random): random number generator for this request
+            k (int, optional): number of fake words to draw. Defaults to 1.
+
+        Returns:
+            List[str]: up to k fake words, empty if the relationship has no bank
+        """
+        words = self.banks.get(self.key(relationship))
+        if not words:
+            return []
+        return rng.sample(words, min(k, len(words)))
+
+    def claim(self, relationship: MCQRelationship) -> bool:
+        """
+        Claims a relationship that missed the bank so that only one background fill is started for it.
+        A relationship stays claimed until its nodes change, so one without any fake words is not filled again.
+
+        Args:
+            relationship (MCQRelationship): the relationship a question was built from
+
+        Returns:
+            bool: True if the relationship had not been claimed
+        """
+        key = self.key(relationship)
+        with self.__lock:
+            if key in self.claimed:
+                return False
+            self.claimed.add(key)
+            return True
+
+    def discard(self, names: Set[str]):
+        """
+        Drops the banks and claims of relationships to or from any of the given nodes.
+
+        Args:
+            names (Set[str]): nodes whose relationships may no longer fit their fake words
+        """
+        for key in [x for x in self.banks if x[0] in names or x[1] in names]:
+            del self.banks[key]
+        with self.__lock:
+            self.claimed = {
+                x
+                for x in self.claimed
+                if x[0] not in names and x[1] not in names
+            }
+
+    def clear(self):
+        """Drops every bank and claim."""
+        self.banks.clear()
+        with self.__lock:
+            self.claimed.clear()
@@ -0,0 +1,262 @@
+"""Serves several graphs by id, loading each on first use and evicting the least recently used ones"""
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.graph_store import GraphStore
+from app.graphs.ingest import ingest
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.snapshot import load_snapshot
+from app.models import RegistryStats
+
+logger = create_logger(__name__)
+
+
+def load_edges(path: str) -> CSRGraph:
+    """
+    Builds a graph from a JSONL or CSV edge file.
+
+    Args:
+        path (str): a .jsonl or .csv file
+
+    Returns:
+        CSRGraph: the built graph
+    """
+    graph = CSRGraph()
+    ingest(graph, path)
+    return graph
+
+
+def graph_loader(path: str) -> Callable[[], MCQGraph]:
+    """
+    The loader for a graph file, chosen by its extension.
+
+    Args:
+        path (str): a .mcqg snapshot, or a .jsonl or .csv edge file
+
+    Raises:
+        ValueError: if the extension is not supported
+
+    Returns:
+        Callable[[], MCQGraph]: maps the snapshot or builds the graph from the edge file
+    """
+    if path.lower().endswith('.mcqg'):
+        return partial(load_snapshot, path)
+    if path.lower().endswith(('.jsonl', '.csv')):
+        return partial(load_edges, path)
+    logger.error('Unsupported graph file: %s', path)
+    raise ValueError(
+        f'Unsupported graph file, expected mcqg, jsonl or csv: {path}'
+    )
+
+
+def parse_graphs(spec: str) -> Dict[str, Callable[[], MCQGraph]]:
+    """
+    Reads graph ids and files from a comma separated list of id=path pairs.
+
+    Args:
+        spec (str): for example 'chemistry=chemistry.mcqg,history=history.jsonl'
+
+    Raises:
+        ValueError: if a pair has no id or path, or a file is not supported
+
+    Returns:
+        Dict[str, Callable[[], MCQGraph]]: the loader of each graph id
+    """
+    loaders: Dict[str, Callable[[], MCQGraph]] = {}
+    for pair in filter(None, (x.strip() for x in spec.split(','))):
+        graph_id, _, path = pair.partition('=')
+        if not graph_id.strip() or not path.strip():
+            logger.error('Invalid graph entry: %r', pair)
+            raise ValueError(
+                f'Invalid Input Error: expected id=path, got {pair!r}.'
+            )
+        loaders[graph_id.strip()] = graph_loader(path.strip())
+    return loaders
+
+
+# pylint: disable=too-many-instance-attributes
+class GraphRegistry:
+    """
+    Maps graph ids to graphs, each held in a GraphStore that builds it on first use.
+    Requests for a graph that is still loading wait for the one build instead of starting their own, while graphs
+    with other ids are built alongside it.
+    Once more graphs are loaded than allowed, or their measured memory exceeds the budget, the least recently used
+    ones are forgotten and built again if they are asked for later. Graphs are not closed on eviction as requests
+    in flight may still be using them.
+    """
+
+    def __init__(
+        self,
+        loaders: Dict[str, Callable[[], MCQGraph]],
+        max_graphs: Optional[int] = None,
+        memory_budget: Optional[int] = None,
+    ):
+        """
+        Args:
+            loaders (Dict[str, Callable[[], MCQGraph]]): builds or maps the graph of each id
+            max_graphs (Optional[int]): the most graphs held at once, None holds any number
+            memory_budget (Optional[int]): the most bytes the held graphs may use, as measured once each is built.
+                The most recently used graph is always held, even if it alone exceeds the budget. None has no budget.
+
+        Raises:
+            ValueError: if max_graphs is less than one or the memory budget is negative
+        """
+        if (max_graphs is not None and max_graphs < 1) or (
+            memory_budget is not None and memory_budget < 0
+        ):
+            logger.error(
+                'Invalid Input Error: max graphs %s, memory budget %s.',
+                max_graphs,
+                memory_budget,
+            )
+            raise ValueError(
+                'Invalid Input Error: at least one graph must fit and the memory budget must not be negative.'
+            )
+        self.loaders = dict(loaders)
+        self.max_graphs = max_graphs
+        self.memory_budget = memory_budget
+        # Graph id -> store, least recently used first
+        self.stores: 'OrderedDict[str, GraphStore]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def __contains__(self, graph_id: str) -> bool:
+        return graph_id in self.loaders
+
+    @property
+    def ids(self) -> List[str]:
+        """
+        The ids of every graph that can be served.
+
+        Returns:
+            List[str]: graph ids
+        """
+        return sorted(self.loaders)
+
+    def __store(self, graph_id: str) -> GraphStore:
+        """
+        The store of a graph, marked as the most recently used.
+
+        Args:
+            graph_id (str): id of the graph
+
+        Raises:
+            ValueError: if there is no graph with the id
+
+        Returns:
+            GraphStore: the store holding or building the graph
+        """
+        with self.lock:
+            store = self.stores.get(graph_id)
+            if store is None:
+                loader = self.loaders.get(graph_id)
+                if loader is None:
+                    logger.error('Unknown graph: %r', graph_id)
+                    raise ValueError(f'Unknown graph: {graph_id!r}.')
+                store = self.stores[graph_id] = GraphStore(
+                    partial(self.__load, graph_id, loader)
+                )
+            self.stores.move_to_end(graph_id)
+            return store
+
+    def __load(
+        self, graph_id: str, loader: Callable[[], MCQGraph]
+    ) -> MCQGraph:
+        """
+        Builds a graph. Its store holds a lock of its own while calling this, so only requests for the same id wait.
+
+        Args:
+            graph_id (str): id of the graph
+            loader (Callable[[], MCQGraph]): builds or maps the graph
+
+        Returns:
+            MCQGraph: the built graph
+        """
+        with self.lock:
+            self.loads += 1
+        logger.info('Loading graph %r.', graph_id)
+        return loader()
+
+    def get(self, graph_id: str) -> MCQGraph:
+        """
+        The graph with the given id, building it if it is not held.
+
+        Args:
+            graph_id (str): id of the graph
+
+        Raises:
+            ValueError: if there is no graph with the id
+
+        Returns:
+            MCQGraph: the graph
+        """
+        store = self.__store(graph_id)
+        if store.loaded:
+            return store.graph
+        graph = store.load()
+        with self.lock:
+            self.__evict(graph_id)
+        return graph
+
+    def __evict(self, keep: str):
+        """
+        Forgets the least recently used loaded graphs until the rest fit. Called while holding the lock.
+
+        Args:
+            keep (str): id of the graph just served, it is never evicted
+        """
+        loaded = [x for x, y in self.stores.items() if y.loaded and x != keep]
+        memory = sum(
+            y.stats.memory_bytes for y in self.stores.values() if y.loaded
+        )
+        while loaded and (
+            (self.max_graphs is not None and len(loaded) >= self.max_graphs)
+            or (self.memory_budget is not None and memory > self.memory_budget)
+        ):
+            graph_id = loaded.pop(0)
+            memory -= self.stores.pop(graph_id).stats.memory_bytes
+            self.evictions += 1
+            logger.info('Evicted graph %r.', graph_id)
+
+    def evict(self, graph_id: str):
+        """
+        Forgets a graph, it is built again the next time it is asked for.
+
+        Args:
+            graph_id (str): id of the graph
+        """
+        with self.lock:
+            if self.stores.pop(graph_id, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> RegistryStats:
+        """
+        The graphs that can be served and the build statistics of those held in memory.
+
+        Returns:
+            RegistryStats: registry metrics
+        """
+        with self.lock:
+            loaded = {x: y.stats for x, y in self.stores.items() if y.loaded}
+            return RegistryStats(
+                graphs=self.ids,
+                loaded=loaded,
+                memory_bytes=sum(x.memory_bytes for x in loaded.values()),
+                memory_budget=self.memory_budget,
+                max_graphs=self.max_graphs,
+                loads=self.loads,
+                evictions=self.evictions,
+            )
+
+    def close(self):
+        """Closes and forgets every held graph."""
+        with self.lock:
+            stores = list(self.stores.values())
+            self.stores.clear()
+        for store in stores:
+            store.close()
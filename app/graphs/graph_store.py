@@ -0,0 +1,162 @@
+"""Holds a built graph in memory so it can be shared between requests"""
+import gc
+import logging
+import sys
+import threading
+import time
+import types
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph
+from app.models import GraphStats
+
+logger = create_logger(__name__)
+
+# Objects shared with the rest of the process rather than held by a graph, references are not followed into them
+SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    logging.Logger,
+)
+
+
+def held_memory(root: object) -> int:
+    """
+    Approximate bytes held by an object and everything it references, found by walking references instead of
+    tracing allocations, so measuring a graph neither slows down building it nor depends on global tracing state.
+    Arrays count the buffers they own, views count the array they were taken from, and arrays over a memory map
+    do not count the mapped pages as those belong to the file.
+
+    Args:
+        root (object): the object to measure
+
+    Returns:
+        int: bytes held
+    """
+    seen: Set[int] = set()
+    pending: List[object] = [root]
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+        if isinstance(obj, np.ndarray) and obj.base is not None:
+            pending.append(obj.base)
+    return total
+
+
+class GraphStore:
+    """
+    Builds a graph once with the given loader and shares it read-only between requests.
+    A reload builds a replacement graph first and then swaps it in, so requests already holding the old graph can finish with it.
+    """
+
+    def __init__(self, loader: Callable[[], MCQGraph]):
+        self.loader = loader
+        # The graph and its stats are swapped together as one reference so readers never see a mismatched pair
+        self._loaded: Optional[Tuple[MCQGraph, GraphStats]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def graph(self) -> MCQGraph:
+        """
+        The currently loaded graph, it is built on first access if it has not been loaded yet.
+
+        Returns:
+            MCQGraph: the shared graph
+        """
+        return self.__current()[0]
+
+    @property
+    def stats(self) -> GraphStats:
+        """
+        Build statistics for the currently loaded graph, it is built on first access if it has not been loaded yet.
+
+        Returns:
+            GraphStats: build time and memory footprint
+        """
+        return self.__current()[1]
+
+    @property
+    def loaded(self) -> bool:
+        """
+        Whether a graph has been built, without building one.
+
+        Returns:
+            bool: True once the graph has been built
+        """
+        return self._loaded is not None
+
+    def __current(self) -> Tuple[MCQGraph, GraphStats]:
+        """
+        Returns the loaded graph and its stats, building them if nothing has been loaded.
+
+        Returns:
+            Tuple[MCQGraph, GraphStats]: the shared graph and its build statistics
+        """
+        loaded = self._loaded
+        if loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    self._loaded = self.__build()
+                loaded = self._loaded
+        return loaded
+
+    def __build(self) -> Tuple[MCQGraph, GraphStats]:
+        """
+        Times the loader, then measures how much memory the new graph holds onto once it has been built.
+
+        Returns:
+            Tuple[MCQGraph, GraphStats]: the newly built graph and its build statistics
+        """
+        start = time.perf_counter()
+        graph = self.loader()
+        build_seconds = time.perf_counter() - start
+        memory_bytes = held_memory(graph)
+
+        stats = GraphStats(
+            build_seconds=build_seconds,
+            memory_bytes=memory_bytes,
+            loaded_at=time.time(),
+        )
+        logger.info(
+            'Built graph in %.3f seconds using approximately %s bytes.',
+            build_seconds,
+            memory_bytes,
+        )
+        return graph, stats
+
+    def load(self) -> MCQGraph:
+        """
+        Builds the graph if it has not already been built.
+
+        Returns:
+            MCQGraph: the shared graph
+        """
+        return self.__current()[0]
+
+    def reload(self) -> MCQGraph:
+        """
+        Builds a fresh graph and swaps it in place of the current one.
+        The replaced graph is not closed as requests in flight may still be using it.
+
+        Returns:
+            MCQGraph: the newly loaded graph
+        """
+        with self._lock:
+            self._loaded = self.__build()
+            return self._loaded[0]
+
+    def close(self):
+        """Closes the current graph and forgets it, the next access will build it again."""
+        with self._lock:
+            if self._loaded is not None:
+                self._loaded[0].close()
+            self._loaded = None
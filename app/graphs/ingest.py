@@ -0,0 +1,194 @@
+"""
+Streams relationships from JSONL or CSV edge files into a graph in chunks.
+Each row holds the answer_node, topic_node and type of one relationship, CSV files name these columns in a header.
+Only one chunk of rows is held in memory at a time, so the memory used does not grow with the size of the file.
+"""
+import csv
+import itertools
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph
+from app.models import IngestStats, MCQNode, MCQRelationship
+from pydantic import ValidationError
+
+logger = create_logger(__name__)
+
+# (line number, raw row)
+Row = Tuple[int, Dict[str, Any]]
+
+# Relationship types are written into queries as labels, so only plain identifiers are accepted
+RELATIONSHIP_TYPE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Row]:
+    """
+    Reads rows from lines of JSON objects, blank lines are ignored.
+
+    Args:
+        lines (Iterable[str]): lines of the file
+
+    Yields:
+        Row: the line number and the decoded object, or an empty row if the line is not a JSON object
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield number, row if isinstance(row, dict) else {}
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Row]:
+    """
+    Reads rows from CSV lines with a header.
+
+    Args:
+        lines (Iterable[str]): lines of the file
+
+    Yields:
+        Row: the line number and the row keyed by the header
+    """
+    for number, row in enumerate(csv.DictReader(lines), start=2):
+        yield number, dict(row)
+
+
+def read_rows(path: str) -> Iterator[Row]:
+    """
+    Reads rows from an edge file, the format is chosen by the file extension.
+
+    Args:
+        path (str): a .jsonl or .csv file
+
+    Raises:
+        ValueError: if the extension is not supported
+
+    Yields:
+        Row: the line number and raw row
+    """
+    readers = {'.jsonl': read_jsonl, '.csv': read_csv}
+    reader = next(
+        (y for x, y in readers.items() if path.lower().endswith(x)), None
+    )
+    if reader is None:
+        logger.error('Unsupported edge file: %s', path)
+        raise ValueError(
+            f'Unsupported edge file, expected jsonl or csv: {path}'
+        )
+    with open(path, encoding='utf-8', newline='') as file:
+        yield from reader(file)
+
+
+def validate_chunk(
+    chunk: List[Row], strict: bool = False
+) -> List[MCQRelationship]:
+    """
+    Validates a chunk of rows before any of it is written.
+
+    Args:
+        chunk (List[Row]): line numbers and raw rows
+        strict (bool, optional): raise on the first invalid row instead of skipping it. Defaults to False.
+
+    Raises:
+        ValueError: if strict and a row is not a valid relationship
+
+    Returns:
+        List[MCQRelationship]: the valid relationships of the chunk
+    """
+    relationships = []
+    for number, row in chunk:
+        error: Optional[str] = None
+        try:
+            relationship = MCQRelationship(**row)
+        except (ValidationError, TypeError) as e:
+            error = str(e)
+        else:
+            if not RELATIONSHIP_TYPE.match(relationship.type):
+                error = f'invalid relationship type {relationship.type!r}'
+            else:
+                relationships.append(relationship)
+                continue
+        if strict:
+            logger.error('Invalid row on line %s: %s', number, error)
+            raise ValueError(f'Invalid row on line {number}: {error}')
+        logger.warning('Skipped invalid row on line %s: %s', number, error)
+    return relationships
+
+
+def ingest_rows(
+    graph: MCQGraph,
+    rows: Iterable[Row],
+    chunk_size: int = 10000,
+    merge: bool = False,
+    strict: bool = False,
+) -> IngestStats:
+    """
+    Writes rows to a graph one chunk at a time, creating the nodes each chunk refers to.
+
+    Args:
+        graph (MCQGraph): the graph to write to
+        rows (Iterable[Row]): line numbers and raw rows, read lazily
+        chunk_size (int, optional): rows validated and written together. Defaults to 10000.
+        merge (bool, optional): add to the current content, skipping relationships the graph already has,
+            instead of deleting everything first like fill_graph. Defaults to False.
+        strict (bool, optional): raise on the first invalid row instead of skipping it. Defaults to False.
+
+    Returns:
+        IngestStats: counts of the rows read, relationships written, rows skipped and chunks
+    """
+    if not merge:
+        graph.delete_all()
+    write = graph.merge_relationships if merge else graph.create_relationships
+    stats = IngestStats()
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            break
+        relationships = validate_chunk(chunk, strict)
+        names = dict.fromkeys(
+            name
+            for x in relationships
+            for name in (x.answer_node, x.topic_node)
+        )
+        graph.merge_nodes([MCQNode(name=x) for x in names])
+        write(relationships)
+        stats.rows += len(chunk)
+        stats.relationships += len(relationships)
+        stats.skipped += len(chunk) - len(relationships)
+        stats.chunks += 1
+    logger.info(
+        'Ingested %s relationships from %s rows in %s chunks, skipped %s.',
+        stats.relationships,
+        stats.rows,
+        stats.chunks,
+        stats.skipped,
+    )
+    return stats
+
+
+def ingest(
+    graph: MCQGraph,
+    path: str,
+    chunk_size: int = 10000,
+    merge: bool = False,
+    strict: bool = False,
+) -> IngestStats:
+    """
+    Streams a JSONL or CSV edge file into a graph, see ingest_rows.
+
+    Args:
+        graph (MCQGraph): the graph to write to
+        path (str): a .jsonl or .csv file
+        chunk_size (int, optional): rows validated and written together. Defaults to 10000.
+        merge (bool, optional): add to the current content instead of deleting everything first. Defaults to False.
+        strict (bool, optional): raise on the first invalid row instead of skipping it. Defaults to False.
+
+    Returns:
+        IngestStats: counts of the rows read, relationships written, rows skipped and chunks
+    """
+    return ingest_rows(graph, read_rows(path), chunk_size, merge, strict)
@@ -1,23 +1,26 @@
 """A logger to use throughout the project"""
 import logging
+import os
 from logging import Logger
 
 
 def create_logger(name: str) -> Logger:
     """
     Create a custom logger with configurations set to avoid repeating code.
+    The level is read from the LOG_LEVEL environment variable and defaults to INFO.
 
     Args:
         name str: the name of the module the logger is being used in.
 
     Returns:
-        _type_: _description_
+        Logger: the configured logger
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    if logger.handlers:
+        return logger
 
     chandler = logging.StreamHandler()
-    chandler.setLevel(logging.DEBUG)
 
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -1,19 +1,282 @@
 """Object for acessing neo4j graph database"""
-from typing import Dict, List, Optional, Union
-
+import itertools
+import random
+from collections import Counter
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from app.graphs.fake_word_bank import FakeWordBank
 from app.graphs.log_util import create_logger
 from app.models import MCQNode, MCQRelationship
 
 logger = create_logger(__name__)
 
+# Changes to more nodes than this invalidate everything rather than working out the neighbourhood they affect
+TARGETED_CHANGE_LIMIT = 1000
+
+
+class QuestionReads(NamedTuple):
+    """Everything read from a graph to build a question from one relationship."""
+
+    answer_node: Optional[MCQNode]
+    related_nodes: List[MCQNode]
+    connected_nodes: List[MCQNode]
+    similarity: Dict[str, float]
+
+
+class NameReads(NamedTuple):
+    """
+    The reads of QuestionReads as node names, which is all a question is built from.
+    Graphs that hold names can return these without building a node model for every related or connected node.
+    """
+
+    found: bool
+    related: List[str]
+    connected: List[str]
+    similarity: Dict[str, float]
+
+
+class GraphChange(NamedTuple):
+    """A change to the data of a graph, passed to its listeners once the change has been made."""
+
+    version: int
+    # Nodes that were added or removed or had relationships added or removed, None when not known
+    nodes: Optional[FrozenSet[str]]
+    # Nodes the change can reach, whose similarity rows, related nodes and fake words may have changed,
+    # None when everything may have changed
+    affected: Optional[FrozenSet[str]]
+
+
+def notify(
+    listeners: List[Callable[[GraphChange], None]], change: GraphChange
+):
+    """
+    Passes a change to listeners, a listener that fails is logged rather than stopping the write that made the change.
+
+    Args:
+        listeners (List[Callable[[GraphChange], None]]): listeners to call
+        change (GraphChange): the change
+    """
+    for listener in list(listeners):
+        try:
+            listener(change)
+        # pylint: disable=broad-except
+        except Exception as e:
+            logger.warning(
+                'Graph change listener failed: %s',
+                str(e),
+                extra={'exception': e},
+            )
+
+
+def graph_nodes(data: Dict[str, List[str]]) -> List[MCQNode]:
+    """
+    The nodes of the graph built from dictionary input, checking every name is a string.
+
+    Args:
+        data (Dict[str, List[str]]): input data
+
+    Raises:
+        ValueError: if a name is not a string
+
+    Returns:
+        List[MCQNode]: nodes sorted by name
+    """
+    found_nodes = set()
+    for key, value in data.items():
+        if isinstance(value, list):
+            # Names are checked once here so the relationships between them can skip validation
+            invalid = [x for x in [key] + value if not isinstance(x, str)]
+            if invalid:
+                logger.error(
+                    'Node names must be strings: %s',
+                    invalid,
+                    extra={'names': invalid},
+                )
+                raise ValueError(
+                    f'Invalid Input Error: {len(invalid)} node names are not strings.'
+                )
+            if value:
+                found_nodes.add(key)
+                found_nodes.update(value)
+    return [MCQNode(**{'name': key}) for key in sorted(found_nodes)]
+
+
+def graph_relationships(
+    data: Dict[str, List[str]]
+) -> Iterator[MCQRelationship]:
+    """
+    The relationships of the graph built from dictionary input, built as they are read and without validation,
+    so names should first be checked by graph_nodes.
+
+    Args:
+        data (Dict[str, List[str]]): input data
+
+    Yields:
+        MCQRelationship: each key includes the items in its list and each item belongs to the key
+    """
+    for key, value in data.items():
+        if isinstance(value, list):
+            for item in value:
+                yield MCQRelationship.construct(
+                    answer_node=key, topic_node=item, type='includes'
+                )
+                yield MCQRelationship.construct(
+                    topic_node=key, answer_node=item, type='belongs_to'
+                )
+
+
+def graph_content(
+    data: Dict[str, List[str]]
+) -> Tuple[List[MCQNode], List[MCQRelationship]]:
+    """
+    Converts dictionary input into the nodes and relationships of a graph, each key includes the items in its list and each item belongs to the key.
+
+    Args:
+        data (Dict[str, List[str]]): input data
+
+    Returns:
+        Tuple[List[MCQNode], List[MCQRelationship]]: nodes sorted by name and relationships in both directions
+    """
+    nodes = graph_nodes(data)
+    return nodes, list(graph_relationships(data))
+
+
+def check_duplicates(nodes: List[MCQNode], matches: List[MCQNode]):
+    """
+    Checks nodes about to be created for duplicate names.
+
+    Args:
+        nodes (List[MCQNode]): nodes about to be created
+        matches (List[MCQNode]): nodes already in the database with the same names
 
+    Raises:
+        ValueError: Raised if any form of duplication can occur on node name.
+    """
+    # Check for duplicates within the input
+    counter = Counter([node.name for node in nodes])
+    duplicates = [node for node in nodes if counter[node.name] > 1]
+    if duplicates:
+        logger.error(
+            'Duplicate name inputs detected: %s',
+            {node.name for node in nodes},
+            extra={'nodes': duplicates},
+        )
+        raise ValueError(
+            f'Duplication Error: {len(duplicates)} node duplicates within input.'
+        )
+
+    # Check for duplicates within the database
+    if matches:
+        logger.error(
+            'Nodes already exist with these names: %s',
+            {node.name for node in matches},
+            extra={'nodes': matches},
+        )
+        raise ValueError(
+            f'Duplication Error: {len(matches)} nodes already have names in database.'
+        )
+
+
+# pylint: disable=too-many-public-methods
 class MCQGraph:
     """
     This is a baseclass for the interface used by other modules to interact with graph databases.
     """
 
     def __init__(self):
-        pass
+        # Fake words generated ahead of time for the relationships of this graph, see MCQBuilder.fill_fake_word_bank
+        self.fake_words = FakeWordBank()
+        # Counts changes to the data so anything derived from it can tell when it is stale
+        self.version = 0
+        self.listeners: List[Callable[[GraphChange], None]] = []
+
+    def subscribe(self, listener: Callable[[GraphChange], None]):
+        """
+        Calls a listener after every change to the data, so caches derived from the graph can drop what the change affects.
+
+        Args:
+            listener (Callable[[GraphChange], None]): called with each change
+        """
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[GraphChange], None]):
+        """
+        Stops calling a listener.
+
+        Args:
+            listener (Callable[[GraphChange], None]): a subscribed listener
+        """
+        self.listeners.remove(listener)
+
+    def mark_changed(
+        self,
+        nodes: Optional[Iterable[str]] = None,
+        affected: Optional[Iterable[str]] = None,
+    ) -> Optional[Set[str]]:
+        """
+        Records a change to the data, bumping the version, dropping fake words that may no longer fit and telling listeners.
+        Should be called after the change so the neighbourhood it affects can be read from the graph.
+
+        Args:
+            nodes (Optional[Iterable[str]]): nodes that were added or removed or had relationships added or removed,
+                everything is treated as changed if not given
+            affected (Optional[Iterable[str]]): the neighbourhood of the nodes when the write already returned it,
+                read with neighbourhood if not given
+
+        Returns:
+            Optional[Set[str]]: the nodes affected by the change, None when everything may have changed
+        """
+        self.version += 1
+        changed = None if nodes is None else set(nodes)
+        reach = None
+        if changed is not None and len(changed) <= TARGETED_CHANGE_LIMIT:
+            # pylint: disable=assignment-from-none
+            reach = (
+                self.neighbourhood(changed)
+                if affected is None
+                else changed | set(affected)
+            )
+        if reach is None:
+            self.fake_words.clear()
+        else:
+            self.fake_words.discard(reach)
+
+        notify(
+            self.listeners,
+            GraphChange(
+                self.version,
+                None if changed is None else frozenset(changed),
+                None if reach is None else frozenset(reach),
+            ),
+        )
+        return reach
+
+    # pylint: disable=unused-argument
+    def neighbourhood(self, names: Set[str]) -> Optional[Set[str]]:
+        """
+        The nodes whose similarity rows, related nodes and fake words can change when the given nodes change, including
+        the nodes themselves. Scores only reach two hops in either direction, graphs whose similarity rows also list
+        nodes further away return every node within that distance.
+
+        Args:
+            names (Set[str]): the changed nodes
+
+        Returns:
+            Optional[Set[str]]: the neighbourhood, None if the graph cannot work it out so everything counts as affected
+        """
+        return None
 
     def close(self):
         """Ensure all connections are closed where appropriate."""
@@ -43,6 +306,46 @@ class MCQGraph:
             ValueError: if a relationship fail to be created.
         """
 
+    def merge_nodes(self, nodes: List[MCQNode]):
+        """
+        Creates the nodes that are not in the database yet, nodes that already exist are left as they are.
+
+        Args:
+            nodes (List[MCQNode]): input nodes, with distinct names
+        """
+        self.create_nodes(
+            [node for node in nodes if self.get_node(node.name) is None]
+        )
+
+    def merge_relationships(self, relationships: List[MCQRelationship]):
+        """
+        Creates the relationships that are not in the database yet.
+
+        Args:
+            relationships (List[MCQRelationship]): list of relationships to create
+        """
+        self.create_relationships(
+            [x for x in relationships if not self.has_relationship(x)]
+        )
+
+    def remove_nodes(self, names: List[str]):
+        """
+        Removes nodes and every relationship to or from them, names that are not in the database are ignored.
+
+        Args:
+            names (List[str]): names of the nodes to remove
+        """
+        raise NotImplementedError()
+
+    def remove_relationships(self, relationships: List[MCQRelationship]):
+        """
+        Removes relationships, relationships that are not in the database are ignored.
+
+        Args:
+            relationships (List[MCQRelationship]): relationships to remove
+        """
+        raise NotImplementedError()
+
     def get_node(self, name: str) -> Union[MCQNode, None]:
         """
         Checks the database contains a node with the given name.
@@ -67,17 +370,78 @@ class MCQGraph:
         """
         raise NotImplementedError()
 
+    def nodes(self) -> Iterator[MCQNode]:
+        """
+        Iterates over every node in the database.
+
+        Returns:
+            Iterator[MCQNode]: all nodes
+        """
+        raise NotImplementedError()
+
+    def relationships(self) -> Iterator[MCQRelationship]:
+        """
+        Iterates over every relationship in the database.
+
+        Returns:
+            Iterator[MCQRelationship]: all relationships
+        """
+        raise NotImplementedError()
+
     def random_relationship(
-        self, seed: Optional[int] = None
+        self,
+        seed: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
     ) -> MCQRelationship:
         """
-        Randomly choose and return a relationship
+        Randomly choose and return a relationship, optionally only from those matching a filter.
+        The answer node of a relationship is the topic of the question built from it.
+
+        Args:
+            seed (Optional[int]): seed for the random choice, used when no rng is given
+            rng (Optional[random.Random]): random number generator owned by the caller
+            answer_node (Optional[str]): only choose relationships from this node
+            relationship_type (Optional[str]): only choose relationships of this type
+
+        Raises:
+            ValueError: if there are no relationships or none match the filter
 
         Returns:
             MCQRelationship: randomly chosen relationship
         """
         raise NotImplementedError()
 
+    # pylint: disable=too-many-arguments
+    def random_relationships(
+        self,
+        n: int,
+        seed: Optional[int] = None,
+        unique: bool = True,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> List[MCQRelationship]:
+        """
+        Randomly choose and return several relationships at once, optionally only from those matching a filter
+
+        Args:
+            n (int): number of relationships to choose
+            seed (Optional[int]): seed for the random choice, used when no rng is given
+            unique (bool): sample without replacement, the output is capped at the number of matching relationships
+            rng (Optional[random.Random]): random number generator owned by the caller
+            answer_node (Optional[str]): only choose relationships from this node
+            relationship_type (Optional[str]): only choose relationships of this type
+
+        Raises:
+            ValueError: if there are no relationships or none match the filter
+
+        Returns:
+            List[MCQRelationship]: randomly chosen relationships
+        """
+        raise NotImplementedError()
+
     def related_nodes(self, relationship: MCQRelationship) -> List[MCQNode]:
         """
         Based on a given relationship, provide all related nodes with the same relationship to the start node
@@ -113,40 +477,86 @@ class MCQGraph:
         """
         raise NotImplementedError()
 
-    def fill_graph(self, data: Dict[str, List[str]]):
+    def question_reads(self, relationship: MCQRelationship) -> QuestionReads:
+        """
+        Every read needed to build a question from a relationship.
+        Graph databases reached over the network can override this to fetch them all in one round trip.
+
+        Args:
+            relationship (MCQRelationship): the chosen edge between answer and topic
+
+        Returns:
+            QuestionReads: the answer node, or None if it does not exist, with its related, connected and similar nodes
+        """
+        answer_node = self.get_node(relationship.answer_node)
+        if answer_node is None:
+            return QuestionReads(None, [], [], {})
+        return QuestionReads(
+            answer_node,
+            self.related_nodes(relationship),
+            self.connected_nodes(answer_node),
+            self.similarity_matrix(answer_node),
+        )
+
+    def related_names(self, relationship: MCQRelationship) -> List[str]:
+        """
+        Names of the nodes related_nodes would return, graphs that hold names can override this to skip building nodes.
+
+        Args:
+            relationship (MCQRelationship): input relationship
+
+        Returns:
+            List[str]: related node names, excluding the answer node of the relationship
+        """
+        return [x.name for x in self.related_nodes(relationship)]
+
+    def connected_names(self, name: str) -> List[str]:
+        """
+        Names of the nodes connected_nodes would return, graphs that hold names can override this to skip building nodes.
+
+        Args:
+            name (str): name of the node
+
+        Returns:
+            List[str]: connected node names
+        """
+        return [x.name for x in self.connected_nodes(MCQNode(name=name))]
+
+    def name_reads(self, relationship: MCQRelationship) -> NameReads:
+        """
+        Every read needed to build a question from a relationship, as node names.
+
+        Args:
+            relationship (MCQRelationship): the chosen edge between answer and topic
+
+        Returns:
+            NameReads: whether the answer node exists, with the names of its related, connected and similar nodes
+        """
+        reads = self.question_reads(relationship)
+        return NameReads(
+            reads.answer_node is not None,
+            [x.name for x in reads.related_nodes],
+            [x.name for x in reads.connected_nodes],
+            reads.similarity,
+        )
+
+    def fill_graph(self, data: Dict[str, List[str]], chunk_size: int = 10000):
         """
         Fills graph with provided dictionary input
+        Every node is created first, then relationships are built and written one chunk at a time so they are never
+        all held in memory, in the same order as a single write.
 
         Args:
             data (Dict[str, List[str]]): input data
+            chunk_size (int, optional): relationships built and written together. Defaults to 10000.
 
         """
-        found_nodes = set()
-        relationships = []
-        for key, value in data.items():
-            if isinstance(value, list):
-                for item in value:
-                    found_nodes.add(key)
-                    found_nodes.add(item)
-                    relationships.append(
-                        MCQRelationship(
-                            **{
-                                'answer_node': key,
-                                'topic_node': item,
-                                'type': 'includes',
-                            }
-                        )
-                    )
-                    relationships.append(
-                        MCQRelationship(
-                            **{
-                                'topic_node': key,
-                                'answer_node': item,
-                                'type': 'belongs_to',
-                            }
-                        )
-                    )
-        nodes = [MCQNode(**{'name': key}) for key in sorted(found_nodes)]
+        nodes = graph_nodes(data)
         self.delete_all()
         self.create_nodes(nodes=nodes)
-        self.create_relationships(relationships=relationships)
+        relationships = graph_relationships(data)
+        while True:
+            chunk = list(itertools.islice(relationships, chunk_size))
+            if not chunk:
+                break
+            self.create_relationships(relationships=chunk)
@@ -1,50 +1,401 @@
 """Object for acessing neo4j graph database"""
 import random
+import threading
+import time
+import uuid
 from collections import Counter
-from typing import Any, Callable, Dict, List, Optional, Union
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
+from app.graphs.ingest import RELATIONSHIP_TYPE
 from app.graphs.log_util import create_logger
-from app.graphs.mcq_graph import MCQGraph
+from app.graphs.mcq_graph import (
+    TARGETED_CHANGE_LIMIT,
+    MCQGraph,
+    NameReads,
+    QuestionReads,
+    check_duplicates,
+)
+from app.graphs.query_log import TimedResult, start_timer
 from app.models import MCQNode, MCQRelationship
-from neo4j import GraphDatabase, Result, Session
+from neo4j import GraphDatabase, Record, Result, Session, Transaction
 
 logger = create_logger(__name__)
 
+# Cypher sent by the graph, %s placeholders take relationship types
+QUERY_CREATE_CONSTRAINT = (
+    'CREATE CONSTRAINT IF NOT EXISTS FOR (e:Entity) REQUIRE e.name IS UNIQUE;'
+)
+QUERY_DELETE_ALL = """
+    MATCH (node)
+    DETACH DELETE node;
+"""
+QUERY_FIND_NODES = """
+    UNWIND $names AS name
+    MATCH (node:Entity {name: name})
+    RETURN node
+"""
+QUERY_CREATE_NODES = """
+    UNWIND $rows AS props
+    CREATE (node:Entity)
+    SET node = props
+"""
+# Ends a write with the names within two hops of the written names, read only when $reach is set so large writes
+# that invalidate everything skip the traversal, the %s placeholder takes the value returned alongside them
+RETURN_NEIGHBOURHOOD = """
+    CALL {
+        WITH names
+        UNWIND CASE WHEN $reach THEN names ELSE [] END AS name
+        MATCH (:Entity {name: name})-[*0..2]-(other:Entity)
+        RETURN COLLECT(DISTINCT other.name) AS neighbourhood
+    }
+    RETURN %s, neighbourhood
+"""
+QUERY_CREATE_RELATIONSHIPS = (
+    """
+    UNWIND $rows AS row
+    MATCH (answer_node:Entity {name: row.answer_node})
+    MATCH (topic_node:Entity {name: row.topic_node})
+    CREATE (answer_node)-[relationship:%s]->(topic_node)
+    WITH COUNT(relationship) AS created, COLLECT(answer_node.name) + COLLECT(topic_node.name) AS names
+"""
+    + RETURN_NEIGHBOURHOOD % 'created'
+)
+QUERY_MERGE_NODES = """
+    UNWIND $rows AS props
+    MERGE (node:Entity {name: props.name})
+    ON CREATE SET node = props
+"""
+QUERY_MERGE_RELATIONSHIPS = (
+    """
+    UNWIND $rows AS row
+    MATCH (answer_node:Entity {name: row.answer_node})
+    MATCH (topic_node:Entity {name: row.topic_node})
+    MERGE (answer_node)-[relationship:%s]->(topic_node)
+    WITH COUNT(relationship) AS created, COLLECT(answer_node.name) + COLLECT(topic_node.name) AS names
+"""
+    + RETURN_NEIGHBOURHOOD % 'created'
+)
+QUERY_REMOVE_NODES = (
+    """
+    UNWIND $rows AS row
+    MATCH (node:Entity {name: row.name})
+    OPTIONAL MATCH (node)--(neighbour:Entity)
+    WITH node, COLLECT(DISTINCT neighbour.name) AS neighbours
+    DETACH DELETE node
+    WITH REDUCE(names = [], group IN COLLECT(neighbours) | names + group) AS names
+"""
+    + RETURN_NEIGHBOURHOOD % 'names'
+)
+QUERY_REMOVE_RELATIONSHIPS = (
+    """
+    UNWIND $rows AS row
+    MATCH (answer_node:Entity {name: row.answer_node})-[relationship:%s]->(topic_node:Entity {name: row.topic_node})
+    DELETE relationship
+    WITH COUNT(relationship) AS removed, COLLECT(answer_node.name) + COLLECT(topic_node.name) AS names
+"""
+    + RETURN_NEIGHBOURHOOD % 'removed'
+)
+# Nodes within two hops of the given nodes, whose similarity and related nodes a change to them can reach
+QUERY_NEIGHBOURHOOD = """
+    UNWIND $names AS name
+    MATCH (node:Entity {name: name})-[*0..2]-(other:Entity)
+    RETURN DISTINCT other.name AS name
+"""
+QUERY_GET_NODE = """
+    MATCH (node:Entity {name: $name})
+    RETURN node;
+"""
+QUERY_HAS_RELATIONSHIP = """
+    MATCH (answer_node:Entity {name: $answer_node})-[r:%s]->(topic_node:Entity {name: $topic_node})
+    RETURN r
+"""
+QUERY_NODES = """
+    MATCH (node:Entity)
+    RETURN node
+    ORDER BY node.name
+"""
+QUERY_RELATIONSHIPS = """
+    MATCH (answer_node:Entity)-[relationship]->(topic_node:Entity)
+    RETURN answer_node.name AS answer_node, topic_node.name AS topic_node, type(relationship) AS type
+"""
+# Relationships are ordered by answer node name so a seed picks the same relationship whenever the same data is loaded.
+# Answer nodes are read in name order from the name constraint index, so the relationships are never sorted
+QUERY_RELATIONSHIP_IDS = """
+    MATCH (answer_node:Entity)
+    WHERE answer_node.name IS NOT NULL
+    WITH answer_node
+    ORDER BY answer_node.name
+    RETURN [(answer_node)-[relationship]->(:Entity) | elementId(relationship)] AS ids
+"""
+# The most filters whose relationship ids are kept at once, all of them are dropped when there are more
+FILTERED_IDS_LIMIT = 1024
+# How many times chosen relationships are read again after finding some of them removed by another client
+STALE_ID_RETRIES = 3
+# Filtered reads start from the name constraint index or the relationship type lookup index
+QUERY_RELATIONSHIP_IDS_FROM = """
+    MATCH (answer_node:Entity {name: $answer_node})-[relationship]->(topic_node:Entity)
+    WHERE $type IS NULL OR type(relationship) = $type
+    RETURN elementId(relationship) AS id
+    ORDER BY topic_node.name, type(relationship)
+"""
+QUERY_RELATIONSHIP_IDS_OF_TYPE = """
+    MATCH (answer_node:Entity)-[relationship:%s]->(topic_node:Entity)
+    RETURN elementId(relationship) AS id
+    ORDER BY answer_node.name, topic_node.name
+"""
+QUERY_RELATIONSHIPS_BY_ID = """
+    UNWIND $ids AS id
+    MATCH (answer_node:Entity)-[relationship]->(topic_node:Entity)
+    WHERE elementId(relationship) = id
+    RETURN answer_node.name AS answer_node, topic_node.name AS topic_node, type(relationship) AS type
+"""
+QUERY_RELATED_NODES = """
+    MATCH (answer_node:Entity {name: $answer_node})-[r:%s]->(b:Entity {name: $topic_node})<-[r2:%s]-(related_node:Entity)
+    RETURN related_node
+"""
+QUERY_CONNECTED_NODES = """
+    MATCH (node:Entity {name: $node})--(connected_node:Entity)
+    RETURN COLLECT(DISTINCT connected_node) AS connected_nodes
+"""
+QUERY_DROP_PROJECTION = """
+    WITH $graph_projection AS graphName
+    CALL gds.graph.exists(graphName) YIELD exists
+    WITH graphName, exists
+    WHERE exists = true
+    CALL gds.graph.drop(graphName) YIELD graphName AS droppedGraphName
+    RETURN droppedGraphName
+"""
+QUERY_PROJECT_GRAPH = """
+    CALL gds.graph.project(
+        $graph_projection,
+        '*',
+        '*'
+    );
+"""
+QUERY_SIMILARITY = """
+    MATCH (n:Entity) where n.name = $node
+    CALL gds.alpha.nodeSimilarity.filtered.stream($graph_projection, {sourceNodeFilter: n, topK: 20})
+    YIELD node1, node2, similarity
+    RETURN gds.util.asNode(node2).name AS key, similarity AS value
+    ORDER BY similarity DESCENDING, key
+"""
+# Reads everything a question needs about its answer node in one round trip
+QUERY_QUESTION = """
+    MATCH (answer_node:Entity {name: $answer_node})
+    CALL {
+        WITH answer_node
+        OPTIONAL MATCH (answer_node)-[r:%s]->(b:Entity {name: $topic_node})<-[r2:%s]-(related_node:Entity)
+        RETURN COLLECT(related_node) AS related_nodes
+    }
+    CALL {
+        WITH answer_node
+        OPTIONAL MATCH (answer_node)--(connected_node:Entity)
+        RETURN COLLECT(DISTINCT connected_node) AS connected_nodes
+    }
+    CALL {
+        WITH answer_node
+        CALL gds.alpha.nodeSimilarity.filtered.stream($graph_projection, {sourceNodeFilter: answer_node, topK: 20})
+        YIELD node2, similarity
+        RETURN COLLECT({key: gds.util.asNode(node2).name, value: similarity}) AS similarity
+    }
+    RETURN answer_node, related_nodes, connected_nodes, similarity
+"""
+GRAPH_PROJECTION = 'graph_projection'
+
+
+def projection_name(instance: str, version: int) -> str:
+    """
+    The name of the GDS projection of a version of the graph, each version gets its own so a new projection can be
+    created while requests are still streaming from the previous one.
+    Versions are counted by each graph object, so the name also holds the id of the object to keep other processes
+    using the same database from dropping its projections.
+
+    Args:
+        instance (str): unique id of the graph object
+        version (int): version of the graph that is projected
+
+    Returns:
+        str: name of the projection
+    """
+    return f'{GRAPH_PROJECTION}_{instance}_{version}'
+
+
+Row = Dict[str, Any]
+
+
+def chunked(rows: List[Row], size: int) -> Iterator[List[Row]]:
+    """
+    Splits rows into chunks to be written one transaction at a time.
+
+    Args:
+        rows (List[Row]): rows to write
+        size (int): the most rows in a chunk
+
+    Yields:
+        List[Row]: the next chunk of rows
+    """
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def rows_by_type(relationships: List[MCQRelationship]) -> Dict[str, List[Row]]:
+    """
+    Groups relationships by type as the type of a relationship can not be passed to Cypher as a parameter.
+
+    Args:
+        relationships (List[MCQRelationship]): relationships to write
+
+    Returns:
+        Dict[str, List[Row]]: answer and topic node names of each relationship by type
+    """
+    grouped: Dict[str, List[Row]] = {}
+    for relationship in relationships:
+        grouped.setdefault(relationship.type, []).append(
+            {
+                'answer_node': relationship.answer_node,
+                'topic_node': relationship.topic_node,
+            }
+        )
+    return grouped
+
+
+def filtered_ids_query(
+    answer_node: Optional[str], relationship_type: Optional[str]
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    The query reading the ids of the relationships that match a filter.
+
+    Args:
+        answer_node (Optional[str]): only relationships from this node
+        relationship_type (Optional[str]): only relationships of this type
+
+    Raises:
+        ValueError: if the type is not a plain identifier, as it is written into the query
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: the query and its parameters
+    """
+    if answer_node is not None:
+        return QUERY_RELATIONSHIP_IDS_FROM, {
+            'answer_node': answer_node,
+            'type': relationship_type,
+        }
+    if relationship_type is None or not RELATIONSHIP_TYPE.match(
+        relationship_type
+    ):
+        logger.error('Invalid relationship type: %r', relationship_type)
+        raise ValueError(
+            f'Invalid Input Error: invalid relationship type {relationship_type!r}.'
+        )
+    return QUERY_RELATIONSHIP_IDS_OF_TYPE % relationship_type, {}
+
+
+def question_reads(record: Optional[Record]) -> QuestionReads:
+    """
+    Converts the result of the combined question query.
+
+    Args:
+        record (Optional[Record]): the only record of the result, None if the answer node was not found
+
+    Returns:
+        QuestionReads: the answer node with its related, connected and similar nodes
+    """
+    if record is None:
+        return QuestionReads(None, [], [], {})
+    return QuestionReads(
+        MCQNode(**dict(record['answer_node'].items())),
+        [MCQNode(**dict(x.items())) for x in record['related_nodes']],
+        [MCQNode(**dict(x.items())) for x in record['connected_nodes']],
+        {x['key']: x['value'] for x in record['similarity']},
+    )
+
+
+def question_names(record: Optional[Record]) -> NameReads:
+    """
+    Converts the result of the combined question query to node names, without building a node for each record.
+
+    Args:
+        record (Optional[Record]): the only record of the result, None if the answer node was not found
+
+    Returns:
+        NameReads: whether the answer node was found, with the names of its related, connected and similar nodes
+    """
+    if record is None:
+        return NameReads(False, [], [], {})
+    return NameReads(
+        True,
+        [x['name'] for x in record['related_nodes']],
+        [x['name'] for x in record['connected_nodes']],
+        {x['key']: x['value'] for x in record['similarity']},
+    )
+
+
+def log_throughput(name: str, rows: int, seconds: float):
+    """
+    Logs how quickly rows were written.
+
+    Args:
+        name (str): what the rows are
+        rows (int): number of rows written
+        seconds (float): time taken to write them
+    """
+    logger.info(
+        'Created %s %s in %.3f seconds, %.0f rows per second.',
+        rows,
+        name,
+        seconds,
+        rows / seconds if seconds > 0 else 0,
+    )
+
 
 def log(func: Callable[..., Any]):
     """
-    A wrapper that logs the query sent to Neo4j via the driver as logging is not included in the free version.
+    A wrapper that logs and times the queries sent to Neo4j via the driver as logging is not included in the free version.
+    Nothing is formatted or timed unless debug logging is on or query_stats is enabled.
 
     Args:
         func (Callable[..., Any]): session run function
     """
 
     def log_wrapper(
-        session: Session, query: str, **kwargs: Dict[str, Any]
-    ) -> Callable:
+        session: Union[Session, Transaction],
+        query: str,
+        **kwargs: Dict[str, Any],
+    ) -> Any:
         """
         Logs message at debug level of the query with params and variables replaced as it would be sent to the driver.
 
         Args:
-            session (Session): session to which the query is sent
+            session (Union[Session, Transaction]): session or transaction to which the query is sent
             query (str): original query string
         """
-        output = query[:]
-        for arg_name, arg_value in kwargs.items():
-            output = output.replace(f'${arg_name}', "'" + str(arg_value) + "'")
-        logger.debug(output)
-        return func(session, query, **kwargs)
+        timer = start_timer(query, kwargs, logger)
+        result = func(session, query, **kwargs)
+        return result if timer is None else TimedResult(result, timer)
 
     return log_wrapper
 
 
 @log
-def run(session: Session, query: str, **params: Dict[str, Any]) -> Result:
+def run(
+    session: Union[Session, Transaction], query: str, **params: Dict[str, Any]
+) -> Result:
     """
     Run a query through the python driver neo4j session
 
     Args:
-        session (Session): Session instance
+        session (Union[Session, Transaction]): Session instance, or a transaction open in one
         query (str): query string
 
     Returns:
@@ -53,19 +404,46 @@ def run(session: Session, query: str, **params: Dict[str, Any]) -> Result:
     return session.run(query, params)
 
 
+def execute(session: Union[Session, Transaction], query: str, **params: Any):
+    """
+    Run a query whose records are not needed, reading it to the end so it is timed and any error is raised here.
+
+    Args:
+        session (Union[Session, Transaction]): Session instance, or a transaction open in one
+        query (str): query string
+    """
+    run(session, query, **params).consume()
+
+
+# pylint: disable=too-many-public-methods,too-many-instance-attributes
 class Neo4JGraph(MCQGraph):
     """
     This object forms an interface via neo4j python driver to the neo4j graph database.
     """
 
-    def __init__(self, uri, user, password):
-        super()
+    def __init__(self, uri, user, password, batch_size: int = 10000):
+        super().__init__()
+        # The most rows written in one transaction
+        self.batch_size = batch_size
+        # The graph version the current GDS projection was made from and its name
+        self.projection: Optional[Tuple[int, str]] = None
+        # Unique to this object, so its projection names do not clash with other processes
+        self.instance = uuid.uuid4().hex
+        self.projection_lock = threading.Lock()
+        # Queries running on each projection, and replaced projections that are dropped once their last query is done
+        self.projection_users: Counter = Counter()
+        self.retired_projections: Set[str] = set()
+        # The graph version the relationship ids were read at and the ids, so random relationships are one id lookup
+        self.relationship_ids: Optional[Tuple[int, List[str]]] = None
+        self.relationship_ids_lock = threading.Lock()
+        # The same for each filter by answer node and type that has been read
+        self.filtered_ids: Dict[
+            Tuple[Optional[str], Optional[str]], Tuple[int, List[str]]
+        ] = {}
+        self.filtered_ids_lock = threading.Lock()
         self.create_driver(uri, user, password)
         with self.driver.session() as session:
-            run(
-                session,
-                query='CREATE CONSTRAINT IF NOT EXISTS FOR (e:Entity) REQUIRE e.name IS UNIQUE;',
-            )
+            execute(session, query=QUERY_CREATE_CONSTRAINT)
 
     def create_driver(self, uri, user, password):
         """
@@ -92,86 +470,155 @@ class Neo4JGraph(MCQGraph):
             raise e
 
     def close(self):
+        names = set(self.retired_projections)
+        if self.projection is not None:
+            names.add(self.projection[1])
+        if names:
+            with self.driver.session() as session:
+                for name in sorted(names):
+                    execute(
+                        session, QUERY_DROP_PROJECTION, graph_projection=name
+                    )
+        self.projection = None
+        self.retired_projections.clear()
         self.driver.close()
         logger.info('Neo4J Connection closed.')
 
+    def neighbourhood(self, names: Set[str]) -> Optional[Set[str]]:
+        with self.driver.session() as session:
+            result = run(session, QUERY_NEIGHBOURHOOD, names=list(names))
+            return set(names) | {record['name'] for record in result}
+
     def delete_all(self):
         with self.driver.session() as session:
-            query = """
-                MATCH (node)
-                DETACH DELETE node;
-            """
-            run(session=session, query=query)
+            execute(session=session, query=QUERY_DELETE_ALL)
+            self.mark_changed()
             logger.info('All nodes removed from graph database.')
 
     def create_nodes(self, nodes: List[MCQNode]):
-        # Check for duplicates within the input
-        counter = Counter([x.name for x in nodes])
-        duplicates = [x for x in nodes if counter[x.name] > 1]
-        if duplicates:
-            logger.error(
-                'Duplicate name inputs detected: %s',
-                {x.name for x in nodes},
-                extra={'nodes': duplicates},
+        with self.driver.session() as session:
+            result = run(
+                session, QUERY_FIND_NODES, names=[node.name for node in nodes]
             )
-            raise ValueError(
-                f'Duplication Error: {len(duplicates)} node duplicates within input.'
+            check_duplicates(
+                nodes,
+                [MCQNode(**dict(record['node'].items())) for record in result],
             )
+            self.__write_nodes(session, QUERY_CREATE_NODES, nodes)
 
-        # Check for duplicates within the database
-        matches = [
-            y for y in [self.get_node(x.name) for x in nodes] if y is not None
-        ]
-        if matches:
-            logger.error(
-                'Nodes already exist with these names: %s',
-                {x.name for x in matches},
-                extra={'nodes': matches},
-            )
-            raise ValueError(
-                f'Duplication Error: {len(matches)} nodes already have names in database.'
+    def merge_nodes(self, nodes: List[MCQNode]):
+        with self.driver.session() as session:
+            self.__write_nodes(session, QUERY_MERGE_NODES, nodes)
+
+    def __write_nodes(
+        self, session: Session, query: str, nodes: List[MCQNode]
+    ):
+        """
+        Writes nodes in chunks, one transaction each.
+
+        Args:
+            session (Session): session to write in
+            query (str): query run for each chunk of rows
+            nodes (List[MCQNode]): nodes to write
+        """
+        start = time.perf_counter()
+        for rows in chunked([node.dict() for node in nodes], self.batch_size):
+            with session.begin_transaction() as transaction:
+                execute(transaction, query, rows=rows)
+                transaction.commit()
+        # New nodes have no relationships so nothing but themselves is affected
+        names = [node.name for node in nodes]
+        self.mark_changed(names, affected=names)
+        log_throughput('nodes', len(nodes), time.perf_counter() - start)
+
+    def create_relationships(self, relationships: List[MCQRelationship]):
+        self.__write_relationships(QUERY_CREATE_RELATIONSHIPS, relationships)
+
+    def merge_relationships(self, relationships: List[MCQRelationship]):
+        self.__write_relationships(QUERY_MERGE_RELATIONSHIPS, relationships)
+
+    def __write_relationships(
+        self, query_template: str, relationships: List[MCQRelationship]
+    ):
+        """
+        Writes relationships in chunks grouped by type, one transaction each.
+
+        Args:
+            query_template (str): query run for each chunk of rows, formatted with the relationship type
+            relationships (List[MCQRelationship]): relationships to write
+        """
+        created = 0
+        start = time.perf_counter()
+        names = {
+            name
+            for x in relationships
+            for name in (x.answer_node, x.topic_node)
+        }
+        affected = set(names)
+        reach = len(names) <= TARGETED_CHANGE_LIMIT
+        with self.driver.session() as session:
+            for rel_type, rel_rows in rows_by_type(relationships).items():
+                query = query_template % rel_type
+                for rows in chunked(rel_rows, self.batch_size):
+                    with session.begin_transaction() as transaction:
+                        record = run(
+                            transaction, query, rows=rows, reach=reach
+                        ).single()
+                        created += record['created']
+                        affected.update(record['neighbourhood'])
+                        transaction.commit()
+        if created < len(relationships):
+            logger.warning(
+                'Failed to create %s relationships, their nodes were not found.',
+                len(relationships) - created,
+                extra={'relationship': relationships},
             )
+        self.mark_changed(names, affected=affected)
+        log_throughput('relationships', created, time.perf_counter() - start)
 
-        # Create nodes in session batches
-        query = 'CREATE (:Entity $props);'
+    def remove_nodes(self, names: List[str]):
+        # Neighbours are returned by the delete as the change reaches them through relationships that are removed
+        changed = set(names)
+        affected = set(names)
+        reach = len(names) <= TARGETED_CHANGE_LIMIT
         with self.driver.session() as session:
-            for node in nodes:
-                session.run(query, props=node.dict())
-            logger.info('Created %s nodes.', len(nodes))
+            for rows in chunked([{'name': x} for x in names], self.batch_size):
+                with session.begin_transaction() as transaction:
+                    record = run(
+                        transaction, QUERY_REMOVE_NODES, rows=rows, reach=reach
+                    ).single()
+                    changed.update(record['names'])
+                    affected.update(record['neighbourhood'])
+                    transaction.commit()
+        self.mark_changed(changed, affected=affected)
+        logger.info('Removed %s nodes.', len(names))
 
-    def create_relationships(self, relationships: List[MCQRelationship]):
+    def remove_relationships(self, relationships: List[MCQRelationship]):
+        removed = 0
+        names = {
+            name
+            for x in relationships
+            for name in (x.answer_node, x.topic_node)
+        }
+        affected = set(names)
+        reach = len(names) <= TARGETED_CHANGE_LIMIT
         with self.driver.session() as session:
-            for relationship in relationships:
-                query = (
-                    """
-                    MATCH (answer_node:Entity {name: $answer_node})
-                    MATCH (topic_node:Entity {name: $topic_node})
-                    CREATE (answer_node)-[relationship:%s]->(topic_node)
-                    return relationship;
-                """
-                    % relationship.type
-                )
-                # log_query(logger, query, **relationship.dict())
-                success = bool(
-                    session.run(query, **relationship.dict()).single()
-                )
-                if not success:
-                    logger.warning(
-                        'Failed to create relationship: %s',
-                        str(relationship),
-                        extra={'relationship': relationships},
-                    )
-        logger.info(
-            'Created %s relationships in the database.', len(relationships)
-        )
+            for rel_type, rel_rows in rows_by_type(relationships).items():
+                query = QUERY_REMOVE_RELATIONSHIPS % rel_type
+                for rows in chunked(rel_rows, self.batch_size):
+                    with session.begin_transaction() as transaction:
+                        record = run(
+                            transaction, query, rows=rows, reach=reach
+                        ).single()
+                        removed += record['removed']
+                        affected.update(record['neighbourhood'])
+                        transaction.commit()
+        self.mark_changed(names, affected=affected)
+        logger.info('Removed %s relationships from the database.', removed)
 
-    def get_node(self, name: str) -> Union[MCQNode, None]:
+    def get_node(self, name: str) -> Optional[MCQNode]:
         with self.driver.session() as session:
-            query = """
-                MATCH (node:Entity {name: $name})
-                RETURN node;
-            """
-            result = session.run(query, name=name)
+            result = run(session, QUERY_GET_NODE, name=name)
             record = result.single()
             if record:
                 return MCQNode(**dict(record['node'].items()))
@@ -179,50 +626,196 @@ class Neo4JGraph(MCQGraph):
 
     def has_relationship(self, relationship: MCQRelationship) -> bool:
         with self.driver.session() as session:
-            query = (
-                """
-                MATCH (answer_node:Entity {name: $answer_node})-[r:%s]->(topic_node:Entity {name: $topic_node})
-                RETURN r
-            """
-                % relationship.type
-            )
+            query = QUERY_HAS_RELATIONSHIP % relationship.type
             result = run(session, query, **relationship.dict())
             return bool(result.single())
 
-    def random_relationship(
-        self, seed: Optional[int] = None
-    ) -> MCQRelationship:
+    def nodes(self) -> Iterator[MCQNode]:
         with self.driver.session() as session:
-            query_count = """
-            MATCH ()-[relationship]->()
-            RETURN COUNT(relationship) AS num_rels
-            """
-            num_rels = session.run(query_count).single()['num_rels']
-            if num_rels < 1:
-                raise ValueError('Empty Database.')
-            random.seed(seed)
-            random_index = random.randint(1, num_rels)
-            query = """
-                MATCH (answer_node)-[relationship]->(topic_node)
-                RETURN answer_node, relationship, topic_node
-                ORDER BY answer_node.name
-                SKIP $n - 1
-                LIMIT 1
-            """
-            result = run(session, query, n=random_index).single()
-            relationship = MCQRelationship(
-                answer_node=result['answer_node']['name'],
-                topic_node=result['topic_node']['name'],
-                type=result['relationship'].type,
+            records = list(run(session, QUERY_NODES))
+        for record in records:
+            yield MCQNode(**dict(record['node'].items()))
+
+    def relationships(self) -> Iterator[MCQRelationship]:
+        with self.driver.session() as session:
+            records = list(run(session, QUERY_RELATIONSHIPS))
+        for record in records:
+            yield MCQRelationship(**record.data())
+
+    def __filtered_ids(
+        self,
+        session: Session,
+        answer_node: Optional[str],
+        relationship_type: Optional[str],
+    ) -> List[str]:
+        """
+        Returns the ids of the relationships matching a filter in the current version of the graph,
+        reading them only after the data has changed.
+
+        Args:
+            session (Session): session to read the ids in
+            answer_node (Optional[str]): only relationships from this node
+            relationship_type (Optional[str]): only relationships of this type
+
+        Raises:
+            ValueError: if no relationship matches
+
+        Returns:
+            List[str]: relationship element ids ordered by answer node, topic node and type
+        """
+        key = (answer_node, relationship_type)
+        with self.filtered_ids_lock:
+            cached = self.filtered_ids.get(key)
+        if cached is None or cached[0] != self.version:
+            version = self.version
+            query, params = filtered_ids_query(answer_node, relationship_type)
+            result = run(session, query, **params)
+            cached = (version, [record['id'] for record in result])
+            with self.filtered_ids_lock:
+                if len(self.filtered_ids) >= FILTERED_IDS_LIMIT:
+                    self.filtered_ids.clear()
+                self.filtered_ids[key] = cached
+        if not cached[1]:
+            raise ValueError('No relationships match the given filter.')
+        return cached[1]
+
+    def __relationship_ids(
+        self,
+        session: Session,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Returns the ids of every relationship in the current version of the graph, reading them only after the data has changed.
+
+        Args:
+            session (Session): session to read the ids in
+            answer_node (Optional[str]): only relationships from this node
+            relationship_type (Optional[str]): only relationships of this type
+
+        Raises:
+            ValueError: if there are no relationships or none match the filter
+
+        Returns:
+            List[str]: relationship element ids ordered by answer node name
+        """
+        if answer_node is not None or relationship_type is not None:
+            return self.__filtered_ids(session, answer_node, relationship_type)
+        cached = self.relationship_ids
+        if cached is None or cached[0] != self.version:
+            with self.relationship_ids_lock:
+                if (
+                    self.relationship_ids is None
+                    or self.relationship_ids[0] != self.version
+                ):
+                    version = self.version
+                    result = run(session, QUERY_RELATIONSHIP_IDS)
+                    self.relationship_ids = (
+                        version,
+                        [x for record in result for x in record['ids']],
+                    )
+                cached = self.relationship_ids
+        if not cached[1]:
+            raise ValueError('Empty Database.')
+        return cached[1]
+
+    def __relationships_by_id(
+        self, session: Session, ids: List[str]
+    ) -> Optional[List[MCQRelationship]]:
+        """
+        Looks up relationships by id, keeping the order of the ids.
+
+        Args:
+            session (Session): session to run the lookup in
+            ids (List[str]): relationship element ids
+
+        Returns:
+            Optional[List[MCQRelationship]]: the relationships, None if any is no longer in the database,
+                the cached ids are then dropped so they are read again
+        """
+        result = run(session, QUERY_RELATIONSHIPS_BY_ID, ids=ids)
+        relationships = [MCQRelationship(**record.data()) for record in result]
+        if len(relationships) < len(ids):
+            logger.warning(
+                'Relationships were removed from the database, reading their ids again.'
             )
-            return relationship
+            with self.relationship_ids_lock:
+                self.relationship_ids = None
+            with self.filtered_ids_lock:
+                self.filtered_ids.clear()
+            return None
+        return relationships
+
+    def __random_relationships(
+        self,
+        choose: Callable[[List[str]], List[str]],
+        answer_node: Optional[str],
+        relationship_type: Optional[str],
+    ) -> List[MCQRelationship]:
+        """
+        Chooses relationship ids and looks them up. Ids removed by another client since they were read are read again,
+        and the choice made once more from the fresh ids.
+
+        Args:
+            choose (Callable[[List[str]], List[str]]): chooses ids from all matching ids
+            answer_node (Optional[str]): only relationships from this node
+            relationship_type (Optional[str]): only relationships of this type
+
+        Raises:
+            ValueError: if there are no relationships, none match the filter, or they keep being removed
+
+        Returns:
+            List[MCQRelationship]: the chosen relationships
+        """
+        with self.driver.session() as session:
+            for _ in range(STALE_ID_RETRIES):
+                ids = self.__relationship_ids(
+                    session, answer_node, relationship_type
+                )
+                relationships = self.__relationships_by_id(
+                    session, choose(ids)
+                )
+                if relationships is not None:
+                    return relationships
+        logger.error('Relationships kept being removed while being read.')
+        raise ValueError('Relationships were removed from the database.')
+
+    def random_relationship(
+        self,
+        seed: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> MCQRelationship:
+        chooser = rng or random.Random(seed)
+        return self.__random_relationships(
+            lambda ids: [ids[chooser.randrange(len(ids))]],
+            answer_node,
+            relationship_type,
+        )[0]
+
+    # pylint: disable=too-many-arguments
+    def random_relationships(
+        self,
+        n: int,
+        seed: Optional[int] = None,
+        unique: bool = True,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> List[MCQRelationship]:
+        chooser = rng or random.Random(seed)
+        return self.__random_relationships(
+            lambda ids: chooser.sample(ids, min(n, len(ids)))
+            if unique
+            else chooser.choices(ids, k=n),
+            answer_node,
+            relationship_type,
+        )
 
     def related_nodes(self, relationship: MCQRelationship) -> List[MCQNode]:
         with self.driver.session() as session:
-            query = """
-            MATCH (answer_node:Entity {name: $answer_node})-[r:%s]->(b:Entity {name: $topic_node})<-[r2:%s]-(related_node:Entity)
-            RETURN related_node
-            """ % (
+            query = QUERY_RELATED_NODES % (
                 relationship.type,
                 relationship.type,
             )
@@ -240,56 +833,103 @@ class Neo4JGraph(MCQGraph):
 
     def connected_nodes(self, node: MCQNode) -> List[MCQNode]:
         with self.driver.session() as session:
-            query = """
-                MATCH (node:Entity {name: $node})--(connected_node:Entity)
-                RETURN COLLECT(DISTINCT connected_node) AS connected_nodes
-            """
-            result = run(session, query, node=node.name)
+            result = run(session, QUERY_CONNECTED_NODES, node=node.name)
             nodes = [
                 MCQNode(**dict(x.items()))
                 for x in result.single()['connected_nodes']
             ]
             return nodes
 
+    @contextmanager
+    def hold_projection(self, session: Session) -> Iterator[str]:
+        """
+        Holds a GDS projection of the current version of the graph for the duration of a query.
+        The projection is only rebuilt after the data has changed. The one it replaces is dropped once the last query
+        holding it is done, so queries that started before the change are never left without their projection.
+        Only changes made through this object are seen, a database written to by other clients should be reloaded.
+
+        Args:
+            session (Session): session to run projection queries in
+
+        Yields:
+            str: name of the projection
+        """
+        with self.projection_lock:
+            if self.projection is None or self.projection[0] != self.version:
+                version = self.version
+                name = projection_name(self.instance, version)
+                execute(session, QUERY_DROP_PROJECTION, graph_projection=name)
+                execute(session, QUERY_PROJECT_GRAPH, graph_projection=name)
+                if self.projection is not None:
+                    self.retired_projections.add(self.projection[1])
+                self.projection = (version, name)
+                logger.info('Projected version %s of the graph.', version)
+            name = self.projection[1]
+            self.projection_users[name] += 1
+            # Replaced projections no query holds any more
+            idle = [
+                x
+                for x in self.retired_projections
+                if not self.projection_users[x]
+            ]
+            self.retired_projections.difference_update(idle)
+        for retired in idle:
+            execute(session, QUERY_DROP_PROJECTION, graph_projection=retired)
+        try:
+            yield name
+        finally:
+            with self.projection_lock:
+                self.projection_users[name] -= 1
+                drop = (
+                    not self.projection_users[name]
+                    and name in self.retired_projections
+                )
+                if not self.projection_users[name]:
+                    del self.projection_users[name]
+                if drop:
+                    self.retired_projections.discard(name)
+            if drop:
+                execute(session, QUERY_DROP_PROJECTION, graph_projection=name)
+
     def similarity_matrix(self, node: MCQNode) -> Dict[str, float]:
-        graph_projection = 'graph_projection'
-        with self.driver.session() as session:
-            query_drop_graph = """
-                WITH $graph_projection AS graphName
-                CALL gds.graph.exists(graphName) YIELD exists
-                WITH graphName, exists
-                WHERE exists = true
-                CALL gds.graph.drop(graphName) YIELD graphName AS droppedGraphName
-                RETURN droppedGraphName
-            """
-            run(
-                session=session,
-                query=query_drop_graph,
-                graph_projection=graph_projection,
-            )
-            query_build_graph = """
-                CALL gds.graph.project(
-                    $graph_projection,
-                    '*',
-                    '*'
-                );
-            """
-            run(
-                session,
-                query_build_graph,
-                graph_projection=graph_projection,
-            )
-            query_similarity = """
-                MATCH (n:Entity) where n.name = $node
-                CALL gds.alpha.nodeSimilarity.filtered.stream($graph_projection, {sourceNodeFilter: n, topK: 20})
-                YIELD node1, node2, similarity
-                RETURN gds.util.asNode(node2).name AS key, similarity AS value
-                ORDER BY similarity DESCENDING, key
-            """
+        with self.driver.session() as session, self.hold_projection(
+            session
+        ) as projection:
             result = run(
                 session,
-                query_similarity,
-                graph_projection=graph_projection,
+                QUERY_SIMILARITY,
+                graph_projection=projection,
                 node=node.name,
             )
             return {x['key']: x['value'] for x in result}
+
+    def __question_record(
+        self, relationship: MCQRelationship
+    ) -> Optional[Record]:
+        """
+        Runs the combined question query for a relationship.
+
+        Args:
+            relationship (MCQRelationship): the chosen edge between answer and topic
+
+        Returns:
+            Optional[Record]: the only record of the result, None if the answer node was not found
+        """
+        with self.driver.session() as session, self.hold_projection(
+            session
+        ) as projection:
+            query = QUERY_QUESTION % (relationship.type, relationship.type)
+            result = run(
+                session,
+                query,
+                graph_projection=projection,
+                answer_node=relationship.answer_node,
+                topic_node=relationship.topic_node,
+            )
+            return result.single()
+
+    def question_reads(self, relationship: MCQRelationship) -> QuestionReads:
+        return question_reads(self.__question_record(relationship))
+
+    def name_reads(self, relationship: MCQRelationship) -> NameReads:
+        return question_names(self.__question_record(relationship))
@@ -1,68 +1,193 @@
 """Object for accessing neo4j graph database"""
+import itertools
 import random
-from collections import Counter
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import networkx as nx
+from app.graphs.edge_table import Edge, EdgeTable
 from app.graphs.log_util import create_logger
-from app.graphs.mcq_graph import MCQGraph
+from app.graphs.mcq_graph import MCQGraph, NameReads, check_duplicates
+from app.graphs.similarity_index import SimilarityIndex
 from app.models import MCQNode, MCQRelationship
 
 logger = create_logger(__name__)
 
 
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
 class NXGraph(MCQGraph):
     """
     This object stores and pulls data from  a local graph database object in memory, as opposed to a seperate database.
     """
 
     def __init__(self):
-        super()
+        super().__init__()
         self.graph = nx.DiGraph()
+        # Answer nodes by (topic node, relationship type), dicts keep insertion order as ordered sets
+        self.in_edges: Dict[Tuple[str, str], Dict[str, None]] = {}
+        # The order nodes were added to the graph, networkx lists nodes and the edges of each node in this order
+        self.node_positions: Dict[str, int] = {}
+        self.__next_position = itertools.count()
+        # Relationship types by (answer node, topic node)
+        self.edge_types: Dict[Tuple[str, str], Set[str]] = {}
+        self.edge_table = EdgeTable()
+        # Every edge in networkx order, grouped by answer node in the order nodes were added, None until the next draw after a change
+        self.__ordered_edges: Optional[List[Edge]] = None
+        self.similarity_index = SimilarityIndex(self.__neighbours)
         logger.info('New networkx graph object created.')
 
+    def __neighbours(self, name: str) -> Set[str]:
+        """
+        Nodes connected to the given node in either direction.
+
+        Args:
+            name (str): name of the node
+
+        Returns:
+            Set[str]: names of the neighbouring nodes, empty if the node is not in the graph
+        """
+        if not self.graph.has_node(name):
+            return set()
+        return set(self.graph.pred[name]) | set(self.graph.succ[name])
+
+    def neighbourhood(self, names: Set[str]) -> Optional[Set[str]]:
+        return self.similarity_index.neighbourhood(names)
+
+    def __changed(self, names: Set[str]):
+        """
+        Records a change to the given nodes, dropping the similarity rows and fake words it may have made stale.
+
+        Args:
+            names (Set[str]): nodes that were added or removed or had relationships added or removed
+        """
+        affected = self.mark_changed(names)
+        if affected is None:
+            self.similarity_index.clear()
+        else:
+            self.similarity_index.discard(affected)
+
+    def build_similarity_index(self):
+        """Builds the similarity rows of every node so that no lookup has to build one."""
+        self.similarity_index.build(self.graph.nodes)
+
+    def __index_edge(self, relationship: MCQRelationship):
+        """
+        Adds a relationship to the adjacency indexes.
+        A pair of nodes holds a single relationship in a networkx DiGraph, so any previous type of the pair is replaced.
+
+        Args:
+            relationship (MCQRelationship): the relationship added to the graph
+        """
+        pair = (relationship.answer_node, relationship.topic_node)
+        for old_type in self.edge_types.get(pair, set()):
+            del self.in_edges[(relationship.topic_node, old_type)][
+                relationship.answer_node
+            ]
+        self.edge_types[pair] = {relationship.type}
+        self.in_edges.setdefault(
+            (relationship.topic_node, relationship.type), {}
+        )[relationship.answer_node] = None
+        self.edge_table.add(
+            (
+                relationship.answer_node,
+                relationship.topic_node,
+                relationship.type,
+            )
+        )
+        self.__ordered_edges = None
+
+    def __unindex_edge(self, answer_node: str, topic_node: str):
+        """
+        Removes the relationship between a pair of nodes from the adjacency indexes.
+
+        Args:
+            answer_node (str): start of the relationship
+            topic_node (str): end of the relationship
+        """
+        for old_type in self.edge_types.pop((answer_node, topic_node), set()):
+            answers = self.in_edges[(topic_node, old_type)]
+            del answers[answer_node]
+            if not answers:
+                del self.in_edges[(topic_node, old_type)]
+        self.edge_table.remove(answer_node, topic_node)
+        self.__ordered_edges = None
+
+    def __edges(self) -> List[Edge]:
+        """
+        Every edge in the order networkx lists them, the order uniformly random relationships have always been chosen from
+        so a seed picks the same relationship it always has.
+
+        Returns:
+            List[Edge]: answer node, topic node and type of each edge
+        """
+        edges = self.__ordered_edges
+        if edges is None:
+            # Only assigned once complete, so a concurrent draw never sees a half built list
+            edges = self.__ordered_edges = list(self.graph.edges(data='type'))
+        return edges
+
+    def set_sampling_weights(
+        self,
+        topic_weights: Optional[Dict[str, float]] = None,
+        type_weights: Optional[Dict[str, float]] = None,
+        recent_weight: float = 1.0,
+        recent_limit: int = 0,
+    ):
+        """
+        Weights the choice of random relationships, by default every relationship is equally likely.
+
+        Args:
+            topic_weights (Optional[Dict[str, float]]): positive weights by topic node name
+            type_weights (Optional[Dict[str, float]]): positive weights by relationship type
+            recent_weight (float, optional): weight multiplier between 0 and 1 for recently chosen relationships. Defaults to 1.0.
+            recent_limit (int, optional): how many of the last chosen relationships count as recent. Defaults to 0.
+        """
+        self.edge_table.set_weights(
+            topic_weights, type_weights, recent_weight, recent_limit
+        )
+
     def delete_all(self):
         self.graph.clear()
+        self.in_edges.clear()
+        self.edge_types.clear()
+        self.node_positions.clear()
+        self.edge_table.clear()
+        self.__ordered_edges = None
+        self.similarity_index.clear()
+        self.mark_changed()
 
     def create_nodes(self, nodes: List[MCQNode]):
-        # Check for duplicates within the input
-        counter = Counter([node.name for node in nodes])
-        duplicates = [node for node in nodes if counter[node.name] > 1]
-        if duplicates:
-            logger.error(
-                'Duplicate name inputs detected: %s',
-                {node.name for node in nodes},
-                extra={'nodes': duplicates},
-            )
-            raise ValueError(
-                f'Duplication Error: {len(duplicates)} node duplicates within input.'
-            )
-
-        # Check for duplicates within the database
-        matches = [node for node in nodes if self.graph.has_node(node.name)]
-        if matches:
-            logger.error(
-                'Nodes already exist with these names: %s',
-                {node.name for node in matches},
-                extra={'nodes': matches},
-            )
-            raise ValueError(
-                f'Duplication Error: {len(matches)} nodes already have names in database.'
-            )
+        check_duplicates(
+            nodes, [node for node in nodes if self.graph.has_node(node.name)]
+        )
 
         # Create nodes in session batches
         for node in nodes:
             self.graph.add_node(node.name, **node.dict())
+            self.node_positions[node.name] = next(self.__next_position)
+        self.__changed({node.name for node in nodes})
         logger.info('Created %s nodes.', len(nodes))
 
     def create_relationships(self, relationships: List[MCQRelationship]):
+        changed: Set[str] = set()
         for relationship in relationships:
             try:
+                # networkx adds missing nodes along with the edge
+                for name in (
+                    relationship.answer_node,
+                    relationship.topic_node,
+                ):
+                    self.node_positions.setdefault(
+                        name, next(self.__next_position)
+                    )
                 self.graph.add_edge(
                     relationship.answer_node,
                     relationship.topic_node,
                     type=relationship.type,
                 )
+                self.__index_edge(relationship)
+                changed.update(
+                    (relationship.answer_node, relationship.topic_node)
+                )
             # pylint: disable=broad-except
             except Exception as e:
                 logger.warning(
@@ -70,57 +195,190 @@ class NXGraph(MCQGraph):
                     str(relationship),
                     extra={'exception': e},
                 )
+        self.__changed(changed)
         logger.info(
             'Created %s relationships in the database.', len(relationships)
         )
 
+    def merge_nodes(self, nodes: List[MCQNode]):
+        self.create_nodes(
+            [node for node in nodes if not self.graph.has_node(node.name)]
+        )
+
+    def merge_relationships(self, relationships: List[MCQRelationship]):
+        # Checked against the type index rather than building the edge of every relationship
+        self.create_relationships(
+            [
+                x
+                for x in relationships
+                if x.type
+                not in self.edge_types.get((x.answer_node, x.topic_node), ())
+            ]
+        )
+
+    def remove_nodes(self, names: List[str]):
+        # Neighbours are gathered first as the change reaches them through relationships that are about to go
+        changed: Set[str] = set()
+        for name in names:
+            if not self.graph.has_node(name):
+                continue
+            changed.add(name)
+            changed.update(self.__neighbours(name))
+            pairs = set(self.graph.in_edges(name)) | set(
+                self.graph.out_edges(name)
+            )
+            self.graph.remove_node(name)
+            del self.node_positions[name]
+            for answer_node, topic_node in pairs:
+                self.__unindex_edge(answer_node, topic_node)
+        self.__changed(changed)
+        logger.info('Removed %s nodes.', len(names))
+
+    def remove_relationships(self, relationships: List[MCQRelationship]):
+        changed: Set[str] = set()
+        for relationship in relationships:
+            if not self.has_relationship(relationship):
+                continue
+            self.graph.remove_edge(
+                relationship.answer_node, relationship.topic_node
+            )
+            self.__unindex_edge(
+                relationship.answer_node, relationship.topic_node
+            )
+            changed.update((relationship.answer_node, relationship.topic_node))
+        self.__changed(changed)
+        logger.info(
+            'Removed %s relationships from the database.', len(relationships)
+        )
+
+    def __node(self, name: str) -> MCQNode:
+        """
+        The node with the given name, built without validation as its attributes were validated when it was created.
+
+        Args:
+            name (str): name of a node in the graph
+
+        Returns:
+            MCQNode: the node
+        """
+        return MCQNode.construct(**self.graph.nodes[name])
+
     def get_node(self, name: str) -> Union[MCQNode, None]:
         if self.graph.has_node(name):
-            return MCQNode(**self.graph.nodes[name])
+            return self.__node(name)
         return None
 
     def has_relationship(self, relationship: MCQRelationship) -> bool:
-        for start_node, end_node, props in self.graph.edges(data=True):
-            if (
-                start_node == relationship.answer_node
-                and end_node == relationship.topic_node
-                and props['type'] == relationship.type
-            ):
-                return True
-        return False
+        return relationship.type in self.edge_types.get(
+            (relationship.answer_node, relationship.topic_node), set()
+        )
 
     def related_nodes(self, relationship: MCQRelationship) -> List[MCQNode]:
-        return [
-            MCQNode(**self.graph.nodes[edge[0]])
-            for edge in self.graph.edges(data=True)
-            if edge[1] == relationship.topic_node
-            and edge[0] != relationship.answer_node
-            and edge[2]['type'] == relationship.type
-        ]
+        return [self.__node(x) for x in self.related_names(relationship)]
+
+    def related_names(self, relationship: MCQRelationship) -> List[str]:
+        answers = self.in_edges.get(
+            (relationship.topic_node, relationship.type), {}
+        )
+        # Listed in node order, as they are found going through the edges in networkx order
+        return sorted(
+            (x for x in answers if x != relationship.answer_node),
+            key=self.node_positions.__getitem__,
+        )
 
     def connected_nodes(self, node: MCQNode) -> List[MCQNode]:
-        nodes = nx.ego_graph(self.graph, node.name, radius=1)
-        nodes = [
-            MCQNode(**self.graph.nodes[x]) for x in nodes if x != node.name
-        ]
-        return nodes
+        if not self.graph.has_node(node.name):
+            raise nx.NodeNotFound(f'Source {node.name} is not in G')
+        return [self.__node(x) for x in self.connected_names(node.name)]
+
+    def connected_names(self, name: str) -> List[str]:
+        # Nodes one hop along outgoing relationships, as networkx ego_graph finds on a directed graph
+        if not self.graph.has_node(name):
+            return []
+        return [x for x in self.graph.succ[name] if x != name]
+
+    def name_reads(self, relationship: MCQRelationship) -> NameReads:
+        name = relationship.answer_node
+        if not self.graph.has_node(name):
+            return NameReads(False, [], [], {})
+        return NameReads(
+            True,
+            self.related_names(relationship),
+            self.connected_names(name),
+            dict(self.similarity_index.row(name)),
+        )
+
+    def nodes(self) -> Iterator[MCQNode]:
+        for name in list(self.graph.nodes):
+            yield self.__node(name)
+
+    def relationships(self) -> Iterator[MCQRelationship]:
+        for edge in self.__edges():
+            yield MCQRelationship.construct(
+                answer_node=edge[0], topic_node=edge[1], type=edge[2]
+            )
 
     def random_relationship(
-        self, seed: Optional[int] = None
+        self,
+        seed: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
     ) -> MCQRelationship:
-        random.seed(seed)
-        edge = random.choice(list(self.graph.edges))
-        edge_data = self.graph.get_edge_data(*edge)
-        return MCQRelationship(
-            answer_node=edge[0], topic_node=edge[1], **edge_data
+        rng = rng or random.Random(seed)
+        if (
+            answer_node is None
+            and relationship_type is None
+            and self.edge_table.uniform
+        ):
+            edges = self.__edges()
+            if not edges:
+                raise ValueError('Empty Database.')
+            edge = rng.choice(edges)
+        else:
+            edge = self.edge_table.sample(
+                rng,
+                answer_node=answer_node,
+                relationship_type=relationship_type,
+            )
+        return MCQRelationship.construct(
+            answer_node=edge[0], topic_node=edge[1], type=edge[2]
         )
 
-    def similarity_matrix(self, node: MCQNode) -> Dict[str, float]:
-        subgraph = nx.ego_graph(
-            self.graph, node.name, radius=5, undirected=True
-        )
-        jaccard = list(nx.jaccard_coefficient(subgraph.to_undirected()))
-        pairs = [(x[1], x[2]) for x in jaccard if x[0] == node.name] + [
-            (x[0], x[2]) for x in jaccard if x[1] == node.name
+    # pylint: disable=too-many-arguments
+    def random_relationships(
+        self,
+        n: int,
+        seed: Optional[int] = None,
+        unique: bool = True,
+        rng: Optional[random.Random] = None,
+        answer_node: Optional[str] = None,
+        relationship_type: Optional[str] = None,
+    ) -> List[MCQRelationship]:
+        rng = rng or random.Random(seed)
+        if (
+            answer_node is None
+            and relationship_type is None
+            and self.edge_table.uniform
+        ):
+            edges = self.__edges()
+            if not edges:
+                raise ValueError('Empty Database.')
+            edges = (
+                rng.sample(edges, min(n, len(edges)))
+                if unique
+                else rng.choices(edges, k=n)
+            )
+        else:
+            edges = self.edge_table.sample_many(
+                rng, n, unique, answer_node, relationship_type
+            )
+        return [
+            MCQRelationship.construct(
+                answer_node=edge[0], topic_node=edge[1], type=edge[2]
+            )
+            for edge in edges
         ]
-        return {x[0]: x[1] for x in pairs}
+
+    def similarity_matrix(self, node: MCQNode) -> Dict[str, float]:
+        return dict(self.similarity_index.row(node.name))
@@ -0,0 +1,250 @@
+"""Instrumentation for queries sent to graph databases"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.models import QueryTimingStats
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query: str) -> str:
+    """
+    A short id for a query that ignores whitespace, parameters are passed separately so each query has one fingerprint.
+
+    Args:
+        query (str): query string
+
+    Returns:
+        str: the first 12 hex digits of the sha1 of the normalised query
+    """
+    normalised = ' '.join(query.split())
+    return hashlib.sha1(normalised.encode()).hexdigest()[:12]
+
+
+class QueryTiming:
+    """Timings of every call to one query."""
+
+    __slots__ = (
+        'fingerprint',
+        'query',
+        'calls',
+        'total_seconds',
+        'max_seconds',
+        'rows',
+    )
+
+    def __init__(self, query: str):
+        self.fingerprint = fingerprint(query)
+        self.query = ' '.join(query.split())
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+    @property
+    def mean_seconds(self) -> float:
+        """
+        Mean latency of the query.
+
+        Returns:
+            float: mean seconds per call
+        """
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+
+class QueryStats:
+    """
+    Aggregates query timings by fingerprint so slow queries can be found without logging every query.
+    Disabled by default, when disabled and debug logging is off queries are sent without any instrumentation.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.timings: Dict[str, QueryTiming] = {}
+        self.lock = threading.Lock()
+
+    def record(self, query: str, seconds: float, rows: int):
+        """
+        Adds one call of a query.
+
+        Args:
+            query (str): query string
+            seconds (float): time from sending the query to reading its last row
+            rows (int): rows returned
+        """
+        key = fingerprint(query)
+        with self.lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = QueryTiming(query)
+            timing.calls += 1
+            timing.total_seconds += seconds
+            timing.max_seconds = max(timing.max_seconds, seconds)
+            timing.rows += rows
+
+    def summary(self) -> List[QueryTiming]:
+        """
+        The timings of every query recorded.
+
+        Returns:
+            List[QueryTiming]: timings ordered by total time, slowest first
+        """
+        with self.lock:
+            return sorted(
+                self.timings.values(),
+                key=lambda x: x.total_seconds,
+                reverse=True,
+            )
+
+    def stats(self) -> List[QueryTimingStats]:
+        """
+        The timings of every query recorded, as they are served by the api.
+
+        Returns:
+            List[QueryTimingStats]: timings ordered by total time, slowest first
+        """
+        return [
+            QueryTimingStats(
+                fingerprint=x.fingerprint,
+                query=x.query,
+                calls=x.calls,
+                rows=x.rows,
+                total_seconds=x.total_seconds,
+                mean_seconds=x.mean_seconds,
+                max_seconds=x.max_seconds,
+            )
+            for x in self.summary()
+        ]
+
+    def reset(self):
+        """Forgets every timing."""
+        with self.lock:
+            self.timings.clear()
+
+
+# Query timings are only aggregated when NEO4J_QUERY_STATS is set to 1
+query_stats = QueryStats(enabled=os.environ.get('NEO4J_QUERY_STATS') == '1')
+
+
+class SubstitutedQuery:
+    """
+    A query with its parameters written in, only formatted when a log record is actually emitted.
+    """
+
+    def __init__(self, query: str, params: Dict[str, Any]):
+        self.query = query
+        self.params = params
+
+    def __str__(self) -> str:
+        output = self.query[:]
+        for arg_name, arg_value in self.params.items():
+            output = output.replace(f'${arg_name}', "'" + str(arg_value) + "'")
+        return output
+
+
+class QueryTimer:
+    """Times one query from when it is sent until its result has been read."""
+
+    def __init__(
+        self,
+        query: str,
+        params: Dict[str, Any],
+        logger: logging.Logger,
+        stats: QueryStats,
+    ):
+        self.query = query
+        self.logger = logger
+        self.stats = stats
+        self.rows = 0
+        self.finished = False
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'Query %s with %s parameters: %s',
+                fingerprint(query),
+                len(params),
+                SubstitutedQuery(query, params),
+            )
+        self.start = time.perf_counter()
+
+    def finish(self):
+        """Records the query once its result has been read, later calls are ignored."""
+        if self.finished:
+            return
+        self.finished = True
+        seconds = time.perf_counter() - self.start
+        if self.stats.enabled:
+            self.stats.record(self.query, seconds, self.rows)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                'Query %s returned %s rows in %.2f ms.',
+                fingerprint(self.query),
+                self.rows,
+                seconds * 1000,
+            )
+
+
+def start_timer(
+    query: str,
+    params: Dict[str, Any],
+    logger: logging.Logger,
+    stats: QueryStats = query_stats,
+) -> Optional[QueryTimer]:
+    """
+    Starts timing a query if anything will use the timing.
+
+    Args:
+        query (str): query string
+        params (Dict[str, Any]): query parameters
+        logger (logging.Logger): logger queries are written to at debug level
+        stats (QueryStats, optional): where timings are aggregated. Defaults to query_stats.
+
+    Returns:
+        Optional[QueryTimer]: the timer, None when stats are disabled and debug logging is off
+    """
+    if not stats.enabled and not logger.isEnabledFor(logging.DEBUG):
+        return None
+    return QueryTimer(query, params, logger, stats)
+
+
+class TimedResult:
+    """Wraps a driver result, counting rows as they are read and finishing the timer once they all have been."""
+
+    def __init__(self, result: Any, timer: QueryTimer):
+        self.result = result
+        self.timer = timer
+
+    def __iter__(self) -> Iterator[Any]:
+        for record in self.result:
+            self.timer.rows += 1
+            yield record
+        self.timer.finish()
+
+    def single(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        The only record of the result.
+
+        Returns:
+            Any: the record, None if there is none
+        """
+        record = self.result.single(*args, **kwargs)
+        self.timer.rows += record is not None
+        self.timer.finish()
+        return record
+
+    def consume(self) -> Any:
+        """
+        Discards any remaining records.
+
+        Returns:
+            Any: the summary of the result
+        """
+        summary = self.result.consume()
+        self.timer.finish()
+        return summary
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.result, name)
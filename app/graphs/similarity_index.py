@@ -0,0 +1,139 @@
+"""An index of jaccard similarity rows for in memory graphs"""
+from collections import Counter
+from typing import Callable, Dict, Iterable, Set, Tuple
+
+SimilarityRow = Tuple[Tuple[str, float], ...]
+
+# Nodes up to this many hops away in either direction are listed in a row, as in the radius 5 ego graph jaccard was
+# calculated over before rows were indexed, so questions keep choosing distractors from the same nodes
+CANDIDATE_RADIUS = 5
+
+
+class SimilarityIndex:
+    """
+    Stores the jaccard similarity scores of each node against the other nodes within CANDIDATE_RADIUS hops of it.
+    Two nodes can only share neighbours if they are within two hops of each other, so scores are counted from the
+    neighbours of neighbours of a node rather than comparing every pair of nodes in its surroundings, and nodes
+    further away score 0. A row lists the top-k scores first, then every other node in reach by name.
+    Rows are built on first lookup (or all at once with build) and kept until a change to the graph reaches them.
+    """
+
+    def __init__(self, neighbours: Callable[[str], Set[str]], top_k: int = 20):
+        """
+        Args:
+            neighbours (Callable[[str], Set[str]]): returns the undirected neighbours of a node
+            top_k (int, optional): the number of most similar nodes listed first in a row. Defaults to 20.
+        """
+        self.neighbours = neighbours
+        self.top_k = top_k
+        self.rows: Dict[str, SimilarityRow] = {}
+
+    def __build_row(self, name: str) -> SimilarityRow:
+        """
+        Scores every node within reach of the given node, nodes that are direct neighbours are not listed.
+
+        Args:
+            name (str): the node to build a row for
+
+        Returns:
+            SimilarityRow: (name, score) pairs, the top-k by descending score then name followed by the rest by name
+        """
+        neighbours = self.neighbours(name)
+        if not neighbours:
+            return ()
+
+        # Each path of two hops to another node is one shared neighbour
+        shared: Counter = Counter()
+        for neighbour in neighbours:
+            shared.update(self.neighbours(neighbour))
+        for excluded in neighbours | {name}:
+            shared.pop(excluded, None)
+
+        scores = [
+            (
+                other,
+                count
+                / (len(neighbours) + len(self.neighbours(other)) - count),
+            )
+            for other, count in shared.items()
+        ]
+        scores.sort(key=lambda x: (-x[1], x[0]))
+        head = scores[: self.top_k]
+        scored = dict(scores)
+        listed = {x[0] for x in head} | neighbours | {name}
+        tail = [
+            (other, scored.get(other, 0.0))
+            for other in sorted(self.neighbourhood([name]) - listed)
+        ]
+        return tuple(head + tail)
+
+    def row(self, name: str) -> SimilarityRow:
+        """
+        The similarity row of a node.
+
+        Args:
+            name (str): the node to look up
+
+        Returns:
+            SimilarityRow: (name, score) pairs, the top-k by descending score then name followed by the rest by name
+        """
+        row = self.rows.get(name)
+        if row is None:
+            row = self.__build_row(name)
+            self.rows[name] = row
+        return row
+
+    def build(self, names: Iterable[str]):
+        """
+        Builds the rows for all of the given nodes up front.
+
+        Args:
+            names (Iterable[str]): the nodes to build rows for
+        """
+        for name in names:
+            self.row(name)
+
+    def neighbourhood(self, names: Iterable[str]) -> Set[str]:
+        """
+        The nodes within CANDIDATE_RADIUS hops of the given nodes, the only nodes whose rows a change to the given nodes can reach.
+
+        Args:
+            names (Iterable[str]): nodes whose neighbours have changed
+
+        Returns:
+            Set[str]: the given nodes and every node within CANDIDATE_RADIUS hops of them
+        """
+        stale = set(names)
+        frontier = stale
+        for _ in range(CANDIDATE_RADIUS):
+            frontier = {
+                neighbour
+                for name in frontier
+                for neighbour in self.neighbours(name)
+            } - stale
+            stale |= frontier
+        return stale
+
+    def discard(self, names: Iterable[str]):
+        """
+        Drops the rows of the given nodes.
+
+        Args:
+            names (Iterable[str]): nodes whose rows may be stale
+        """
+        for name in names:
+            self.rows.pop(name, None)
+
+    def invalidate(self, names: Iterable[str]):
+        """
+        Drops the rows affected by a change in the neighbours of the given nodes.
+        Should be called after the change, a row is affected if its node is within CANDIDATE_RADIUS hops of a changed node.
+
+        Args:
+            names (Iterable[str]): nodes whose neighbours have changed
+        """
+        self.discard(self.neighbourhood(names))
+
+    def clear(self):
+        """Drops every row."""
+        self.rows.clear()
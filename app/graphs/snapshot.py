@@ -0,0 +1,471 @@
+"""
+A single file snapshot of a graph that is loaded through a memory map.
+The file holds a node string table, the edge array and CSR matrices of a CSRGraph, its similarity rows and fake word banks.
+Every array is read in place from the map, so loading takes milliseconds and processes loading the same file
+share its pages through the operating system page cache instead of each building a private copy.
+
+Layout: the magic bytes, the length of a JSON header as a little endian uint64, the header, then each array aligned to 64 bytes.
+The header records the dtype, shape and offset of every array.
+"""
+import json
+import mmap
+import random
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from app.graphs.csr_graph import CSRGraph, Interner, StringColumn, StringTable
+from app.graphs.edge_matrices import EdgeMatrices
+from app.graphs.fake_word_bank import FakeWordBank, RelationshipKey
+from app.graphs.log_util import create_logger
+from app.graphs.mcq_graph import MCQGraph
+from app.models import MCQRelationship
+
+logger = create_logger(__name__)
+
+MAGIC = b'MCQSNAP1'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+class MappedFakeWordBank(FakeWordBank):
+    """
+    Fake word banks read from a snapshot, stored by the position of their relationship in the edge array of the snapshot.
+    Positions are found through the node table, edges and matrices the snapshot was loaded with, which writes to the
+    graph replace rather than change, so the mapped banks can still be read after the graph moves its edges.
+    The mapped banks are read only, a change marks the nodes whose banks it drops and the first put copies the banks
+    that are left into the dictionary of the base class.
+    """
+
+    def __init__(
+        self, graph: CSRGraph, indptr: np.ndarray, words: StringColumn
+    ):
+        """
+        Args:
+            graph (CSRGraph): the graph the banks belong to, as loaded from the snapshot
+            indptr (np.ndarray): start of the words of each edge in words, followed by the end of the last
+            words (StringColumn): the fake words
+        """
+        super().__init__()
+        self.names = graph.names
+        self.types = graph.types
+        self.edges = graph.edges
+        self.matrices = graph.freeze()
+        self.mapped: Optional[Tuple[np.ndarray, StringColumn]] = (
+            indptr,
+            words,
+        )
+        # Snapshot ids of the nodes whose mapped banks a change has dropped
+        self.dropped: Set[int] = set()
+        # Counted again on the next len after a change drops banks
+        self.mapped_count: Optional[int] = None
+
+    def __len__(self) -> int:
+        if self.mapped is None:
+            return len(self.banks)
+        if self.mapped_count is None:
+            self.mapped_count = len(self.__positions())
+        return len(self.banks) + self.mapped_count
+
+    def __positions(self) -> np.ndarray:
+        """
+        The positions of the edges with mapped words that have not been dropped.
+
+        Returns:
+            np.ndarray: positions in the edge array of the snapshot
+        """
+        if self.mapped is None:
+            return np.zeros(0, dtype=np.int64)
+        positions = np.flatnonzero(np.diff(self.mapped[0]))
+        if self.dropped:
+            dropped = np.array(sorted(self.dropped), dtype=np.int64)
+            ends = self.edges[positions, :2]
+            positions = positions[~np.isin(ends, dropped).any(axis=1)]
+        return positions
+
+    def __position(self, relationship: MCQRelationship) -> Optional[int]:
+        """
+        The position of a relationship in the edge array of the snapshot.
+
+        Args:
+            relationship (MCQRelationship): the relationship
+
+        Returns:
+            Optional[int]: its position, None if the snapshot does not have it
+        """
+        answer_id = self.names.get(relationship.answer_node)
+        topic_id = self.names.get(relationship.topic_node)
+        type_id = self.types.get(relationship.type)
+        if answer_id is None or topic_id is None or type_id is None:
+            return None
+        position = self.matrices.position(answer_id, topic_id)
+        if position is None or self.edges[position, 2] != type_id:
+            return None
+        return position
+
+    def __mapped_words(self, position: int) -> Tuple[str, ...]:
+        """
+        The mapped words of the edge at a position.
+
+        Args:
+            position (int): position of the edge
+
+        Returns:
+            Tuple[str, ...]: its fake words, empty once a change has dropped them
+        """
+        if self.mapped is None or not self.dropped.isdisjoint(
+            self.edges[position, :2].tolist()
+        ):
+            return ()
+        indptr, words = self.mapped
+        return tuple(
+            words[x] or ''
+            for x in range(indptr[position], indptr[position + 1])
+        )
+
+    def __materialise(self):
+        """Copies the mapped banks that have not been dropped into the dictionary so they can be changed."""
+        if self.mapped is None:
+            return
+        for position in self.__positions().tolist():
+            answer_id, topic_id, type_id = self.edges[position].tolist()
+            key = (
+                self.names.name(answer_id),
+                self.names.name(topic_id),
+                self.types.name(type_id),
+            )
+            self.banks.setdefault(key, self.__mapped_words(position))
+        self.mapped = None
+
+    def put(self, relationship: MCQRelationship, fakes: Iterable[str]):
+        self.__materialise()
+        super().put(relationship, fakes)
+
+    def sample(
+        self, relationship: MCQRelationship, rng: random.Random, k: int = 1
+    ) -> List[str]:
+        if self.mapped is None or self.key(relationship) in self.banks:
+            return super().sample(relationship, rng, k)
+        position = self.__position(relationship)
+        if position is None:
+            return []
+        words = self.__mapped_words(position)
+        return rng.sample(words, min(k, len(words)))
+
+    def discard(self, names: Set[str]):
+        # Only the banks of relationships to or from the changed nodes are dropped, the rest stay mapped
+        if self.mapped is not None:
+            ids = {x for x in map(self.names.get, names) if x is not None}
+            if not ids <= self.dropped:
+                self.dropped = self.dropped | ids
+                self.mapped_count = None
+        super().discard(names)
+
+    def clear(self):
+        self.mapped = None
+        super().clear()
+
+
+def to_csr_graph(graph: MCQGraph) -> CSRGraph:
+    """
+    Copies the nodes, relationships and fake words of a graph into a CSRGraph, a CSRGraph is returned as it is.
+
+    Args:
+        graph (MCQGraph): the graph to copy
+
+    Returns:
+        CSRGraph: a graph with the same content
+    """
+    if isinstance(graph, CSRGraph):
+        return graph
+    csr_graph = CSRGraph()
+    csr_graph.create_nodes(list(graph.nodes()))
+    csr_graph.create_relationships(list(graph.relationships()))
+    csr_graph.fake_words.banks.update(graph.fake_words.banks)
+    return csr_graph
+
+
+def fake_word_arrays(
+    graph: CSRGraph, banks: Dict[RelationshipKey, Tuple[str, ...]]
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Lays out fake word banks by the position of their relationship in the edge array, banks of missing relationships are dropped.
+
+    Args:
+        graph (CSRGraph): the graph the banks belong to
+        banks (Dict[RelationshipKey, Tuple[str, ...]]): the banks
+
+    Returns:
+        Tuple[np.ndarray, List[str]]: start of the words of each edge followed by the end of the last, and the words
+    """
+    by_position: Dict[int, Tuple[str, ...]] = {}
+    for (answer_node, topic_node, relationship_type), words in banks.items():
+        position = graph.position(
+            MCQRelationship(
+                answer_node=answer_node,
+                topic_node=topic_node,
+                type=relationship_type,
+            )
+        )
+        if position is not None:
+            by_position[position] = words
+    ordered = [by_position.get(x, ()) for x in range(len(graph.edges))]
+    indptr = np.zeros(len(ordered) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in ordered], out=indptr[1:])
+    return indptr, [word for words in ordered for word in words]
+
+
+def string_arrays(
+    prefix: str, strings: List[Optional[str]]
+) -> Dict[str, np.ndarray]:
+    """
+    The arrays of a StringColumn as snapshot sections.
+
+    Args:
+        prefix (str): prefix of the section names
+        strings (List[Optional[str]]): the strings
+
+    Returns:
+        Dict[str, np.ndarray]: offsets, data and missing flags by section name
+    """
+    offsets, data, missing = StringColumn.encode(strings)
+    return {
+        f'{prefix}_offsets': offsets,
+        f'{prefix}_data': data,
+        f'{prefix}_missing': missing,
+    }
+
+
+def answer_arrays(
+    matrices: EdgeMatrices, num_types: int
+) -> Dict[str, np.ndarray]:
+    """
+    The answer matrices of every relationship type as snapshot sections.
+    The matrices share one indices array, each type has its own row pointers into its slice of it.
+
+    Args:
+        matrices (EdgeMatrices): the matrices of the graph
+        num_types (int): number of relationship types in the graph
+
+    Returns:
+        Dict[str, np.ndarray]: row pointers by type, the start of each slice and the indices by section name
+    """
+    answer_indptr = np.zeros(
+        (num_types, len(matrices.name_ranks) + 1), dtype=np.int64
+    )
+    answer_starts = np.zeros(num_types + 1, dtype=np.int64)
+    answer_indices = [np.zeros(0, dtype=np.int32)]
+    for type_id in range(num_types):
+        indptr, indices = matrices.answers_by_type.get(
+            type_id, (answer_indptr[type_id], answer_indices[0])
+        )
+        answer_indptr[type_id] = indptr
+        answer_starts[type_id + 1] = answer_starts[type_id] + len(indices)
+        answer_indices.append(indices)
+    return {
+        'answer_indptr': answer_indptr,
+        'answer_starts': answer_starts,
+        'answer_indices': np.concatenate(answer_indices),
+    }
+
+
+def snapshot_arrays(graph: CSRGraph) -> Dict[str, np.ndarray]:
+    """
+    Every array stored in a snapshot of a graph.
+
+    Args:
+        graph (CSRGraph): the graph
+
+    Returns:
+        Dict[str, np.ndarray]: the arrays by section name
+    """
+    matrices = graph.freeze()
+    arrays: Dict[str, np.ndarray] = {}
+    arrays.update(
+        string_arrays(
+            'node', [graph.names.name(x) for x in range(len(graph.names))]
+        )
+    )
+    arrays.update(
+        string_arrays(
+            'info', [graph.infos[x] for x in range(len(graph.infos))]
+        )
+    )
+    arrays['node_order'] = np.argsort(matrices.name_ranks).astype(np.int64)
+    arrays['name_ranks'] = matrices.name_ranks
+    arrays['edges'] = graph.edges
+    arrays.update(answer_arrays(matrices, len(graph.types)))
+    arrays['topic_indptr'], arrays['topic_indices'] = matrices.topics
+    (
+        arrays['neighbour_indptr'],
+        arrays['neighbour_indices'],
+    ) = matrices.neighbours
+    arrays['pair_keys'], arrays['pair_positions'] = matrices.pairs
+    (
+        arrays['similarity_indptr'],
+        arrays['similarity_ids'],
+        arrays['similarity_scores'],
+    ) = matrices.similarity_arrays(graph.top_k)
+
+    arrays['fake_indptr'], words = fake_word_arrays(
+        graph, graph.fake_words.banks
+    )
+    arrays.update(string_arrays('fake', list(words)))
+    return arrays
+
+
+def write_snapshot(graph: MCQGraph, path: str):
+    """
+    Writes a snapshot of a graph, the snapshot can be loaded with load_snapshot.
+    Graphs other than CSRGraph are copied into one first, similarity rows are built for every node.
+
+    Args:
+        graph (MCQGraph): the graph to write
+        path (str): file to write
+    """
+    csr_graph = to_csr_graph(graph)
+    arrays = snapshot_arrays(csr_graph)
+    sections: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps(
+        {
+            'format': FORMAT_VERSION,
+            'top_k': csr_graph.top_k,
+            'types': csr_graph.types.names,
+            'sections': sections,
+        }
+    ).encode()
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(header)).astype('<u8').tobytes())
+        file.write(header)
+        for name, array in arrays.items():
+            pad(file, start + sections[name]['offset'])
+            file.write(np.ascontiguousarray(array).tobytes())
+        pad(file, start + offset)
+    logger.info(
+        'Wrote snapshot of %s nodes and %s relationships to %s.',
+        len(csr_graph.names),
+        len(csr_graph.edges),
+        path,
+    )
+
+
+def pad(file: BinaryIO, position: int):
+    """
+    Writes zero bytes up to a position.
+
+    Args:
+        file (BinaryIO): file being written
+        position (int): position to pad to
+    """
+    file.write(b'\0' * (position - file.tell()))
+
+
+def read_sections(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Maps a snapshot file into memory and reads its arrays in place.
+
+    Args:
+        path (str): the snapshot file
+
+    Raises:
+        ValueError: if the file is not a snapshot of a supported format
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, np.ndarray]]: the header and the read only arrays by section name
+    """
+    with open(path, 'rb') as file:
+        # The map stays open for as long as any array reading from it is alive
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[: len(MAGIC)] != MAGIC:
+        logger.error('Not a graph snapshot: %s', path)
+        raise ValueError(f'Not a graph snapshot: {path}')
+    length = int(
+        np.frombuffer(buffer, dtype='<u8', count=1, offset=len(MAGIC))[0]
+    )
+    header = json.loads(buffer[len(MAGIC) + 8 : len(MAGIC) + 8 + length])
+    if header['format'] != FORMAT_VERSION:
+        logger.error(
+            'Unsupported snapshot format %s: %s', header['format'], path
+        )
+        raise ValueError(f'Unsupported snapshot format: {header["format"]}')
+    start = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, section in header['sections'].items():
+        dtype = np.dtype(section['dtype'])
+        count = int(np.prod(section['shape']))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=start + section['offset']
+        ).reshape(section['shape'])
+    return header, arrays
+
+
+def load_snapshot(path: str) -> CSRGraph:
+    """
+    Loads a graph from a snapshot written by write_snapshot, the arrays of the graph read from a shared memory map.
+
+    Args:
+        path (str): the snapshot file
+
+    Returns:
+        CSRGraph: the graph, writing to it copies what it needs out of the map
+    """
+    header, arrays = read_sections(path)
+    answer_starts = arrays['answer_starts']
+    answers_by_type = {
+        type_id: (
+            arrays['answer_indptr'][type_id],
+            arrays['answer_indices'][
+                answer_starts[type_id] : answer_starts[type_id + 1]
+            ],
+        )
+        for type_id in range(len(header['types']))
+    }
+    matrices = EdgeMatrices(
+        answers_by_type,
+        (arrays['topic_indptr'], arrays['topic_indices']),
+        (arrays['neighbour_indptr'], arrays['neighbour_indices']),
+        (arrays['pair_keys'], arrays['pair_positions']),
+        arrays['name_ranks'],
+        (
+            arrays['similarity_indptr'],
+            arrays['similarity_ids'],
+            arrays['similarity_scores'],
+        ),
+    )
+
+    graph = CSRGraph(top_k=header['top_k'])
+    graph.attach(
+        StringTable(
+            StringColumn(arrays['node_offsets'], arrays['node_data']),
+            arrays['node_order'],
+        ),
+        StringColumn(
+            arrays['info_offsets'], arrays['info_data'], arrays['info_missing']
+        ),
+        Interner(list(header['types'])),
+        arrays['edges'],
+        matrices,
+    )
+    graph.fake_words = MappedFakeWordBank(
+        graph,
+        arrays['fake_indptr'],
+        StringColumn(arrays['fake_offsets'], arrays['fake_data']),
+    )
+    logger.info(
+        'Loaded snapshot of %s nodes and %s relationships from %s.',
+        len(graph.names),
+        len(graph.edges),
+        path,
+    )
+    return graph
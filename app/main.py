@@ -1,16 +1,174 @@
 """A basic bare main file for an api using fastapi"""
 # pylint: disable=unused-argument
+import atexit
+import os
+import secrets
+import threading
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncGenerator, Callable, Iterable, List, Optional
+
 from app.core.mcq_builder import MCQBuilder
+from app.core.mcq_cache import MCQCache
+from app.core.mcq_pool import MCQPool
+from app.core.process_mcq_builder import ProcessMCQBuilder
 from app.data.sample_graph import generate_graph
-from app.models import MCQ
-from fastapi import FastAPI, Request
+from app.graphs.graph_registry import GraphRegistry, parse_graphs
+from app.graphs.graph_store import GraphStore
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.query_log import query_stats
+from app.graphs.snapshot import load_snapshot
+from app.models import (
+    MCQ,
+    CacheStats,
+    GraphStats,
+    PoolStats,
+    QueryTimingStats,
+    RegistryStats,
+)
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
+from starlette.concurrency import run_in_threadpool
+
+fill_stop = threading.Event()
+fill_threads: List[threading.Thread] = []
+
+
+def stop_filling():
+    """
+    Stops background fake word filling and waits for it, a daemon thread killed at interpreter exit
+    while inside native code aborts the process.
+    """
+    fill_stop.set()
+    for thread in fill_threads:
+        thread.join()
+
+
+atexit.register(stop_filling)
+
+
+def load_with_fake_words(loader: Callable[[], MCQGraph]) -> MCQGraph:
+    """
+    Loads a graph and fills its fake words in the background unless it already has them.
+
+    Args:
+        loader (Callable[[], MCQGraph]): builds or maps the graph
+
+    Returns:
+        MCQGraph: the loaded graph
+    """
+    graph = loader()
+    if len(graph.fake_words):
+        return graph
+    thread = threading.Thread(
+        target=MCQBuilder(graph).fill_fake_word_bank,
+        kwargs={'stop': fill_stop},
+        daemon=True,
+    )
+    fill_threads[:] = [x for x in fill_threads if x.is_alive()] + [thread]
+    thread.start()
+    return graph
+
+
+def load_graph() -> MCQGraph:
+    """
+    Loads the graph snapshot named by the GRAPH_SNAPSHOT environment variable, or builds the sample graph if it is not set.
+    Fake words are filled in the background unless the graph already has them.
+
+    Returns:
+        MCQGraph: the loaded graph
+    """
+    path = os.environ.get('GRAPH_SNAPSHOT')
+    if path:
+        return load_with_fake_words(partial(load_snapshot, path))
+    return load_with_fake_words(generate_graph)
+
+
+graph_store = GraphStore(load_graph)
+# Questions are generated in MCQ_WORKERS worker processes, or inside the request if it is not set
+workers = int(os.environ.get('MCQ_WORKERS', '0'))
+# Questions for the root endpoint are generated ahead of time, MCQ_POOL_SIZE=0 generates each one inside the request.
+# The pool is filled by a thread of the api process, so it is turned off when questions are generated in worker processes
+mcq_pool = MCQPool(
+    capacity=0 if workers > 0 else int(os.environ.get('MCQ_POOL_SIZE', '64'))
+)
+atexit.register(mcq_pool.close)
+# Seeded questions are kept until the graph changes, so shared quiz links are not generated again
+mcq_cache = MCQCache()
+
+
+def optional_int(name: str) -> Optional[int]:
+    """
+    Reads a whole number from an environment variable.
+
+    Args:
+        name (str): the environment variable
+
+    Returns:
+        Optional[int]: its value, or None if it is not set
+    """
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+# Subject graphs served by id, the neuroscience sample graph and any listed in GRAPHS as id=path pairs.
+# Like the root graph they get a fake word bank, so questions do not build fake words inside the request.
+graph_registry = GraphRegistry(
+    {
+        x: partial(load_with_fake_words, y)
+        for x, y in {
+            'neuroscience': generate_graph,
+            **parse_graphs(os.environ.get('GRAPHS', '')),
+        }.items()
+    },
+    max_graphs=optional_int('GRAPH_CACHE_SIZE'),
+    memory_budget=optional_int('GRAPH_MEMORY_BUDGET'),
+)
+
+
+def worker_loader() -> Callable[[], MCQGraph]:
+    """
+    The loader worker processes use for the graph the api serves, it is sent to them by name so it cannot be a closure.
+
+    Returns:
+        Callable[[], MCQGraph]: maps the GRAPH_SNAPSHOT file, or builds the sample graph if it is not set
+    """
+    path = os.environ.get('GRAPH_SNAPSHOT')
+    if path:
+        return partial(load_snapshot, path)
+    return generate_graph
+
+
+process_builder: Optional[ProcessMCQBuilder] = (
+    ProcessMCQBuilder(worker_loader(), workers) if workers > 0 else None
+)
+if process_builder is not None:
+    atexit.register(process_builder.close)
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI) -> AsyncGenerator[None, None]:
+    """
+    Builds the graph and starts filling the question pool once at startup, and stops both on shutdown.
+
+    Args:
+        application (FastAPI): the app being started
+    """
+    mcq_pool.attach(graph_store.load())
+    yield
+    mcq_pool.close()
+    if process_builder is not None:
+        process_builder.close()
+    graph_registry.close()
+    graph_store.close()
+
 
 limiter = Limiter(key_func=get_remote_address)
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -45,14 +203,206 @@ async def live(request: Request) -> dict:
 
 @app.get('/', responses={200: {'model': MCQ}})
 @limiter.limit('5/second')
-async def root(request: Request) -> MCQ:
+async def root(
+    request: Request, seed: Optional[int] = Query(default=None, ge=0)
+) -> MCQ:
     """
-    Basic mcq generated at api root
+    Basic mcq at api root, taken from the question pool or generated if the pool is empty.
+    A seeded mcq is the same question until the graph changes, so it is served from the cache when it has been generated before
+
+    Args:
+        seed (Optional[int]): seeds the question, for links that share a question
 
     Returns:
         dict: json response
     """
-    graph = generate_graph()
-    mcq = MCQBuilder(graph)
-    output = mcq.generate()
+    graph = graph_store.graph
+    if seed is None:
+        output = mcq_pool.pop(graph)
+    else:
+        output = mcq_cache.get(graph, seed)
+    if output is None:
+        version = graph.version
+        if process_builder is not None:
+            output = await process_builder.generate(seed)
+        else:
+            # Generation is CPU-bound, so it runs in a thread rather than on the event loop
+            output = await run_in_threadpool(MCQBuilder(graph, seed).generate)
+        if seed is not None:
+            mcq_cache.put(graph, version, seed, output)
     return output
+
+
+@app.get('/topics/{name}', responses={200: {'model': MCQ}, 404: {}})
+@limiter.limit('5/second')
+async def topic_mcq(
+    request: Request,
+    name: str,
+    relationship_type: Optional[str] = None,
+    seed: Optional[int] = Query(default=None, ge=0),
+) -> MCQ:
+    """
+    An mcq about one topic, found through the edge indexes of the graph so rare topics cost no more than common ones
+
+    Args:
+        name (str): the topic of the question
+        relationship_type (Optional[str]): only ask about relationships of this type
+        seed (Optional[int]): seeds the question
+
+    Returns:
+        MCQ: json response, or a 404 if nothing matches the topic and type
+    """
+    try:
+        if process_builder is not None:
+            return await process_builder.generate(
+                seed, name, relationship_type
+            )
+        return await run_in_threadpool(
+            MCQBuilder(graph_store.graph, seed).generate,
+            name,
+            relationship_type,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+
+@app.get('/graphs', responses={200: {'model': RegistryStats}})
+async def registry_stats(request: Request) -> RegistryStats:
+    """
+    The subject graphs that can be served and the ones currently held in memory
+
+    Returns:
+        RegistryStats: json response
+    """
+    return graph_registry.stats()
+
+
+@app.get('/graphs/{graph_id}/mcq', responses={200: {'model': MCQ}, 404: {}})
+@limiter.limit('5/second')
+async def graph_mcq(
+    request: Request,
+    graph_id: str,
+    topic: Optional[str] = None,
+    seed: Optional[int] = Query(default=None, ge=0),
+) -> MCQ:
+    """
+    An mcq from one of the subject graphs, the graph is loaded by the first request for it
+
+    Args:
+        graph_id (str): id of the subject graph
+        topic (Optional[str]): only ask about this topic
+        seed (Optional[int]): seeds the question
+
+    Returns:
+        MCQ: json response, or a 404 if there is no such graph or topic
+    """
+    if graph_id not in graph_registry:
+        raise HTTPException(
+            status_code=404, detail=f'Unknown graph: {graph_id!r}.'
+        )
+    graph = await run_in_threadpool(graph_registry.get, graph_id)
+    try:
+        return await run_in_threadpool(MCQBuilder(graph, seed).generate, topic)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+
+@app.get('/batch', responses={200: {'model': MCQ}})
+@limiter.limit('1/second')
+async def batch(
+    request: Request, n: int = Query(default=20, ge=1, le=50)
+) -> StreamingResponse:
+    """
+    A batch of distinct mcqs streamed back as json lines
+
+    Args:
+        n (int): number of questions to generate
+
+    Returns:
+        StreamingResponse: one json mcq per line
+    """
+    # A generator is iterated in a thread by StreamingResponse, so questions are built off the event loop
+    questions: Iterable[MCQ] = (
+        MCQBuilder(graph_store.graph).generate_many(n, unique=True)
+        if process_builder is None
+        else await process_builder.generate_many(n, unique=True)
+    )
+    return StreamingResponse(
+        (question.json() + '\n' for question in questions),
+        media_type='application/x-ndjson',
+    )
+
+
+@app.get('/graph', responses={200: {'model': GraphStats}})
+async def graph_stats(request: Request) -> GraphStats:
+    """
+    Build time and memory footprint of the graph currently being served
+
+    Returns:
+        GraphStats: json response
+    """
+    return graph_store.stats
+
+
+@app.get('/pool', responses={200: {'model': PoolStats}})
+async def pool_stats(request: Request) -> PoolStats:
+    """
+    Depth, fill rate and empty pool fallbacks of the question pool
+
+    Returns:
+        PoolStats: json response
+    """
+    return mcq_pool.stats()
+
+
+@app.get('/cache', responses={200: {'model': CacheStats}})
+async def cache_stats(request: Request) -> CacheStats:
+    """
+    Size and hit ratio of the cache of seeded questions
+
+    Returns:
+        CacheStats: json response
+    """
+    return mcq_cache.stats()
+
+
+@app.get('/queries', responses={200: {'model': List[QueryTimingStats]}})
+async def query_timings(request: Request) -> List[QueryTimingStats]:
+    """
+    Timings of the database queries sent by this process, slowest first, empty unless NEO4J_QUERY_STATS=1
+
+    Returns:
+        List[QueryTimingStats]: json response
+    """
+    return query_stats.stats()
+
+
+@app.post('/graph/reload', responses={200: {'model': GraphStats}})
+@limiter.limit('1/minute')
+async def graph_reload(
+    request: Request, x_admin_token: Optional[str] = Header(default=None)
+) -> GraphStats:
+    """
+    Rebuilds the graph and swaps it in without restarting the api.
+    Only allowed with the X-Admin-Token header set to the ADMIN_TOKEN environment variable, disabled if that is not set.
+
+    Args:
+        x_admin_token (Optional[str]): the admin token
+
+    Returns:
+        GraphStats: json response, or a 403 if the token is missing or wrong
+    """
+    token = os.environ.get('ADMIN_TOKEN')
+    if not token:
+        raise HTTPException(
+            status_code=403,
+            detail='Reloading is disabled, ADMIN_TOKEN is not set.',
+        )
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token.encode(), token.encode()
+    ):
+        raise HTTPException(status_code=403, detail='Invalid admin token.')
+    await run_in_threadpool(graph_store.reload)
+    if process_builder is not None:
+        process_builder.reload()
+    return graph_store.stats
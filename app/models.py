@@ -1,7 +1,7 @@
 """One file to store models for pydantic, no linting for this file as it doesnt follow a lot conventions."""
 # pylint: skip-file
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -40,3 +40,86 @@ class MCQRelationship(BaseModel):
 
     class Config:
         extra = 'forbid'
+
+
+class GraphStats(BaseModel):
+    """Model for the build statistics of a graph loaded into memory"""
+
+    build_seconds: float
+    memory_bytes: int
+    loaded_at: float
+
+    class Config:
+        extra = 'forbid'
+
+
+class IngestStats(BaseModel):
+    """Model for the outcome of streaming an edge file into a graph"""
+
+    rows: int = 0
+    relationships: int = 0
+    skipped: int = 0
+    chunks: int = 0
+
+    class Config:
+        extra = 'forbid'
+
+
+class PoolStats(BaseModel):
+    """Model for the metrics of the pool of questions generated ahead of time"""
+
+    capacity: int
+    depth: int
+    low_watermark: int
+    high_watermark: int
+    filled: int
+    served: int
+    fallbacks: int
+    discarded: int
+    fill_rate: float
+
+    class Config:
+        extra = 'forbid'
+
+
+class CacheStats(BaseModel):
+    """Model for the metrics of the cache of seeded questions"""
+
+    size: int
+    entries: int
+    hits: int
+    misses: int
+    hit_ratio: float
+
+    class Config:
+        extra = 'forbid'
+
+
+class RegistryStats(BaseModel):
+    """Model for the graphs a registry serves and the ones it holds in memory"""
+
+    graphs: List[str]
+    loaded: Dict[str, GraphStats]
+    memory_bytes: int
+    memory_budget: Optional[int]
+    max_graphs: Optional[int]
+    loads: int
+    evictions: int
+
+    class Config:
+        extra = 'forbid'
+
+
+class QueryTimingStats(BaseModel):
+    """Model for the aggregated timings of one database query"""
+
+    fingerprint: str
+    query: str
+    calls: int
+    rows: int
+    total_seconds: float
+    mean_seconds: float
+    max_seconds: float
+
+    class Config:
+        extra = 'forbid'
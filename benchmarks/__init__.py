@@ -0,0 +1 @@
+"""init in benchmarks folder"""
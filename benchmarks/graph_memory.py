@@ -0,0 +1,90 @@
+"""
+Compares the memory held by NXGraph and CSRGraph for the same graph, and the latency of their question reads.
+Memory is measured with tracemalloc, which counts allocations made through python including numpy arrays.
+
+Run with: python -m benchmarks.graph_memory --edges 10000 100000 500000
+"""
+import argparse
+import gc
+import logging
+import random
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from benchmarks.nx_graph_lookups import populate
+
+
+def measure(
+    new_graph: Callable[[], MCQGraph], num_edges: int
+) -> Tuple[MCQGraph, float]:
+    """
+    Builds a graph and measures the memory it holds once building has finished.
+
+    Args:
+        new_graph (Callable[[], MCQGraph]): creates an empty graph
+        num_edges (int): approximate number of edges to create
+
+    Returns:
+        Tuple[MCQGraph, float]: the graph and the memory it holds in megabytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    graph = populate(new_graph(), num_edges)
+    # Reads build any lazy indexes, which count towards the memory of the graph
+    graph.random_relationship(seed=0)
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return graph, held / 2**20
+
+
+def mean_read_latency(graph: MCQGraph, calls: int) -> float:
+    """
+    Times question_reads for random relationships of a graph.
+
+    Args:
+        graph (MCQGraph): the graph to read
+        calls (int): number of reads
+
+    Returns:
+        float: mean latency in microseconds
+    """
+    sample = graph.random_relationships(calls, rng=random.Random(0))
+    start = time.perf_counter()
+    for relationship in sample:
+        graph.question_reads(relationship)
+    return (time.perf_counter() - start) / len(sample) * 1e6
+
+
+def main():
+    """Prints the memory and read latency of each graph for every graph size."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--edges', type=int, nargs='+', default=[10000, 100000]
+    )
+    parser.add_argument('--calls', type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    graphs: List[Tuple[str, Callable[[], MCQGraph]]] = [
+        ('NXGraph', NXGraph),
+        ('CSRGraph', CSRGraph),
+    ]
+    print(
+        f"{'edges':>10} {'graph':>10} {'memory (MB)':>12} {'reads (us)':>12}"
+    )
+    for num_edges in args.edges:
+        for name, new_graph in graphs:
+            graph, megabytes = measure(new_graph, num_edges)
+            latency = mean_read_latency(graph, args.calls)
+            print(
+                f'{num_edges:>10} {name:>10} {megabytes:>12.1f} {latency:>12.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Measures what building pydantic models costs on the paths that generate questions.
+A graph with one topic of many answers is read with question_reads, which builds a node model for every related and
+connected node, and with name_reads, which returns the names the builder actually uses.
+The relationships of fill_graph are also built as validated models, as unvalidated models and as named tuples.
+
+Run with: python -m benchmarks.model_construction --answers 10 100 1000 10000
+"""
+import argparse
+import logging
+import random
+import time
+from typing import Callable, List, NamedTuple, Tuple
+
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from app.models import MCQRelationship
+
+
+class Edge(NamedTuple):
+    """The lightest record of a relationship, for comparison."""
+
+    answer_node: str
+    topic_node: str
+    type: str
+
+
+def mean_microseconds(call: Callable[[], object], calls: int) -> float:
+    """
+    Times repeated calls of a function.
+
+    Args:
+        call (Callable[[], object]): the function
+        calls (int): number of calls
+
+    Returns:
+        float: mean latency in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        call()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def relationship_costs(num_answers: int) -> List[float]:
+    """
+    Times building the relationships fill_graph creates for one topic, in each of the three forms.
+
+    Args:
+        num_answers (int): number of answers of the topic
+
+    Returns:
+        List[float]: microseconds to build them as validated models, unvalidated models and named tuples
+    """
+    answers = [f'answer {i}' for i in range(num_answers)]
+    builders: List[Callable[[], object]] = [
+        lambda: [
+            MCQRelationship(
+                answer_node=x, topic_node='topic', type='belongs_to'
+            )
+            for x in answers
+        ],
+        lambda: [
+            MCQRelationship.construct(
+                answer_node=x, topic_node='topic', type='belongs_to'
+            )
+            for x in answers
+        ],
+        lambda: [Edge(x, 'topic', 'belongs_to') for x in answers],
+    ]
+    return [mean_microseconds(x, 5) for x in builders]
+
+
+def read_costs(graph: MCQGraph, calls: int) -> Tuple[float, float]:
+    """
+    Times question_reads and name_reads for random relationships of a graph.
+
+    Args:
+        graph (MCQGraph): the graph to read
+        calls (int): number of reads of each kind
+
+    Returns:
+        Tuple[float, float]: mean microseconds of question_reads and of name_reads
+    """
+    sample = [
+        x
+        for x in graph.random_relationships(calls, rng=random.Random(0))
+        if x.type == 'belongs_to'
+    ]
+
+    def mean_read(read: Callable[[MCQRelationship], object]) -> float:
+        # The first pass builds any lazy indexes and similarity rows
+        for relationship in sample:
+            read(relationship)
+        start = time.perf_counter()
+        for relationship in sample:
+            read(relationship)
+        return (time.perf_counter() - start) / len(sample) * 1e6
+
+    return mean_read(graph.question_reads), mean_read(graph.name_reads)
+
+
+def main():
+    """Prints the cost of each form of relationship and each kind of read for every topic size."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--answers', type=int, nargs='+', default=[10, 100, 1000]
+    )
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(
+        f"{'answers':>8} {'model (us)':>11} {'construct (us)':>15} {'tuple (us)':>11}"
+    )
+    for num_answers in args.answers:
+        model, construct, edge = relationship_costs(num_answers)
+        print(
+            f'{num_answers:>8} {model:>11.1f} {construct:>15.1f} {edge:>11.1f}'
+        )
+
+    print(
+        f"\n{'answers':>8} {'graph':>10} {'question_reads (us)':>20} {'name_reads (us)':>16} {'speedup':>8}"
+    )
+    for num_answers in args.answers:
+        data = {'topic': [f'answer {i}' for i in range(num_answers)]}
+        for new_graph in [NXGraph, CSRGraph]:
+            graph: MCQGraph = new_graph()
+            graph.fill_graph(data)
+            models, names = read_costs(graph, args.calls)
+            print(
+                f'{num_answers:>8} {new_graph.__name__:>10} {models:>20.1f} {names:>16.1f} {models / names:>7.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Times NXGraph.related_nodes and NXGraph.has_relationship as the number of edges grows.
+Every topic has the same number of answers, so the latency of both lookups should stay flat as the graph grows.
+
+Run with: python -m benchmarks.nx_graph_lookups --edges 1000 10000 100000 500000
+"""
+import argparse
+import logging
+import random
+import time
+from typing import Callable, List, TypeVar
+
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from app.models import MCQNode, MCQRelationship
+
+ANSWERS_PER_TOPIC = 10
+
+G = TypeVar('G', bound=MCQGraph)
+
+
+def populate(graph: G, num_edges: int) -> G:
+    """
+    Fills a graph with topics with a fixed number of answers each, linked in both directions like fill_graph.
+
+    Args:
+        graph (G): an empty graph
+        num_edges (int): approximate number of edges to create
+
+    Returns:
+        G: the populated graph
+    """
+    num_topics = max(num_edges // (2 * ANSWERS_PER_TOPIC), 1)
+    graph.create_nodes(
+        [MCQNode(name=f'topic {i}') for i in range(num_topics)]
+        + [
+            MCQNode(name=f'answer {i} {j}')
+            for i in range(num_topics)
+            for j in range(ANSWERS_PER_TOPIC)
+        ]
+    )
+    relationships: List[MCQRelationship] = []
+    for i in range(num_topics):
+        for j in range(ANSWERS_PER_TOPIC):
+            relationships.append(
+                MCQRelationship(
+                    answer_node=f'answer {i} {j}',
+                    topic_node=f'topic {i}',
+                    type='belongs_to',
+                )
+            )
+            relationships.append(
+                MCQRelationship(
+                    answer_node=f'topic {i}',
+                    topic_node=f'answer {i} {j}',
+                    type='includes',
+                )
+            )
+    graph.create_relationships(relationships)
+    return graph
+
+
+def build_graph(num_edges: int) -> NXGraph:
+    """
+    Builds a networkx graph filled by populate.
+
+    Args:
+        num_edges (int): approximate number of edges to create
+
+    Returns:
+        NXGraph: the populated graph
+    """
+    return populate(NXGraph(), num_edges)
+
+
+def mean_latency(
+    lookup: Callable[[MCQRelationship], object],
+    sample: List[MCQRelationship],
+) -> float:
+    """
+    Times a lookup over every relationship in the sample.
+
+    Args:
+        lookup (Callable[[MCQRelationship], object]): graph method to time
+        sample (List[MCQRelationship]): relationships to look up
+
+    Returns:
+        float: mean latency in microseconds
+    """
+    start = time.perf_counter()
+    for relationship in sample:
+        lookup(relationship)
+    return (time.perf_counter() - start) / len(sample) * 1e6
+
+
+def main():
+    """Prints the mean latency of each lookup for every graph size."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--edges', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    parser.add_argument('--calls', type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(
+        f"{'edges':>10} {'related_nodes (us)':>20} {'has_relationship (us)':>22}"
+    )
+    for num_edges in args.edges:
+        graph = build_graph(num_edges)
+        edges = list(graph.graph.edges(data='type'))
+        sample = [
+            MCQRelationship(answer_node=x[0], topic_node=x[1], type=x[2])
+            for x in random.sample(edges, min(args.calls, len(edges)))
+        ]
+        related = mean_latency(graph.related_nodes, sample)
+        has = mean_latency(graph.has_relationship, sample)
+        print(f'{len(edges):>10} {related:>20.2f} {has:>22.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Measures question throughput when generating inside the api process and in pools of worker processes.
+Each worker builds its own copy of the sample graph, so startup is excluded by warming every worker first.
+
+Run with: python -m benchmarks.process_generation --workers 1 2 4 --questions 2000
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+from app.core.mcq_builder import MCQBuilder
+from app.core.process_mcq_builder import ProcessMCQBuilder
+from app.data.sample_graph import generate_graph
+
+
+def inline_rate(questions: int) -> float:
+    """
+    Times generating questions one after another in this process.
+
+    Args:
+        questions (int): number of questions
+
+    Returns:
+        float: questions per second
+    """
+    graph = generate_graph()
+    start = time.perf_counter()
+    for _ in range(questions):
+        MCQBuilder(graph).generate()
+    return questions / (time.perf_counter() - start)
+
+
+async def process_rate(workers: int, questions: int) -> float:
+    """
+    Times generating questions concurrently in a pool of worker processes.
+
+    Args:
+        workers (int): number of worker processes
+        questions (int): number of questions
+
+    Returns:
+        float: questions per second
+    """
+    builder = ProcessMCQBuilder(generate_graph, workers)
+    try:
+        await asyncio.gather(*[builder.generate() for _ in range(workers * 4)])
+        start = time.perf_counter()
+        results: List[object] = await asyncio.gather(
+            *[builder.generate() for _ in range(questions)]
+        )
+        assert len(results) == questions
+        return questions / (time.perf_counter() - start)
+    finally:
+        builder.close()
+
+
+def main():
+    """Prints the throughput of generating inline and with each number of workers."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--questions', type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    inline = inline_rate(args.questions)
+    print(f"{'mode':>10} {'questions/s':>12} {'speedup':>8}")
+    print(f"{'inline':>10} {inline:>12.0f} {1:>7.1f}x")
+    for workers in args.workers:
+        rate = asyncio.run(process_rate(workers, args.questions))
+        print(f"{f'{workers} procs':>10} {rate:>12.0f} {rate / inline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,3 +8,15 @@ def test_fake_word_builder():
     fwb = FakeWordBuilder(pool, seed=2)
     output = fwb.generate(limit=3, threshold=0)
     assert output == ['Helings', 'Greetlo', 'Goodtings']
+
+
+def test_split_cache():
+    """A test to show that word splits are cached between builders using the same pool."""
+    pool = ['Serotonin', 'Dopamine', 'Glutamate']
+    FakeWordBuilder(pool, seed=2).generate(limit=3, threshold=0)
+    before = FakeWordBuilder.split_cache_info()
+    FakeWordBuilder(pool, seed=2).generate(limit=3, threshold=0)
+    after = FakeWordBuilder.split_cache_info()
+    assert after.misses == before.misses
+    assert after.hits > before.hits
+    assert after.maxsize == FakeWordBuilder.split_cache_size
@@ -1,6 +1,7 @@
 """Test the basic fastapi template"""
 
-from app.main import app
+from app.main import app, fill_threads, graph_registry, limiter
+from app.models import MCQ
 from fastapi.testclient import TestClient
 
 client = TestClient(app)
@@ -29,3 +30,108 @@ def test_rate_limit():
     # The 6th request should exceed the rate limit and return a 429 error
     response = client.get('/')
     assert response.status_code == 429
+
+
+def test_graph_stats():
+    """Checks the graph is built once and reports its build statistics"""
+    response = client.get('/graph')
+    assert response.status_code == 200
+    assert response.json()['build_seconds'] > 0
+    assert response.json()['memory_bytes'] > 0
+    assert client.get('/graph').json() == response.json()
+
+
+def test_graph_reload(monkeypatch):
+    """Checks the graph can be rebuilt and swapped in without a restart, only with the admin token"""
+    limiter.reset()
+    assert client.post('/graph/reload').status_code == 403
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    limiter.reset()
+    assert (
+        client.post(
+            '/graph/reload', headers={'X-Admin-Token': 'wrong'}
+        ).status_code
+        == 403
+    )
+
+    limiter.reset()
+    before = client.get('/graph').json()
+    response = client.post(
+        '/graph/reload', headers={'X-Admin-Token': 'secret'}
+    )
+    assert response.status_code == 200
+    assert response.json()['loaded_at'] > before['loaded_at']
+    assert client.get('/graph').json() == response.json()
+
+
+def test_batch():
+    """Checks a batch of distinct mcqs is streamed back as json lines"""
+    response = client.get('/batch', params={'n': 10})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    questions = [MCQ.parse_raw(line) for line in response.iter_lines()]
+    assert len(questions) == 10
+    assert len({(x.topic, x.answer) for x in questions}) == 10
+
+
+def test_pool_stats():
+    """Checks the question pool reports its depth and how questions were served"""
+    response = client.get('/pool')
+    assert response.status_code == 200
+    stats = response.json()
+    assert 0 <= stats['depth'] <= stats['capacity']
+    assert stats['served'] + stats['fallbacks'] > 0
+
+
+def test_seeded_root():
+    """Checks a seeded mcq is the same question each time and is served from the cache after the first request"""
+    limiter.reset()
+    before = client.get('/cache').json()
+    first = client.get('/', params={'seed': 3})
+    assert first.status_code == 200
+    assert client.get('/', params={'seed': 3}).json() == first.json()
+    after = client.get('/cache').json()
+    assert after['hits'] == before['hits'] + 1
+    assert after['hit_ratio'] > 0
+    assert client.get('/', params={'seed': -1}).status_code == 422
+
+
+def test_topic():
+    """Checks an mcq can be asked about a single topic and an unknown topic is not found"""
+    limiter.reset()
+    response = client.get('/topics/Neurotransmitter', params={'seed': 3})
+    assert response.status_code == 200
+    assert MCQ.parse_obj(response.json()).topic == 'Neurotransmitter'
+    assert client.get('/topics/Missing').status_code == 404
+    assert (
+        client.get(
+            '/topics/Neurotransmitter', params={'relationship_type': 'missing'}
+        ).status_code
+        == 404
+    )
+
+
+def test_graph_registry():
+    """Checks an mcq can be asked for from a subject graph by id, which is loaded on first use"""
+    limiter.reset()
+    response = client.get('/graphs/neuroscience/mcq', params={'seed': 3})
+    assert response.status_code == 200
+    assert response.json() == client.get('/', params={'seed': 3}).json()
+    assert 'neuroscience' in client.get('/graphs').json()['loaded']
+    for thread in list(fill_threads):
+        thread.join(10)
+    assert len(graph_registry.get('neuroscience').fake_words) > 0
+    assert client.get('/graphs/missing/mcq').status_code == 404
+    assert (
+        client.get(
+            '/graphs/neuroscience/mcq', params={'topic': 'Missing'}
+        ).status_code
+        == 404
+    )
+
+
+def test_query_timings():
+    """Checks query timings are served, empty as no database queries are sent by the sample graph"""
+    response = client.get('/queries')
+    assert response.status_code == 200
+    assert response.json() == []
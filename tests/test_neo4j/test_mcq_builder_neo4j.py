@@ -33,3 +33,4 @@ def test_mcq_generator_with_neo4j(complex_graph):
         topic='Farewells',
         choices=['Wordsla', 'See you later', 'Hey', 'Good Morning'],
     )
+    assert output == MCQBuilder(complex_graph, seed=3).generate()
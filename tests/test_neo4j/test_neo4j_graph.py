@@ -6,6 +6,7 @@ from typing import Generator
 import pytest
 from app.graphs.mcq_graph import MCQGraph
 from app.graphs.neo4j_graph import Neo4JGraph
+from app.models import MCQNode
 from dotenv import load_dotenv
 from tests.test_neo4j.neo4j_connect import URI
 from tests.test_templates.test_mcq_graph import TestMCQGraph
@@ -53,3 +54,31 @@ class TestNeo4JGraph:
     def test_neo4j_graph(self):
         """Run all the tests in mcq graph template file with these fixtures"""
         TestMCQGraph()
+
+
+def test_neo4j_projection_kept_while_used(complex_graph: Neo4JGraph):
+    """Tests a projection replaced after a change is only dropped once the last query holding it is done."""
+    exists = 'CALL gds.graph.exists($name) YIELD exists RETURN exists'
+    with complex_graph.driver.session() as session:
+        with complex_graph.hold_projection(session) as old:
+            complex_graph.create_nodes([MCQNode(name='Hola!')])
+            complex_graph.similarity_matrix(MCQNode(name='Hello'))
+            assert complex_graph.projection is not None
+            assert complex_graph.projection[1] != old
+            assert old in complex_graph.retired_projections
+            assert session.run(exists, name=old).single()['exists']
+        assert not complex_graph.retired_projections
+        assert not session.run(exists, name=old).single()['exists']
+
+
+def test_neo4j_stale_relationship_ids(complex_graph: Neo4JGraph):
+    """Tests relationships removed by another client are read again rather than failing the request."""
+    complex_graph.random_relationship(seed=1)
+    with complex_graph.driver.session() as session:
+        session.run(
+            'MATCH (:Entity)-[r]->(:Entity) WITH r SKIP 1 DELETE r'
+        ).consume()
+    remaining = list(complex_graph.relationships())
+    assert len(remaining) == 1
+    for seed in range(5):
+        assert complex_graph.random_relationship(seed=seed) == remaining[0]
@@ -0,0 +1,65 @@
+"""Test the query instrumentation used by the Neo4J graphs, these tests do not need a Neo4J database"""
+import logging
+
+from app.graphs.query_log import (
+    QueryStats,
+    TimedResult,
+    fingerprint,
+    start_timer,
+)
+
+logger = logging.getLogger('tests.query_log')
+
+
+class Unformattable:
+    """A parameter that fails the test if it is ever formatted."""
+
+    def __str__(self) -> str:
+        raise AssertionError('Parameter was formatted.')
+
+
+class ListResult:
+    """Stands in for a synchronous neo4j result."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+def test_fingerprint():
+    """Tests that fingerprints ignore whitespace but not the query."""
+    assert fingerprint('MATCH (n)\n  RETURN n') == fingerprint(
+        'MATCH (n) RETURN n'
+    )
+    assert fingerprint('MATCH (n) RETURN n') != fingerprint(
+        'MATCH (m) RETURN m'
+    )
+
+
+def test_disabled_timer():
+    """Tests that nothing is formatted or timed when stats are disabled and debug logging is off."""
+    logger.setLevel(logging.INFO)
+    stats = QueryStats()
+    assert (
+        start_timer('RETURN $x', {'x': Unformattable()}, logger, stats) is None
+    )
+
+
+def test_query_stats():
+    """Tests that timings are aggregated per query as results are read."""
+    logger.setLevel(logging.INFO)
+    stats = QueryStats(enabled=True)
+    for rows in [[1, 2, 3], [4]]:
+        timer = start_timer('MATCH (n) RETURN n', {}, logger, stats)
+        assert timer is not None
+        assert list(TimedResult(ListResult(rows), timer)) == rows
+
+    [timing] = stats.summary()
+    assert timing.fingerprint == fingerprint('MATCH (n) RETURN n')
+    assert timing.calls == 2
+    assert timing.rows == 4
+    assert 0 < timing.max_seconds <= timing.total_seconds
+    stats.reset()
+    assert not stats.summary()
@@ -0,0 +1,233 @@
+"""Test the MCQGraph class object interface with the CSR array graph, are operations working as expected"""
+import sys
+import threading
+from typing import Dict, Generator, List
+
+import networkx as nx
+import pytest
+from app.core.mcq_builder import MCQBuilder
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from app.models import MCQNode, MCQRelationship
+from tests.test_templates.test_mcq_graph import TestMCQGraph
+
+
+@pytest.fixture(name='graph')
+def graph_fixture() -> Generator[MCQGraph, None, None]:
+    """
+    Creates a CSR graph fixture for use in testing
+
+    Yields:
+        Generator[MCQGraph]: MCQGraph object storing its data in arrays.
+    """
+    graph = CSRGraph()
+    yield graph
+    graph.delete_all()
+
+
+@pytest.fixture(name='single_node_graph')
+def single_node_fixture(
+    graph: CSRGraph,
+) -> Generator[MCQGraph, None, None]:
+    """
+    Creates a single node within a CSR graph.
+
+    Yields:
+        Generator[MCQGraph]: MCQGraph object storing its data in arrays.
+    """
+    graph.create_nodes([MCQNode(name='Sample Node 0')])
+    yield graph
+
+
+@pytest.mark.usefixtures('graph', 'single_node_graph', 'complex_graph')
+class TestCSRGraph:
+    """Test class for CSRGraph"""
+
+    def test_csr_graph(self):
+        """Run all the tests in mcq graph template file with these fixtures"""
+        TestMCQGraph()
+
+
+def test_csr_replaced_relationship_type(simple_graph: CSRGraph):
+    """Tests a pair of nodes keeps a single relationship, like NXGraph, when given a new relationship type."""
+    old, new = [
+        MCQRelationship(
+            answer_node='Sample Node 1',
+            topic_node='Sample Node 2',
+            type=relationship_type,
+        )
+        for relationship_type in ['is_linked_to', 'is_part_of']
+    ]
+    simple_graph.create_relationships([old])
+    simple_graph.create_relationships([new])
+    assert simple_graph.has_relationship(old) is False
+    assert simple_graph.has_relationship(new) is True
+    assert list(simple_graph.relationships()) == [new]
+
+
+def test_csr_matches_nx(
+    complex_graph: CSRGraph, test_data: Dict[str, List[str]]
+):
+    """Tests the CSR graph generates the same questions as NXGraph from the same data and seeds."""
+    nx_graph = NXGraph()
+    nx_graph.fill_graph(test_data)
+    assert list(complex_graph.relationships()) == list(
+        nx_graph.relationships()
+    )
+    for seed in range(20):
+        assert (
+            MCQBuilder(complex_graph, seed=seed).generate()
+            == MCQBuilder(nx_graph, seed=seed).generate()
+        )
+
+
+def test_csr_removals_match_nx(
+    complex_graph: CSRGraph, test_data: Dict[str, List[str]]
+):
+    """Tests removed relationships leave the remaining ones in the same order as NXGraph, so seeds pick the same ones."""
+    nx_graph = NXGraph()
+    nx_graph.fill_graph(test_data)
+    removed = list(nx_graph.relationships())[1:12:3]
+    for graph in [complex_graph, nx_graph]:
+        graph.remove_relationships(removed + removed[:1])
+    assert list(complex_graph.relationships()) == list(
+        nx_graph.relationships()
+    )
+    for seed in range(20):
+        assert complex_graph.random_relationship(
+            seed=seed
+        ) == nx_graph.random_relationship(seed=seed)
+
+
+def test_csr_node_removals_match_nx(
+    complex_graph: CSRGraph, test_data: Dict[str, List[str]]
+):
+    """Tests removed nodes take their relationships out in the same order as NXGraph, so seeds pick the same ones."""
+    nx_graph = NXGraph()
+    names = sorted(test_data)
+    for step, name in enumerate(names):
+        removed = [name, names[(step * 7 + 3) % len(names)]]
+        for graph in [complex_graph, nx_graph]:
+            graph.fill_graph(test_data)
+            graph.remove_nodes(removed)
+        assert list(complex_graph.relationships()) == list(
+            nx_graph.relationships()
+        )
+        for seed in range(20):
+            assert complex_graph.random_relationship(
+                seed=seed
+            ) == nx_graph.random_relationship(seed=seed)
+
+
+def test_csr_similarity_matches_nx(
+    complex_graph: CSRGraph, test_data: Dict[str, List[str]]
+):
+    """Tests similarity rows list the same nodes in the same order as NXGraph, including those too far away to score."""
+    nx_graph = NXGraph()
+    for graph in [complex_graph, nx_graph]:
+        graph.fill_graph(
+            {**test_data, 'Chain 1': ['Blah'], 'Chain 2': ['Chain 1']}
+        )
+    for node in nx_graph.nodes():
+        row = complex_graph.similarity_matrix(node)
+        assert list(row) == [
+            x for x, _ in nx_graph.similarity_index.row(node.name)
+        ]
+        assert row == pytest.approx(nx_graph.similarity_matrix(node))
+    assert (
+        complex_graph.similarity_matrix(MCQNode(name='Hello'))['Chain 2'] == 0
+    )
+
+
+def test_csr_similarity_rows_kept(complex_graph: CSRGraph):
+    """Tests similarity rows a change does not reach are kept when the matrices are rebuilt."""
+    complex_graph.build_similarity_index()
+    rows = dict(complex_graph.similarity_rows)
+    complex_graph.create_nodes(
+        [MCQNode(name='Spanish'), MCQNode(name='Hola!')]
+    )
+    complex_graph.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Hola!', topic_node='Spanish', type='belongs_to'
+            )
+        ]
+    )
+    hello = complex_graph.names.get('Hello')
+    assert hello is not None
+    assert complex_graph.similarity_rows[hello] is rows[hello]
+    assert complex_graph.names.get('Spanish') not in rows
+    assert complex_graph.similarity_matrix(MCQNode(name='Hola!')) == {}
+
+
+def test_csr_filters_after_removals(complex_graph: CSRGraph):
+    """Tests filtered draws only come from the remaining relationships once the matrices are rebuilt."""
+    assert complex_graph.random_relationship(seed=1, answer_node='Greetings')
+    removed = [
+        x
+        for x in complex_graph.relationships()
+        if x.answer_node == 'Greetings'
+    ]
+    complex_graph.remove_relationships(removed[1:])
+    for seed in range(10):
+        assert (
+            complex_graph.random_relationship(
+                seed=seed, answer_node='Greetings'
+            )
+            == removed[0]
+        )
+    complex_graph.remove_relationships(removed[:1])
+    with pytest.raises(ValueError):
+        complex_graph.random_relationship(seed=1, answer_node='Greetings')
+
+
+def test_csr_connected_nodes_missing_node(complex_graph: CSRGraph):
+    """Tests asking for the nodes connected to a missing node raises the same error as NXGraph."""
+    for graph in [complex_graph, NXGraph()]:
+        with pytest.raises(nx.NodeNotFound):
+            graph.connected_nodes(MCQNode(name='Missing'))
+        assert graph.connected_names('Missing') == []
+
+
+def test_csr_concurrent_writes_and_reads(complex_graph: CSRGraph):
+    """Tests reads rebuilding the matrices while relationships are written never lose a write."""
+    complex_graph.create_nodes(
+        [MCQNode(name=f'Concurrent {x}') for x in range(200)]
+    )
+    done = threading.Event()
+    interval = sys.getswitchinterval()
+    # Switching threads often makes a rebuild interleave with a write
+    sys.setswitchinterval(1e-6)
+
+    def read():
+        while not done.is_set():
+            complex_graph.random_relationship()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for x in range(199):
+        complex_graph.create_relationships(
+            [
+                MCQRelationship(
+                    answer_node=f'Concurrent {x}',
+                    topic_node=f'Concurrent {x + 1}',
+                    type='is_linked_to',
+                )
+            ]
+        )
+    done.set()
+    for reader in readers:
+        reader.join()
+    sys.setswitchinterval(interval)
+    assert all(
+        complex_graph.has_relationship(
+            MCQRelationship(
+                answer_node=f'Concurrent {x}',
+                topic_node=f'Concurrent {x + 1}',
+                type='is_linked_to',
+            )
+        )
+        for x in range(199)
+    )
@@ -0,0 +1,142 @@
+"""Test the edge table used to sample random relationships from the Networkx Graph"""
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.graphs.edge_table import AliasTable, Edge, EdgeTable
+
+
+@pytest.fixture(name='edge_table')
+def edge_table_fixture() -> EdgeTable:
+    """Provides an edge table with three edges"""
+    table = EdgeTable()
+    table.add(('Hello', 'Greetings', 'belongs_to'))
+    table.add(('Hey', 'Greetings', 'belongs_to'))
+    table.add(('Greetings', 'Hello', 'includes'))
+    return table
+
+
+def test_remove_keeps_positions(edge_table: EdgeTable):
+    """Tests removing an edge swaps the last edge into its slot and keeps positions in sync."""
+    edge_table.remove('Hello', 'Greetings')
+    assert edge_table.edges == [
+        ('Greetings', 'Hello', 'includes'),
+        ('Hey', 'Greetings', 'belongs_to'),
+    ]
+    assert edge_table.positions == {
+        ('Greetings', 'Hello'): 0,
+        ('Hey', 'Greetings'): 1,
+    }
+    edge_table.remove('Hello', 'Greetings')
+    assert len(edge_table) == 2
+
+
+def test_sampling_is_seeded(edge_table: EdgeTable):
+    """Tests the same seed draws the same edges."""
+    first = edge_table.sample_many(random.Random(4), 10, unique=False)
+    assert first == edge_table.sample_many(random.Random(4), 10, unique=False)
+    assert len(edge_table.sample_many(random.Random(4), 10)) == 3
+
+
+def test_alias_table_distribution():
+    """Tests an alias table draws indexes in proportion to their weights."""
+    table = AliasTable([1, 2, 7])
+    rng = random.Random(0)
+    counts = Counter(table.sample(rng) for _ in range(20000))
+    assert counts[0] / 20000 == pytest.approx(0.1, abs=0.01)
+    assert counts[1] / 20000 == pytest.approx(0.2, abs=0.01)
+    assert counts[2] / 20000 == pytest.approx(0.7, abs=0.01)
+
+
+def test_weighted_sampling(edge_table: EdgeTable):
+    """Tests topic and type weights shift which edges are drawn."""
+    rng = random.Random(0)
+    edge_table.set_weights(topic_weights={'Hello': 98})
+    counts = Counter(edge_table.sample(rng)[1] for _ in range(1000))
+    assert counts['Hello'] > 950
+
+    edge_table.set_weights(type_weights={'includes': 0.01})
+    counts = Counter(edge_table.sample(rng)[2] for _ in range(1000))
+    assert counts['includes'] < 20
+
+    with pytest.raises(ValueError):
+        edge_table.set_weights(type_weights={'includes': 0})
+
+
+def test_recent_edges_down_weighted(edge_table: EdgeTable):
+    """Tests recently drawn edges are rarely drawn again while they are recent."""
+    rng = random.Random(0)
+    edge_table.set_weights(recent_weight=0.001, recent_limit=2)
+    drawn = [edge_table.sample(rng) for _ in range(30)]
+    assert all(len(set(drawn[i : i + 3])) == 3 for i in range(28))
+
+
+def test_filtered_sampling(edge_table: EdgeTable):
+    """Tests draws limited to an answer node or type only return matching edges, and follow later changes."""
+    rng = random.Random(0)
+    assert edge_table.sample(rng, answer_node='Greetings') == (
+        'Greetings',
+        'Hello',
+        'includes',
+    )
+    counts = Counter(
+        edge_table.sample(rng, relationship_type='belongs_to')[0]
+        for _ in range(1000)
+    )
+    assert set(counts) == {'Hello', 'Hey'}
+    assert counts['Hello'] / 1000 == pytest.approx(0.5, abs=0.06)
+
+    edge_table.add(('Greetings', 'Hello', 'belongs_to'))
+    edge_table.add(('Greetings', 'Hey', 'includes'))
+    edge_table.remove('Hello', 'Greetings')
+    assert sorted(
+        edge_table.sample_many(rng, 10, answer_node='Greetings')
+    ) == [
+        ('Greetings', 'Hello', 'belongs_to'),
+        ('Greetings', 'Hey', 'includes'),
+    ]
+    assert sorted(
+        edge_table.sample_many(rng, 10, relationship_type='belongs_to')
+    ) == [
+        ('Greetings', 'Hello', 'belongs_to'),
+        ('Hey', 'Greetings', 'belongs_to'),
+    ]
+    with pytest.raises(ValueError):
+        edge_table.sample(rng, answer_node='Hello')
+
+
+def test_concurrent_first_filtered_draws():
+    """Tests draws racing to build the groups never see them half built and wrongly find no matching edge."""
+    table = EdgeTable()
+    for i in range(10000):
+        table.add((f'Word {i}', 'Greetings', 'belongs_to'))
+    table.add(('Hello', 'Greetings', 'includes'))
+    barrier = threading.Barrier(8)
+
+    def draw(seed: int) -> Edge:
+        barrier.wait()
+        return table.sample(random.Random(seed), answer_node='Hello')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        edges = list(executor.map(draw, range(8)))
+    assert edges == [('Hello', 'Greetings', 'includes')] * 8
+
+
+def test_concurrent_recent_edges(edge_table: EdgeTable):
+    """Tests draws from many threads keep the recent edges and their counts in step."""
+    edge_table.set_weights(recent_weight=0.5, recent_limit=2)
+    barrier = threading.Barrier(8)
+
+    def draw(seed: int):
+        rng = random.Random(seed)
+        barrier.wait()
+        for _ in range(2000):
+            edge_table.sample(rng)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(draw, range(8)))
+    recent = edge_table.recent
+    assert len(recent.order) == 2
+    assert recent.counts == Counter(recent.order)
@@ -0,0 +1,133 @@
+"""Test the GraphRegistry Class with Networkx graphs loaded by id"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List
+
+import pytest
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.graph_registry import GraphRegistry, parse_graphs
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+
+
+def counted_loaders(
+    ids: List[str], loads: Dict[str, int], delay: float = 0.0
+) -> Dict[str, Callable[[], MCQGraph]]:
+    """
+    Loaders that build a small graph for each id and count how often they run.
+
+    Args:
+        ids (List[str]): graph ids
+        loads (Dict[str, int]): filled with the number of loads of each id
+        delay (float, optional): seconds each load takes. Defaults to 0.0.
+
+    Returns:
+        Dict[str, Callable[[], MCQGraph]]: the loader of each graph id
+    """
+    lock = threading.Lock()
+
+    def load(graph_id: str) -> MCQGraph:
+        with lock:
+            loads[graph_id] = loads.get(graph_id, 0) + 1
+        time.sleep(delay)
+        graph = NXGraph()
+        graph.fill_graph({graph_id: ['Red', 'Blue', 'Green']})
+        return graph
+
+    return {x: partial(load, x) for x in ids}
+
+
+def test_lazy_loading():
+    """A test to show that graphs are only built when first asked for and then shared."""
+    loads: Dict[str, int] = {}
+    registry = GraphRegistry(counted_loaders(['colours', 'shapes'], loads))
+    assert not loads
+    graph = registry.get('colours')
+    assert registry.get('colours') is graph
+    assert loads == {'colours': 1}
+    assert list(registry.stats().loaded) == ['colours']
+    assert registry.stats().graphs == ['colours', 'shapes']
+
+    with pytest.raises(ValueError):
+        registry.get('missing')
+
+
+def test_coalesced_loading():
+    """A test to show that a burst of first requests for a graph builds it only once."""
+    loads: Dict[str, int] = {}
+    registry = GraphRegistry(counted_loaders(['colours'], loads, delay=0.1))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        graphs = list(executor.map(registry.get, ['colours'] * 8))
+    assert loads == {'colours': 1}
+    assert all(x is graphs[0] for x in graphs)
+    assert registry.stats().loads == 1
+
+
+def test_independent_loading():
+    """A test to show that a slow build of one graph does not hold up the first request for another."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def load_slow() -> MCQGraph:
+        started.set()
+        release.wait(5)
+        graph = NXGraph()
+        graph.fill_graph({'slow': ['Red', 'Blue', 'Green']})
+        return graph
+
+    loads: Dict[str, int] = {}
+    registry = GraphRegistry(
+        {**counted_loaders(['fast'], loads), 'slow': load_slow}
+    )
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        slow = executor.submit(registry.get, 'slow')
+        assert started.wait(5)
+        assert registry.get('fast').get_node('fast') is not None
+        assert not slow.done()
+        release.set()
+        assert slow.result().get_node('slow') is not None
+    assert registry.stats().loads == 2
+
+
+def test_eviction():
+    """A test to show that the least recently used graphs are evicted once too many are held or the budget is exceeded."""
+    loads: Dict[str, int] = {}
+    loaders = counted_loaders(['a', 'b', 'c'], loads)
+    registry = GraphRegistry(loaders, max_graphs=2)
+    registry.get('a')
+    registry.get('b')
+    registry.get('a')
+    registry.get('c')
+    assert sorted(registry.stats().loaded) == ['a', 'c']
+    assert registry.stats().evictions == 1
+    registry.get('b')
+    assert loads == {'a': 1, 'b': 2, 'c': 1}
+
+    budget = GraphRegistry(loaders, memory_budget=0)
+    budget.get('a')
+    budget.get('b')
+    assert list(budget.stats().loaded) == ['b']
+    budget.evict('b')
+    assert not budget.stats().loaded
+
+    with pytest.raises(ValueError):
+        GraphRegistry(loaders, max_graphs=0)
+
+
+def test_parse_graphs(tmp_path):
+    """A test to show that graphs listed as id=path pairs are loaded from their files."""
+    path = tmp_path / 'colours.jsonl'
+    path.write_text(
+        '{"answer_node": "Colours", "topic_node": "Red", "type": "includes"}\n',
+        encoding='utf-8',
+    )
+    registry = GraphRegistry(parse_graphs(f' colours={path}, '))
+    graph = registry.get('colours')
+    assert isinstance(graph, CSRGraph)
+    assert len(list(graph.relationships())) == 1
+
+    for spec in ['colours', 'colours=colours.txt', '=colours.jsonl']:
+        with pytest.raises(ValueError):
+            parse_graphs(spec)
@@ -0,0 +1,37 @@
+"""Test the GraphStore Class and the measurement of the memory held by a graph"""
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from app.data.sample_graph import generate_graph
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.graph_store import GraphStore, held_memory
+
+
+def test_held_memory(tmp_path):
+    """A test to show that owned buffers are counted, views count their base once and mapped pages are not counted."""
+    owned = np.zeros(100000, dtype=np.int64)
+    assert held_memory(owned) >= owned.nbytes
+    assert held_memory([owned, owned[10:]]) < 2 * owned.nbytes
+
+    path = tmp_path / 'mapped.bin'
+    owned.tofile(path)
+    mapped = np.memmap(path, dtype=np.int64, mode='r')
+    assert held_memory(mapped) < owned.nbytes
+
+    graph = CSRGraph()
+    graph.fill_graph({'Colours': ['Red', 'Blue', 'Green']})
+    assert held_memory(graph) >= graph.edges.nbytes
+
+
+def test_concurrent_builds():
+    """A test to show that stores built at the same time each measure their graph without tracing allocations."""
+    stores = [GraphStore(generate_graph) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda x: x.load(), stores))
+    # Instance dictionaries share their keys between objects, so their reported size can differ by a few bytes
+    sizes = [x.stats.memory_bytes for x in stores]
+    assert min(sizes) > 0
+    assert max(sizes) - min(sizes) <= min(sizes) / 100
+    assert all(x.stats.build_seconds > 0 for x in stores)
+    assert not tracemalloc.is_tracing()
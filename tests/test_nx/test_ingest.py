@@ -0,0 +1,134 @@
+"""Test streaming edge files into graphs in chunks"""
+import json
+from pathlib import Path
+from typing import Dict, List, Type
+
+import pytest
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.ingest import ingest, ingest_rows
+from app.graphs.mcq_graph import MCQGraph, graph_content
+from app.graphs.nx_graph import NXGraph
+from app.models import IngestStats, MCQNode, MCQRelationship
+
+
+@pytest.fixture(name='edge_file')
+def edge_file_fixture(test_data: Dict[str, List[str]], tmp_path: Path) -> Path:
+    """
+    Writes the relationships of the test data to a JSONL edge file.
+
+    Returns:
+        Path: the edge file
+    """
+    _, relationships = graph_content(test_data)
+    path = tmp_path / 'edges.jsonl'
+    path.write_text(
+        '\n'.join(x.json() for x in relationships) + '\n', encoding='utf-8'
+    )
+    return path
+
+
+def test_ingest_matches_fill_graph(
+    edge_file: Path, test_data: Dict[str, List[str]]
+):
+    """Tests streaming an edge file in chunks gives the same graph as fill_graph."""
+    filled, streamed = NXGraph(), NXGraph()
+    filled.fill_graph(test_data)
+    stats = ingest(streamed, str(edge_file), chunk_size=7)
+    assert stats == IngestStats(rows=54, relationships=54, chunks=8)
+    assert sorted(streamed.nodes()) == sorted(filled.nodes())
+    # Relationships are listed by answer node in the order nodes were created, which differs between the two
+    assert sorted(streamed.relationships(), key=str) == sorted(
+        filled.relationships(), key=str
+    )
+
+
+def test_ingest_csv(tmp_path: Path):
+    """Tests a CSV edge file with a header is read, and invalid rows are skipped."""
+    path = tmp_path / 'edges.csv'
+    path.write_text(
+        'answer_node,topic_node,type\n'
+        'Hello,Greetings,belongs_to\n'
+        'Hey,Greetings,belongs_to\n'
+        'Hola,Greetings,belongs to\n'
+        'Adios,Farewells\n',
+        encoding='utf-8',
+    )
+    graph = CSRGraph()
+    stats = ingest(graph, str(path))
+    assert stats == IngestStats(rows=4, relationships=2, skipped=2, chunks=1)
+    assert sorted(x.name for x in graph.nodes()) == [
+        'Greetings',
+        'Hello',
+        'Hey',
+    ]
+    with pytest.raises(ValueError):
+        ingest(graph, str(path), strict=True)
+
+
+def test_ingest_merge(edge_file: Path):
+    """Tests merging an edge file keeps the current content and skips relationships the graph already has."""
+    graph = NXGraph()
+    extra = MCQRelationship(
+        answer_node='Salut', topic_node='Greetings', type='belongs_to'
+    )
+    ingest_rows(graph, [(1, extra.dict())])
+    ingest(graph, str(edge_file), merge=True)
+    stats = ingest(graph, str(edge_file), merge=True)
+    assert stats.relationships == 54
+    assert graph.has_relationship(extra)
+    assert len(list(graph.relationships())) == 55
+
+    ingest(graph, str(edge_file))
+    assert not graph.has_relationship(extra)
+
+
+def test_ingest_invalid_lines(tmp_path: Path):
+    """Tests lines that are not JSON objects are counted as skipped rows."""
+    path = tmp_path / 'edges.jsonl'
+    rows = [
+        json.dumps(
+            {'answer_node': 'Hello', 'topic_node': 'Words', 'type': 'is_in'}
+        ),
+        'not json',
+        '[]',
+        '',
+    ]
+    path.write_text('\n'.join(rows), encoding='utf-8')
+    stats = ingest(NXGraph(), str(path))
+    assert stats == IngestStats(rows=3, relationships=1, skipped=2, chunks=1)
+    with pytest.raises(ValueError):
+        ingest(NXGraph(), str(tmp_path / 'edges.txt'))
+
+
+@pytest.mark.parametrize('graph_class', [NXGraph, CSRGraph])
+def test_bulk_merge_matches_default(
+    graph_class: Type[MCQGraph], test_data: Dict[str, List[str]]
+):
+    """Tests the bulk merges of the in memory graphs write what merging one row at a time would."""
+    _, relationships = graph_content(test_data)
+    rows = relationships[::3] + [
+        relationships[1].copy(update={'type': 'is_in'}),
+        MCQRelationship(
+            answer_node='Salut', topic_node='Greetings', type='belongs_to'
+        ),
+    ]
+    bulk, default = graph_class(), graph_class()
+    for graph in [bulk, default]:
+        graph.fill_graph(test_data)
+    bulk.merge_nodes([MCQNode(name='Hello'), MCQNode(name='Ciao!')])
+    bulk.merge_relationships(rows)
+    MCQGraph.merge_nodes(
+        default, [MCQNode(name='Hello'), MCQNode(name='Ciao!')]
+    )
+    MCQGraph.merge_relationships(default, rows)
+    assert list(bulk.nodes()) == list(default.nodes())
+    assert list(bulk.relationships()) == list(default.relationships())
+
+
+def test_fill_graph_in_chunks(test_data: Dict[str, List[str]]):
+    """Tests filling a graph in small chunks gives the graph, in the same order, that a single write does."""
+    whole, chunked = NXGraph(), NXGraph()
+    whole.fill_graph(test_data)
+    chunked.fill_graph(test_data, chunk_size=5)
+    assert list(chunked.nodes()) == list(whole.nodes())
+    assert list(chunked.relationships()) == list(whole.relationships())
@@ -1,11 +1,12 @@
 """Test the MCQ Generator Class with an Networkx Graph Database"""
+from concurrent.futures import ThreadPoolExecutor
 from typing import Generator
 
 import pytest
-from app.core.mcq_builder import MCQBuilder
+from app.core.mcq_builder import MCQBuilder, fake_word_filler
 from app.graphs.mcq_graph import MCQGraph
 from app.graphs.nx_graph import NXGraph
-from app.models import MCQ
+from app.models import MCQ, MCQRelationship
 
 
 @pytest.fixture(name='graph')
@@ -32,3 +33,113 @@ def test_mcq_generator_with_nx(complex_graph):
         topic='Farewells',
         choices=['Good Morning', 'Hey', 'Goodbye'],
     )
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_mcq_generate_many_with_nx(complex_graph):
+    """A test to show that a batch of distinct questions can be generated from shared graph reads."""
+    mcq = MCQBuilder(complex_graph, seed=3)
+    output = list(mcq.generate_many(8))
+    assert len(output) == 8
+    assert len({(x.topic, x.answer) for x in output}) == 8
+    assert all(x.answer in x.choices for x in output)
+    assert output == list(MCQBuilder(complex_graph, seed=3).generate_many(8))
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_mcq_generator_concurrent_with_nx(complex_graph):
+    """A test to show that seeded questions generated concurrently match those generated one at a time."""
+    expected = [
+        MCQBuilder(complex_graph, seed=x).generate() for x in range(40)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        output = list(
+            executor.map(
+                lambda x: MCQBuilder(complex_graph, seed=x).generate(),
+                range(40),
+            )
+        )
+    assert output == expected
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_mcq_generator_fake_word_bank_with_nx(complex_graph):
+    """A test to show that unseeded questions take fake words from a filled bank, which is emptied when the graph changes."""
+    MCQBuilder(complex_graph).fill_fake_word_bank()
+    assert len(complex_graph.fake_words) > 0
+    banked = {
+        word
+        for words in complex_graph.fake_words.banks.values()
+        for word in words
+    }
+    for _ in range(10):
+        output = MCQBuilder(complex_graph).generate()
+        assert len(output.choices) <= 4
+        assert all(
+            x in banked or complex_graph.get_node(x) for x in output.choices
+        )
+
+    complex_graph.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Blah', topic_node='Hola', type='is_linked_to'
+            )
+        ]
+    )
+    assert len(complex_graph.fake_words) == 0
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_mcq_generator_fills_missed_bank_with_nx(complex_graph):
+    """A test to show that an unseeded question that misses the bank has its relationship filled in the background."""
+    assert len(complex_graph.fake_words) == 0
+    output = MCQBuilder(complex_graph).generate()
+    # The filler runs one job at a time, so this waits for the fill started by the question
+    fake_word_filler.submit(lambda: None).result()
+    assert [x[:2] for x in complex_graph.fake_words.claimed] == [
+        (output.topic, output.answer)
+    ]
+    assert (
+        set(complex_graph.fake_words.banks) <= complex_graph.fake_words.claimed
+    )
+
+    # Seeded questions never use the bank, so they do not fill it either
+    MCQBuilder(complex_graph, seed=3).generate()
+    fake_word_filler.submit(lambda: None).result()
+    assert len(complex_graph.fake_words.claimed) == 1
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_mcq_generator_topic_with_nx(complex_graph):
+    """A test to show that questions can be asked about one topic or relationship type only."""
+    for seed in range(10):
+        output = MCQBuilder(complex_graph, seed=seed).generate(
+            topic='Greetings'
+        )
+        assert output.topic == 'Greetings'
+        assert output.answer in output.choices
+    output = list(
+        MCQBuilder(complex_graph, seed=3).generate_many(
+            2, topic='Greetings', relationship_type='belongs_to'
+        )
+    )
+    assert len(output) == 2
+    assert all(x.topic == 'Greetings' for x in output)
+
+    with pytest.raises(ValueError):
+        MCQBuilder(complex_graph, seed=3).generate(topic='Missing')
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_mcq_generator_bank_parity_with_nx(complex_graph):
+    """A test to show that seeded questions are the same before and after the fake word bank is filled."""
+    expected = [
+        MCQBuilder(complex_graph, seed=x).generate() for x in range(20)
+    ]
+    version = complex_graph.version
+    MCQBuilder(complex_graph).fill_fake_word_bank()
+    assert len(complex_graph.fake_words) > 0
+    assert complex_graph.version == version
+    assert [
+        MCQBuilder(complex_graph, seed=x).generate() for x in range(20)
+    ] == expected
@@ -0,0 +1,99 @@
+"""Test the MCQCache Class with an Networkx Graph Database"""
+from typing import Generator
+
+import pytest
+from app.core.mcq_builder import MCQBuilder
+from app.core.mcq_cache import MCQCache
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from app.models import MCQNode
+
+
+@pytest.fixture(name='graph')
+def graph_fixture() -> Generator[MCQGraph, None, None]:
+    """
+    Creates fixtures MCQGraph object to work with
+
+    Yields:
+        Generator[MCQGraph]: MCQGraph object that connects via driver to database.
+    """
+    graph = NXGraph()
+    yield graph
+    graph.delete_all()
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_cached_builder(complex_graph):
+    """A test to show that a seeded question is generated once and then served from the cache."""
+    cache = MCQCache()
+    first = MCQBuilder(complex_graph, seed=3, cache=cache).generate()
+    assert first == MCQBuilder(complex_graph, seed=3).generate()
+    assert MCQBuilder(complex_graph, seed=3, cache=cache).generate() is first
+    MCQBuilder(complex_graph, cache=cache).generate()
+
+    stats = cache.stats()
+    assert stats.entries == 1
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.hit_ratio == 0.5
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_cache_invalidation(complex_graph):
+    """A test to show that entries are dropped once the graph changes or a different graph is served."""
+    cache = MCQCache()
+    for seed in range(3):
+        MCQBuilder(complex_graph, seed=seed, cache=cache).generate()
+    assert len(cache) == 3
+
+    complex_graph.create_nodes([MCQNode(name='Unconnected')])
+    assert cache.get(complex_graph, 0) is None
+    assert len(cache) == 0
+
+    question = MCQBuilder(complex_graph, seed=0, cache=cache).generate()
+    version = complex_graph.version
+    complex_graph.create_nodes([MCQNode(name='Also unconnected')])
+    cache.put(complex_graph, version, 0, question)
+    assert len(cache) == 0
+
+    cache.put(complex_graph, complex_graph.version, 0, question)
+    other = NXGraph()
+    other.fill_graph({'Colours': ['Red', 'Blue']})
+    assert cache.get(other, 0) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_cache_eviction(complex_graph):
+    """A test to show that the least recently used entry is evicted when full and entries expire after their time to live."""
+    cache = MCQCache(size=2)
+    for seed in range(2):
+        MCQBuilder(complex_graph, seed=seed, cache=cache).generate()
+    assert cache.get(complex_graph, 0) is not None
+    MCQBuilder(complex_graph, seed=2, cache=cache).generate()
+    assert cache.get(complex_graph, 1) is None
+    assert cache.get(complex_graph, 0) is not None
+
+    expired = MCQCache(ttl=0)
+    MCQBuilder(complex_graph, seed=0, cache=expired).generate()
+    assert expired.get(complex_graph, 0) is None
+    assert len(expired) == 0
+
+    with pytest.raises(ValueError):
+        MCQCache(size=-1)
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_cache_after_bank_fill(complex_graph):
+    """A test to show that cached questions still match fresh ones once the fake word bank has been filled."""
+    cache = MCQCache()
+    cached = [
+        MCQBuilder(complex_graph, seed=x, cache=cache).generate()
+        for x in range(10)
+    ]
+    MCQBuilder(complex_graph).fill_fake_word_bank()
+    assert len(cache) == 10
+    assert [cache.get(complex_graph, x) for x in range(10)] == cached
+    assert [
+        MCQBuilder(complex_graph, seed=x).generate() for x in range(10)
+    ] == cached
@@ -0,0 +1,113 @@
+"""Test the MCQPool Class with an Networkx Graph Database"""
+import time
+from typing import Generator
+
+import pytest
+from app.core.mcq_pool import MCQPool
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from app.models import MCQ, MCQNode
+
+
+@pytest.fixture(name='graph')
+def graph_fixture() -> Generator[MCQGraph, None, None]:
+    """
+    Creates fixtures MCQGraph object to work with
+
+    Yields:
+        Generator[MCQGraph]: MCQGraph object that connects via driver to database.
+    """
+    graph = NXGraph()
+    yield graph
+    graph.delete_all()
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_pool_watermarks(complex_graph):
+    """A test to show that an empty pool falls back, and is filled to its high watermark and asks for a refill below its low one."""
+    pool = MCQPool(
+        capacity=8, low_watermark=2, high_watermark=6, background=False
+    )
+    assert pool.pop(complex_graph) is None
+    assert pool.wanted.is_set()
+    pool.wanted.clear()
+
+    pool.fill()
+    assert len(pool) == 6
+    for _ in range(4):
+        assert isinstance(pool.pop(complex_graph), MCQ)
+    assert not pool.wanted.is_set()
+    pool.pop(complex_graph)
+    assert pool.wanted.is_set()
+
+    stats = pool.stats()
+    assert stats.depth == 1
+    assert stats.filled == 6
+    assert stats.served == 5
+    assert stats.fallbacks == 1
+    assert stats.fill_rate > 0
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_pool_repeatable(complex_graph):
+    """A test to show that pools with the same seed hold the same questions."""
+    pools = [MCQPool(capacity=4, seed=3, background=False) for _ in range(2)]
+    for pool in pools:
+        pool.attach(complex_graph)
+        pool.fill()
+    assert list(pools[0].questions) == list(pools[1].questions)
+
+
+def test_pool_changes():
+    """A test to show that only questions reached by a change are dropped, and all of them when another graph is served."""
+    graph = NXGraph()
+    graph.fill_graph(
+        {
+            'Greetings': ['Hello', 'Hey', 'Hola'],
+            'Colours': ['Red', 'Blue', 'Green'],
+        }
+    )
+    greetings = {'Greetings', 'Hello', 'Hey', 'Hola'}
+    pool = MCQPool(capacity=20, seed=1, background=False)
+    pool.attach(graph)
+    pool.fill()
+    assert any(x.answer in greetings for x in pool.questions)
+    assert any(x.answer not in greetings for x in pool.questions)
+
+    graph.remove_nodes(['Hola'])
+    assert len(pool) > 0
+    assert all(x.answer not in greetings for x in pool.questions)
+    assert pool.stats().discarded == 20 - len(pool)
+
+    kept = len(pool)
+    graph.create_nodes([MCQNode(name='Unconnected')])
+    assert len(pool) == kept
+
+    other = NXGraph()
+    other.fill_graph({'Colours': ['Red', 'Blue']})
+    assert pool.pop(other) is None
+    assert pool.stats().discarded == 20
+    assert len(pool) == 0
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_pool_background(complex_graph):
+    """A test to show that the background thread fills the pool and stops when the pool is closed."""
+    pool = MCQPool(capacity=10)
+    pool.attach(complex_graph)
+    deadline = time.monotonic() + 5
+    while len(pool) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(pool) == 10
+    assert pool.pop(complex_graph) is not None
+    pool.close()
+    assert pool.thread is not None
+    assert not pool.thread.is_alive()
+
+
+def test_pool_invalid_watermarks():
+    """A test to show that watermarks outside the capacity are rejected."""
+    with pytest.raises(ValueError):
+        MCQPool(capacity=4, low_watermark=3, high_watermark=2)
+    with pytest.raises(ValueError):
+        MCQPool(capacity=4, high_watermark=5)
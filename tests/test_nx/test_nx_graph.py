@@ -1,10 +1,11 @@
 """Test the MCQGraph class object interface with Neo4J Database, are operations working as expected"""
 import logging
-from typing import Generator
+from typing import Generator, List
 
 import pytest
-from app.graphs.mcq_graph import MCQGraph
+from app.graphs.mcq_graph import GraphChange, MCQGraph
 from app.graphs.nx_graph import NXGraph
+from app.models import MCQRelationship
 from tests.test_templates.test_mcq_graph import TestMCQGraph
 
 logging.getLogger('neo4j.bolt').setLevel(logging.DEBUG)
@@ -44,3 +45,57 @@ class TestNXGraph:
     def test_nx_graph(self):
         """Run all the tests in mcq graph template file with these fixtures"""
         TestMCQGraph()
+
+
+def test_replaced_relationship_type(simple_graph: NXGraph):
+    """Tests the adjacency indexes follow networkx when a pair of nodes is given a new relationship type."""
+    old, new = [
+        MCQRelationship(
+            answer_node='Sample Node 1',
+            topic_node='Sample Node 2',
+            type=relationship_type,
+        )
+        for relationship_type in ['is_linked_to', 'is_part_of']
+    ]
+    simple_graph.create_relationships([old])
+    simple_graph.create_relationships([new])
+    assert simple_graph.has_relationship(old) is False
+    assert simple_graph.has_relationship(new) is True
+    assert not simple_graph.related_nodes(
+        old.copy(update={'answer_node': 'Sample Node 0'})
+    )
+
+
+def test_failing_change_listener(simple_graph: NXGraph):
+    """Tests a listener that fails does not stop a change or the listeners after it."""
+    changes: List[GraphChange] = []
+
+    def fail(change: GraphChange):
+        raise ValueError(f'Failed on version {change.version}.')
+
+    simple_graph.subscribe(fail)
+    simple_graph.subscribe(changes.append)
+    simple_graph.remove_nodes(['Sample Node 1'])
+    assert simple_graph.get_node('Sample Node 1') is None
+    assert [x.version for x in changes] == [simple_graph.version]
+
+
+def test_change_with_known_neighbourhood(
+    simple_graph: NXGraph, monkeypatch: pytest.MonkeyPatch
+):
+    """Tests a neighbourhood returned by the write is used rather than read from the graph again."""
+
+    def fail(names):
+        raise AssertionError(f'Neighbourhood of {names} was read.')
+
+    monkeypatch.setattr(simple_graph, 'neighbourhood', fail)
+    assert simple_graph.mark_changed(
+        ['Sample Node 1'], affected=['Sample Node 2']
+    ) == {'Sample Node 1', 'Sample Node 2'}
+
+
+def test_fill_graph_invalid_names(graph: NXGraph):
+    """Tests names are checked before the relationships between them are built without validation."""
+    with pytest.raises(ValueError):
+        graph.fill_graph({'Numbers': ['One', 2]})  # type: ignore
+    assert not list(graph.relationships())
@@ -0,0 +1,60 @@
+"""Test the ProcessMCQBuilder Class with worker processes building the sample Networkx graph"""
+import asyncio
+
+import pytest
+from app.core import process_mcq_builder
+from app.core.mcq_builder import MCQBuilder
+from app.core.process_mcq_builder import (
+    ProcessMCQBuilder,
+    generate_in_worker,
+    init_worker,
+)
+from app.data.sample_graph import generate_graph
+
+
+def test_process_mcq_generator():
+    """A test to show that questions generated in worker processes match those generated in the api process."""
+    builder = ProcessMCQBuilder(generate_graph, workers=2)
+    graph = generate_graph()
+    MCQBuilder(graph).fill_fake_word_bank()
+
+    async def generate():
+        return await asyncio.gather(
+            *[builder.generate(seed=x) for x in range(4)],
+            builder.generate_many(5, seed=3),
+        )
+
+    try:
+        *questions, batch = asyncio.run(generate())
+        assert questions == [
+            MCQBuilder(graph, seed=x).generate() for x in range(4)
+        ]
+        assert batch == list(MCQBuilder(graph, seed=3).generate_many(5))
+
+        builder.reload()
+        assert asyncio.run(builder.generate(seed=1)) == questions[1]
+    finally:
+        builder.close()
+    assert builder.executor is None
+
+
+def test_worker_without_graph():
+    """A test to show that generating outside an initialised worker is rejected."""
+    with pytest.raises(ValueError):
+        generate_in_worker(seed=1)
+
+
+def test_worker_loads_graph():
+    """A test to show that a worker loads its graph without filling the fake word bank first and serves the questions
+    the api process would."""
+    graph = generate_graph()
+    MCQBuilder(graph).fill_fake_word_bank()
+    try:
+        init_worker(generate_graph)
+        assert process_mcq_builder.worker_graph is not None
+        assert len(process_mcq_builder.worker_graph.fake_words) == 0
+        assert [generate_in_worker(seed=x) for x in range(10)] == [
+            MCQBuilder(graph, seed=x).generate() for x in range(10)
+        ]
+    finally:
+        process_mcq_builder.worker_graph = None
@@ -0,0 +1,121 @@
+"""Test the similarity index kept by the Networkx Graph"""
+from typing import Generator
+
+import networkx as nx
+import pytest
+from app.graphs.mcq_graph import MCQGraph
+from app.graphs.nx_graph import NXGraph
+from app.models import MCQNode, MCQRelationship
+
+
+@pytest.fixture(name='graph')
+def graph_fixture() -> Generator[MCQGraph, None, None]:
+    """
+    Creates a networkx graph fixture for use in testing
+
+    Yields:
+        Generator[MCQGraph]: MCQGraph object
+    """
+    graph = NXGraph()
+    yield graph
+    graph.delete_all()
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_similarity_rows_match_jaccard(complex_graph: NXGraph):
+    """Tests every indexed row matches the jaccard scores networkx calculates for non adjacent nodes within five hops."""
+    complex_graph.create_nodes(
+        [MCQNode(name=x) for x in ['Chain 1', 'Chain 2', 'Chain 3', 'Chain 4']]
+    )
+    complex_graph.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Blah', topic_node='Chain 1', type='is_linked_to'
+            ),
+            MCQRelationship(
+                answer_node='Chain 1',
+                topic_node='Chain 2',
+                type='is_linked_to',
+            ),
+            MCQRelationship(
+                answer_node='Chain 2',
+                topic_node='Chain 3',
+                type='is_linked_to',
+            ),
+            MCQRelationship(
+                answer_node='Chain 3',
+                topic_node='Chain 4',
+                type='is_linked_to',
+            ),
+        ]
+    )
+    complex_graph.build_similarity_index()
+    for name in complex_graph.graph.nodes:
+        subgraph = nx.ego_graph(
+            complex_graph.graph, name, radius=5, undirected=True
+        ).to_undirected()
+        expected = {
+            (x[1] if x[0] == name else x[0]): x[2]
+            for x in nx.jaccard_coefficient(subgraph)
+            if name in x[:2]
+        }
+        row = complex_graph.similarity_index.row(name)
+        assert dict(row) == pytest.approx(expected)
+        head = [x[1] for x in row[: complex_graph.similarity_index.top_k]]
+        assert head == sorted(head, reverse=True)
+    # Only nodes within five hops are listed, with a score of 0 beyond two hops
+    row = complex_graph.similarity_matrix(MCQNode(name='Hello'))
+    assert row['Chain 3'] == 0
+    assert 'Chain 4' not in row
+
+
+@pytest.mark.usefixtures('graph', 'complex_graph')
+def test_similarity_rows_invalidated(complex_graph: NXGraph):
+    """Tests only the rows within two hops of a new relationship are rebuilt after it is created."""
+    complex_graph.build_similarity_index()
+    assert (
+        complex_graph.similarity_matrix(MCQNode(name='Adios'))['Blah'] == 0.5
+    )
+    complex_graph.create_nodes(
+        [MCQNode(name='Spanish'), MCQNode(name='Sample Node')]
+    )
+    complex_graph.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Spanish', topic_node='Adios', type='includes'
+            ),
+            MCQRelationship(
+                answer_node='Spanish', topic_node='Blah', type='includes'
+            ),
+        ]
+    )
+    assert 'Adios' not in complex_graph.similarity_index.rows
+    assert complex_graph.similarity_matrix(MCQNode(name='Adios'))[
+        'Blah'
+    ] == pytest.approx(2 / 3)
+
+    # A separate pair of nodes is out of reach of changes to the rest of the graph
+    complex_graph.create_nodes(
+        [MCQNode(name='Island 1'), MCQNode(name='Island 2')]
+    )
+    complex_graph.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Island 1',
+                topic_node='Island 2',
+                type='is_linked_to',
+            )
+        ]
+    )
+    complex_graph.build_similarity_index()
+    complex_graph.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Sample Node',
+                topic_node='Spanish',
+                type='is_linked_to',
+            )
+        ]
+    )
+    assert 'Adios' not in complex_graph.similarity_index.rows
+    assert 'Island 1' in complex_graph.similarity_index.rows
@@ -0,0 +1,126 @@
+"""Test writing graphs to snapshot files and loading them back through a memory map"""
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+from app.core.mcq_builder import MCQBuilder
+from app.graphs.csr_graph import CSRGraph
+from app.graphs.nx_graph import NXGraph
+from app.graphs.snapshot import load_snapshot, write_snapshot
+from app.models import MCQNode, MCQRelationship
+
+
+@pytest.fixture(name='graph')
+def graph_fixture(test_data: Dict[str, List[str]]) -> NXGraph:
+    """
+    Creates a networkx graph with fake word banks to snapshot.
+
+    Returns:
+        NXGraph: the graph filled with test data
+    """
+    graph = NXGraph()
+    graph.fill_graph(test_data)
+    MCQBuilder(graph, seed=1).fill_fake_word_bank()
+    return graph
+
+
+def test_snapshot_round_trip(graph: NXGraph, tmp_path: Path):
+    """Tests a loaded snapshot holds the same nodes, relationships, reads and fake words as the graph written."""
+    path = str(tmp_path / 'graph.mcqg')
+    write_snapshot(graph, path)
+    loaded = load_snapshot(path)
+    assert isinstance(loaded, CSRGraph)
+    assert sorted(loaded.nodes()) == sorted(graph.nodes())
+    assert list(loaded.relationships()) == list(graph.relationships())
+    assert len(loaded.fake_words) == len(graph.fake_words)
+    for node in graph.nodes():
+        assert loaded.get_node(node.name) == node
+        assert loaded.similarity_matrix(node) == graph.similarity_matrix(node)
+        assert sorted(loaded.connected_nodes(node)) == sorted(
+            graph.connected_nodes(node)
+        )
+    for seed in range(10):
+        assert (
+            MCQBuilder(loaded, seed=seed).generate()
+            == MCQBuilder(graph, seed=seed).generate()
+        )
+    assert loaded.get_node('Missing') is None
+
+
+def test_snapshot_write_after_load(graph: NXGraph, tmp_path: Path):
+    """Tests a loaded snapshot can be written to, copying what it needs out of the memory map."""
+    path = str(tmp_path / 'graph.mcqg')
+    write_snapshot(graph, path)
+    loaded = load_snapshot(path)
+    relationship = next(loaded.relationships())
+    loaded.fake_words.put(relationship, ['Blorp'])
+    assert len(loaded.fake_words) == len(graph.fake_words)
+
+    version = loaded.version
+    loaded.create_nodes([MCQNode(name='Salut')])
+    loaded.create_relationships(
+        [
+            MCQRelationship(
+                answer_node='Salut', topic_node='Greetings', type='belongs_to'
+            )
+        ]
+    )
+    assert loaded.version > version
+    assert 'Salut' in [
+        x.name
+        for x in loaded.related_nodes(
+            MCQRelationship(
+                answer_node='Hello', topic_node='Greetings', type='belongs_to'
+            )
+        )
+    ]
+    assert (
+        len(list(loaded.relationships()))
+        == len(list(graph.relationships())) + 1
+    )
+
+
+def test_snapshot_invalid_file(tmp_path: Path):
+    """Tests a file that is not a snapshot is rejected."""
+    path = tmp_path / 'graph.mcqg'
+    path.write_bytes(b'not a snapshot')
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_snapshot_fake_words_after_change(graph: NXGraph, tmp_path: Path):
+    """Tests a change only drops the mapped fake words of the relationships it reaches, even as it moves edge positions."""
+    colours = [
+        MCQRelationship(answer_node=x, topic_node='Colours', type='is_a')
+        for x in ['Red', 'Blue']
+    ]
+    graph.merge_nodes([MCQNode(name=x) for x in ['Colours', 'Red', 'Blue']])
+    graph.create_relationships(colours)
+    for relationship in colours:
+        graph.fake_words.put(relationship, ['Blurple', 'Greed'])
+    path = str(tmp_path / 'graph.mcqg')
+    write_snapshot(graph, path)
+    loaded = load_snapshot(path)
+    assert len(loaded.fake_words) == len(graph.fake_words)
+
+    removed = next(loaded.relationships())
+    loaded.remove_relationships([removed])
+    affected = loaded.neighbourhood({removed.answer_node, removed.topic_node})
+    assert affected is not None
+    kept = [
+        x
+        for x in graph.fake_words.banks
+        if x[0] not in affected and x[1] not in affected
+    ]
+    assert kept
+    assert len(loaded.fake_words) == len(kept)
+    for relationship in loaded.relationships():
+        key = loaded.fake_words.key(relationship)
+        words = loaded.fake_words.sample(relationship, random.Random(1), k=3)
+        assert sorted(words) == sorted(
+            graph.fake_words.banks[key] if key in kept else []
+        )
+
+    loaded.fake_words.put(removed, ['Blorp'])
+    assert len(loaded.fake_words) == len(kept) + 1
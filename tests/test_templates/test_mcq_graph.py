@@ -1,9 +1,10 @@
 """A template to test that all of the MCQGraph class object interface operations working as expected"""
 import logging
+import random
 from typing import Dict, List
 
 import pytest
-from app.graphs.mcq_graph import MCQGraph
+from app.graphs.mcq_graph import GraphChange, MCQGraph
 from app.models import MCQNode, MCQRelationship
 
 pytestmark = pytest.mark.skip(
@@ -58,6 +59,26 @@ class TestMCQGraph:
         for properties in simple_properties:
             assert simple_graph.get_node(properties['name']) is None
 
+    def test_nodes(
+        self, simple_graph: MCQGraph, simple_properties: List[Dict[str, str]]
+    ):
+        """Tests every node of a populated graph is listed."""
+        assert sorted(simple_graph.nodes()) == sorted(
+            MCQNode(**properties) for properties in simple_properties
+        )
+
+    def test_merge(self, simple_relationships_graph: MCQGraph):
+        """Tests merging only creates the nodes and relationships a populated graph does not have."""
+        relationships = list(simple_relationships_graph.relationships())
+        simple_relationships_graph.merge_nodes(
+            [MCQNode(name='Sample Node 1'), MCQNode(name='Sample Node 3')]
+        )
+        assert simple_relationships_graph.get_node('Sample Node 3')
+        simple_relationships_graph.merge_relationships(relationships)
+        assert sorted(
+            x.json() for x in simple_relationships_graph.relationships()
+        ) == sorted(x.json() for x in relationships)
+
     def test_duplicate_input(self, graph: MCQGraph):
         """Tests if an error is raised when duplicated properties are used to create nodes in an empty graph."""
         duplicate_properties = [
@@ -112,6 +133,57 @@ class TestMCQGraph:
             }
         )
 
+    def test_random_relationships(self, complex_graph: MCQGraph):
+        """Tests retrieval of several distinct random relationships at once."""
+        relationships = complex_graph.random_relationships(10, seed=1)
+        assert len(relationships) == 10
+        assert len({x.json() for x in relationships}) == 10
+        assert all(complex_graph.has_relationship(x) for x in relationships)
+        assert relationships == complex_graph.random_relationships(10, seed=1)
+
+    def test_random_relationship_filters(self, complex_graph: MCQGraph):
+        """Tests random relationships can be limited to those from one answer node, of one type, or both."""
+        relationships = list(complex_graph.relationships())
+        for answer_node, relationship_type in [
+            ('Greetings', None),
+            (None, 'belongs_to'),
+            ('Hello', 'belongs_to'),
+        ]:
+            matching = [
+                x
+                for x in relationships
+                if answer_node in (None, x.answer_node)
+                and relationship_type in (None, x.type)
+            ]
+            chosen = complex_graph.random_relationships(
+                100,
+                seed=1,
+                answer_node=answer_node,
+                relationship_type=relationship_type,
+            )
+            assert sorted(x.json() for x in chosen) == sorted(
+                x.json() for x in matching
+            )
+            for seed in range(5):
+                assert (
+                    complex_graph.random_relationship(
+                        seed=seed,
+                        answer_node=answer_node,
+                        relationship_type=relationship_type,
+                    )
+                    in matching
+                )
+        for answer_node, relationship_type in [
+            ('Missing', None),
+            (None, 'missing'),
+            ('Hello', 'includes'),
+        ]:
+            with pytest.raises(ValueError):
+                complex_graph.random_relationship(
+                    answer_node=answer_node,
+                    relationship_type=relationship_type,
+                )
+
     def test_connected_nodes(self, complex_graph: MCQGraph):
         """Tests the retrieval of all nodes connected to a specified node."""
 
@@ -150,3 +222,210 @@ class TestMCQGraph:
         )
         assert similarity_matrix['Hey'] == 1.0
         assert similarity_matrix['Ciao'] == 0.25
+
+    def test_version(self, graph: MCQGraph):
+        """Tests the version of the graph changes with its data, and similarity follows the new data."""
+        version = graph.version
+        graph.create_nodes(
+            [MCQNode(name='Hello'), MCQNode(name='Hey'), MCQNode(name='Words')]
+        )
+        graph.create_relationships(
+            [
+                MCQRelationship(
+                    answer_node='Hello', topic_node='Words', type='belongs_to'
+                )
+            ]
+        )
+        assert graph.version > version
+        assert 'Hey' not in graph.similarity_matrix(MCQNode(name='Hello'))
+
+        version = graph.version
+        graph.create_relationships(
+            [
+                MCQRelationship(
+                    answer_node='Hey', topic_node='Words', type='belongs_to'
+                )
+            ]
+        )
+        assert graph.version > version
+        assert graph.similarity_matrix(MCQNode(name='Hello'))['Hey'] == 1.0
+
+        version = graph.version
+        graph.delete_all()
+        assert graph.version > version
+
+    def test_remove_nodes(self, complex_graph: MCQGraph):
+        """Tests removing nodes removes their relationships and every lookup follows."""
+        hello = MCQNode(name='Hello')
+        assert 'Hey' in complex_graph.similarity_matrix(hello)
+
+        complex_graph.remove_nodes(['Hey', 'Missing'])
+        assert complex_graph.get_node('Hey') is None
+        assert all(
+            'Hey' not in (x.answer_node, x.topic_node)
+            for x in complex_graph.relationships()
+        )
+        assert 'Hey' not in complex_graph.similarity_matrix(hello)
+        relationship = MCQRelationship(
+            answer_node='Hello', type='belongs_to', topic_node='Greetings'
+        )
+        assert sorted(
+            x.name for x in complex_graph.related_nodes(relationship)
+        ) == [
+            'Good Morning',
+            'Hola',
+        ]
+        assert len(complex_graph.random_relationships(100, seed=1)) == len(
+            list(complex_graph.relationships())
+        )
+
+    def test_remove_relationships(self, complex_graph: MCQGraph):
+        """Tests removing relationships keeps their nodes and ignores relationships that are not in the graph."""
+        removed = MCQRelationship(
+            answer_node='Hello', type='belongs_to', topic_node='Greetings'
+        )
+        count = len(list(complex_graph.relationships()))
+        complex_graph.remove_relationships(
+            [
+                removed,
+                removed,
+                MCQRelationship(
+                    answer_node='Hey',
+                    type='is_linked_to',
+                    topic_node='Greetings',
+                ),
+            ]
+        )
+        assert not complex_graph.has_relationship(removed)
+        assert complex_graph.get_node('Hello') is not None
+        assert len(list(complex_graph.relationships())) == count - 1
+        assert 'Hello' not in [
+            x.name
+            for x in complex_graph.related_nodes(
+                MCQRelationship(
+                    answer_node='Hey',
+                    type='belongs_to',
+                    topic_node='Greetings',
+                )
+            )
+        ]
+        assert 'Greetings' not in [
+            x.name
+            for x in complex_graph.connected_nodes(MCQNode(name='Hello'))
+        ]
+
+    def test_change_events(self, graph: MCQGraph):
+        """Tests listeners are told which nodes a change reached and only the fake words of those nodes are dropped."""
+        graph.create_nodes(
+            [
+                MCQNode(name=x)
+                for x in [
+                    'Hello',
+                    'Hey',
+                    'Greetings',
+                    'Bye',
+                    'Farewells',
+                    'Ciao',
+                ]
+            ]
+        )
+        greeting, farewell = [
+            MCQRelationship(answer_node=x, topic_node=y, type='belongs_to')
+            for x, y in [('Hello', 'Greetings'), ('Bye', 'Farewells')]
+        ]
+        graph.create_relationships(
+            [
+                greeting,
+                farewell,
+                MCQRelationship(
+                    answer_node='Hey',
+                    topic_node='Greetings',
+                    type='belongs_to',
+                ),
+            ]
+        )
+        graph.fake_words.put(greeting, ['Bye'])
+        graph.fake_words.put(farewell, ['Hello'])
+        changes: List[GraphChange] = []
+        graph.subscribe(changes.append)
+
+        graph.create_relationships(
+            [
+                MCQRelationship(
+                    answer_node='Ciao',
+                    topic_node='Farewells',
+                    type='belongs_to',
+                )
+            ]
+        )
+        assert changes[-1].version == graph.version
+        assert changes[-1].nodes == {'Ciao', 'Farewells'}
+        assert changes[-1].affected == {'Ciao', 'Farewells', 'Bye'}
+        assert graph.fake_words.sample(farewell, random.Random(0)) == []
+        assert graph.fake_words.sample(greeting, random.Random(0)) == ['Bye']
+
+        graph.remove_nodes(['Hey'])
+        assert changes[-1].nodes == {'Hey', 'Greetings'}
+        assert changes[-1].affected == {'Hey', 'Greetings', 'Hello'}
+        assert graph.fake_words.sample(greeting, random.Random(0)) == []
+
+        graph.unsubscribe(changes.append)
+        graph.delete_all()
+        assert len(changes) == 2
+
+    def test_question_reads(self, complex_graph: MCQGraph):
+        """Tests that the reads for a question match the separate lookups."""
+        relationship = MCQRelationship(
+            answer_node='Hello', type='belongs_to', topic_node='Greetings'
+        )
+        node = MCQNode(name='Hello')
+        reads = complex_graph.question_reads(relationship)
+        assert reads.answer_node == complex_graph.get_node('Hello')
+        assert sorted(reads.related_nodes) == sorted(
+            complex_graph.related_nodes(relationship)
+        )
+        assert sorted(reads.connected_nodes) == sorted(
+            complex_graph.connected_nodes(node)
+        )
+        assert reads.similarity == complex_graph.similarity_matrix(node)
+
+        missing = complex_graph.question_reads(
+            MCQRelationship(
+                answer_node='Missing',
+                type='belongs_to',
+                topic_node='Greetings',
+            )
+        )
+        assert missing.answer_node is None
+
+    def test_name_reads(self, complex_graph: MCQGraph):
+        """Tests that the reads of node names match the names of the nodes read."""
+        relationship = MCQRelationship(
+            answer_node='Hello', type='belongs_to', topic_node='Greetings'
+        )
+        reads = complex_graph.question_reads(relationship)
+        names = complex_graph.name_reads(relationship)
+        assert names.found
+        assert sorted(names.related) == sorted(
+            x.name for x in reads.related_nodes
+        )
+        assert sorted(names.connected) == sorted(
+            x.name for x in reads.connected_nodes
+        )
+        assert names.similarity == reads.similarity
+        assert sorted(complex_graph.related_names(relationship)) == sorted(
+            names.related
+        )
+        assert sorted(complex_graph.connected_names('Hello')) == sorted(
+            names.connected
+        )
+
+        missing = complex_graph.name_reads(
+            MCQRelationship(
+                answer_node='Missing',
+                type='belongs_to',
+                topic_node='Greetings',
+            )
+        )
+        assert not missing.found
+        assert complex_graph.connected_names('Missing') == []